@@ -0,0 +1,2 @@
+"""Benchmarks for the catafolk package. Run them from the root of the
+package, e.g. ``python -m benchmarks.kern_metadata``."""
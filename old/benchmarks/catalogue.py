@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark opening the merged :class:`catafolk.catalogue.Catalogue`,
+compared to reading and concatenating the CSV indices of all datasets::
+
+    python -m benchmarks.catalogue
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+from catafolk.catalogue import Catalogue
+
+def read_csv_indices(catalogue):
+    """The old approach: read and concatenate all dataset indices"""
+    dataframes = []
+    for dataset_id in catalogue.list_datasets():
+        df = pd.read_csv(catalogue._index_path(dataset_id))
+        df['dataset_id'] = dataset_id
+        dataframes.append(df)
+    return pd.concat(dataframes).set_index(['dataset_id', 'id'])
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.catalogue')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(args)
+
+    directory = tempfile.mkdtemp()
+    try:
+        catalogue = Catalogue(directory)
+        start = time.perf_counter()
+        catalogue.refresh()
+        print(f'Initial refresh:                 {time.perf_counter() - start:8.4f}s')
+        start = time.perf_counter()
+        catalogue.refresh()
+        print(f'Refresh without changes:         {time.perf_counter() - start:8.4f}s')
+
+        timings = [
+            ('Concatenating CSV indices', lambda: read_csv_indices(catalogue)),
+            ('Opening the catalogue', lambda: catalogue.open()),
+            ('Loading the catalogue', lambda: catalogue.load()),
+            ('Loading 3 columns', lambda: catalogue.load(
+                columns=['title', 'location', 'language'])),
+        ]
+        for name, func in timings:
+            print(f'{name + ":":<32} {best_time(func, args.repeat):8.4f}s')
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
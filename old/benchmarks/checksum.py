@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark computing the checksums of all files in a corpus: the
+original implementation (md5 in 4 KiB chunks), the current
+implementation with several hash algorithms, and the stat-keyed
+checksum cache of :class:`catafolk.cache.MetadataCache`. It also
+measures the throughput on a single large file::
+
+    python -m benchmarks.checksum --synthetic 5000
+"""
+import os
+import glob
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+from catafolk.cache import MetadataCache
+from catafolk.utils import file_checksum
+from .kern_metadata import write_synthetic_corpus
+
+ALGORITHMS = ['md5', 'blake2b', 'sha1', 'sha256']
+
+def legacy_file_checksum(path):
+    """The original implementation of `utils.file_checksum`"""
+    hash_md5 = hashlib.md5()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(4096), b''):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+def timed(func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return time.perf_counter() - start
+
+def run(paths, cache_path):
+    """Time all methods on a list of files. Returns the times in seconds"""
+    times = {'legacy md5': timed(legacy_file_checksum, paths)}
+    for algorithm in ALGORITHMS:
+        times[algorithm] = timed(lambda p: file_checksum(p, algorithm), paths)
+
+    # Backdate the files, so that their checksums are cached
+    mtime = time.time() - 60
+    for path in paths:
+        os.utime(path, (mtime, mtime))
+    cache = MetadataCache(cache_path)
+    times['cache (cold)'] = timed(cache.checksum, paths)
+    cache.close()
+    cache = MetadataCache(cache_path)
+    times['cache (warm)'] = timed(cache.checksum, paths)
+    cache.close()
+    return times
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.checksum')
+    parser.add_argument('--pattern', default=None,
+        help='glob pattern matching the files to hash')
+    parser.add_argument('--synthetic', type=int, default=2000,
+        help='number of synthetic kern files to use if no pattern is given')
+    parser.add_argument('--large-file', type=int, default=256,
+        help='size of the large file in MB')
+    args = parser.parse_args(args)
+
+    directory = tempfile.mkdtemp()
+    try:
+        if args.pattern is not None:
+            paths = sorted(glob.glob(args.pattern, recursive=True))
+        else:
+            write_synthetic_corpus(directory, args.synthetic)
+            paths = sorted(glob.glob(os.path.join(directory, '*.krn')))
+        cache_path = os.path.join(directory, 'cache.sqlite')
+        times = run(paths, cache_path)
+        print(f'Checksums of {len(paths)} files:')
+        for name, duration in times.items():
+            print(f'  {name:<14} {duration:8.3f}s')
+
+        large_path = os.path.join(directory, 'large.bin')
+        with open(large_path, 'wb') as handle:
+            for _ in range(args.large_file):
+                handle.write(os.urandom(1 << 20))
+        print(f'Throughput on a {args.large_file} MB file:')
+        duration = timed(legacy_file_checksum, [large_path])
+        print(f'  {"legacy md5":<14} {args.large_file / duration:8.0f} MB/s')
+        for algorithm in ALGORITHMS:
+            duration = timed(lambda p: file_checksum(p, algorithm), [large_path])
+            print(f'  {algorithm:<14} {args.large_file / duration:8.0f} MB/s')
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
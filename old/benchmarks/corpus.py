@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Generate a synthetic dataset: a corpus of kern and MusicXML files
+with a CSV file of additional metadata and a matching ``dataset.yml``,
+so that it can be built like any other dataset. Corpora can have
+anything from a hundred to a million files::
+
+    python -m benchmarks.corpus /tmp/synthetic --num-files 100000
+
+The dataset is deterministic given the ``seed``. Files are spread over
+subdirectories of at most ``files_per_dir`` files, and the metadata is
+varied enough for the transformations to do real work: titles,
+locations and cultures are drawn from small vocabularies, and the
+music is assembled from a pool of random phrases.
+"""
+import os
+import random
+import argparse
+
+DATASET_ID = 'synthetic'
+
+WORDS = ['Lied', 'vom', 'Jäger', 'Mädchen', 'Wanderer', 'song', 'of', 'the',
+    'river', 'mountain', 'shan', 'ge', 'hao', 'ballad', 'Rose', 'Abend',
+    'morning', 'Liebe', 'Heimat', 'dance']
+LOCATIONS = ['Europa, Deutschland, Bayern', 'Europa, Deutschland, Altmark',
+    'Asia, China, Shanxi, Zizhou', 'Asia, China, Han', 'Europa, Irland',
+    'Amerika, USA, Nebraska', 'Europa, Luxemburg', 'Boehmen, Riesengebirge']
+CULTURES = ['German', 'Han', 'Irish', 'Pawnee', 'Luxembourgish', 'Czech']
+COLLECTORS = ['Helmut Schaffrath', 'Frances Densmore', 'Ludwig Erk',
+    'Franz Magnus Böhme', 'Louis Pinck']
+METERS = ['2/4', '3/4', '4/4', '6/8']
+PITCHES = ['c', 'd', 'e', 'f', 'g', 'a', 'b', 'cc', 'dd', 'B', 'A', 'G']
+DURATIONS = ['4', '8', '8', '4.', '16', '2']
+XML_STEPS = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
+
+# Fields of the index, and the metadata from which they are taken in
+# kern and MusicXML files
+_FILE_FIELDS = [
+    ('title', 'OTL', 'work-title'),
+    ('location', 'ARE', 'source'),
+    ('catalogue_num', 'SCT', 'work-number'),
+    ('encoders', 'EED', 'encoder'),
+    ('metric_classification', 'AMT', None),
+    ('encoding_date', None, 'encoding-date'),
+]
+
+_CONFIG_TEMPLATE = f"""\
+# A synthetic dataset generated by benchmarks/corpus.py
+dataset_id: {DATASET_ID}
+title: Synthetic corpus
+formats: {{formats}}
+
+sources:
+  - name: file
+    type: file
+    file_pattern: data/*/*.*
+    file_options:
+      encoding: utf-8
+  - name: meta
+    type: csv
+    path: metadata.csv
+    id_field: id
+
+transformations:
+  - constant: [dataset_id, {DATASET_ID}]
+{{file_transformations}}
+  - rename: [meta.culture, culture]
+  - rename: [meta.collector, collectors]
+  - to_int: [meta.year, collection_date]
+  - rename: [file.cf_path, file_path]
+  - rename: [file.cf_format, file_format]
+  - rename: [file.cf_checksum, file_checksum]
+  - constant: [file_has_music, true]
+  - format:
+    - id
+    - file_url
+    - pattern: "https://example.org/synthetic/{{{{}}}}"
+"""
+
+def dataset_config(formats):
+    """The ``dataset.yml`` of a synthetic dataset. Transformations can
+    only use fields that occur in the corpus, so they depend on the
+    formats of the files (``'kern'`` and/or ``'xml'``)."""
+    lines = []
+    for field, kern_key, xml_key in _FILE_FIELDS:
+        inputs = []
+        if 'kern' in formats and kern_key is not None:
+            inputs.append(f'file.{kern_key}')
+        if 'xml' in formats and xml_key is not None:
+            inputs.append(f'file.{xml_key}')
+        if len(inputs) == 1:
+            lines.append(f'  - rename: [{inputs[0]}, {field}]')
+        elif len(inputs) > 1:
+            lines.append(f'  - join: [[{", ".join(inputs)}], {field}]')
+    if 'kern' in formats:
+        lines.append('  - to_string_list: [file._comments, comments]')
+    return _CONFIG_TEMPLATE.format(formats=f'[{", ".join(formats)}]',
+        file_transformations='\n'.join(lines))
+
+class _Generator(object):
+    """Generates the contents of the files, using a pool of phrases so
+    that large corpora can be generated quickly"""
+
+    def __init__(self, seed, num_notes):
+        self.rng = random.Random(seed)
+        self.num_notes = num_notes
+        self.kern_phrases = ['\n'.join(self._kern_phrase()) for _ in range(64)]
+        self.xml_phrases = [self._xml_phrase() for _ in range(64)]
+
+    def _kern_phrase(self):
+        notes = [self.rng.choice(DURATIONS) + self.rng.choice(PITCHES) for _ in range(8)]
+        return notes[:4] + ['='] + notes[4:] + ['=']
+
+    def _xml_phrase(self):
+        notes = []
+        for _ in range(8):
+            notes.append('<note><pitch><step>{}</step><octave>{}</octave></pitch>'
+                '<duration>{}</duration></note>'.format(
+                    self.rng.choice(XML_STEPS), self.rng.randint(3, 5),
+                    self.rng.choice([1, 2, 4])))
+        return ''.join(notes)
+
+    def metadata(self, i):
+        rng = self.rng
+        return dict(
+            title=' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize(),
+            location=rng.choice(LOCATIONS),
+            catalogue_num=f'S{i:07d}',
+            encoder=rng.choice(COLLECTORS),
+            meter=rng.choice(METERS),
+            culture=rng.choice(CULTURES),
+            collector=rng.choice(COLLECTORS),
+            year=rng.randint(1850, 1990))
+
+    def num_phrases(self):
+        return max(1, self.num_notes // 8)
+
+    def kern(self, meta):
+        phrases = self.rng.choices(self.kern_phrases, k=self.num_phrases())
+        lines = [f'!!!OTL: {meta["title"]}', f'!!!ARE: {meta["location"]}',
+            f'!! Collected by {meta["collector"]}', '!! A global comment',
+            '**kern', f'*M{meta["meter"]}', '*k[]', *phrases, '==', '*-',
+            '!!!AMT: simple duple', f'!!!SCT: {meta["catalogue_num"]}',
+            f'!!!EED: {meta["encoder"]}', '!!!EEV: 1.0']
+        return '\n'.join(lines) + '\n'
+
+    def xml(self, meta):
+        phrases = self.rng.choices(self.xml_phrases, k=self.num_phrases())
+        measures = ''.join(f'<measure number="{j + 1}">{phrase}</measure>'
+                           for j, phrase in enumerate(phrases))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<score-partwise version="3.1">'
+            f'<work><work-number>{meta["catalogue_num"]}</work-number>'
+            f'<work-title>{meta["title"]}</work-title></work>'
+            f'<identification><creator type="composer">Traditional</creator>'
+            f'<encoding><encoder>{meta["encoder"]}</encoder>'
+            f'<encoding-date>2020-01-01</encoding-date></encoding>'
+            f'<source>{meta["location"]}</source></identification>'
+            '<part-list><score-part id="P1"><part-name>Voice</part-name></score-part></part-list>'
+            f'<part id="P1">{measures}</part></score-partwise>\n')
+
+def generate_corpus(directory, num_files, xml_fraction=0.2, num_notes=200,
+    files_per_dir=1000, seed=0):
+    """Generate a synthetic dataset in a directory
+
+    Parameters
+    ----------
+    directory : str
+        The dataset directory. It is created if it does not exist.
+    num_files : int
+        The number of music files
+    xml_fraction : float, optional
+        The fraction of MusicXML files, by default 0.2. The other
+        files are kern files.
+    num_notes : int, optional
+        The approximate number of notes per file, by default 200
+    files_per_dir : int, optional
+        The maximum number of files per subdirectory of ``data``,
+        by default 1000
+    seed : int, optional
+        The random seed, by default 0
+
+    Returns
+    -------
+    list
+        The ids of all entries
+    """
+    generator = _Generator(seed, num_notes)
+    ids = []
+    formats = set()
+    metadata_rows = ['id,culture,collector,year']
+    for i in range(num_files):
+        entry_id = f'synth{i:07d}'
+        subdir = os.path.join(directory, 'data', f'{i // files_per_dir:04d}')
+        if i % files_per_dir == 0:
+            os.makedirs(subdir, exist_ok=True)
+        meta = generator.metadata(i)
+        if generator.rng.random() < xml_fraction:
+            path = os.path.join(subdir, f'{entry_id}.xml')
+            contents = generator.xml(meta)
+            formats.add('xml')
+        else:
+            path = os.path.join(subdir, f'{entry_id}.krn')
+            contents = generator.kern(meta)
+            formats.add('kern')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(contents)
+        metadata_rows.append(f'{entry_id},{meta["culture"]},{meta["collector"]},{meta["year"]}')
+        ids.append(entry_id)
+
+    with open(os.path.join(directory, 'metadata.csv'), 'w', encoding='utf-8') as handle:
+        handle.write('\n'.join(metadata_rows) + '\n')
+    with open(os.path.join(directory, 'dataset.yml'), 'w', encoding='utf-8') as handle:
+        handle.write(dataset_config(sorted(formats)))
+    return ids
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.corpus',
+        description='Generate a synthetic dataset')
+    parser.add_argument('directory')
+    parser.add_argument('--num-files', type=int, default=1000)
+    parser.add_argument('--xml-fraction', type=float, default=0.2)
+    parser.add_argument('--num-notes', type=int, default=200)
+    parser.add_argument('--files-per-dir', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(args)
+    generate_corpus(args.directory, args.num_files, xml_fraction=args.xml_fraction,
+        num_notes=args.num_notes, files_per_dir=args.files_per_dir, seed=args.seed)
+    print(f'Generated {args.num_files} files in {args.directory}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark of the time it takes to import the modules of catafolk.
+Short-lived commands and worker processes pay this cost every time
+they start, so heavy dependencies (pandas, graphkit, yaml, geopy) should
+only be imported by the modules that really need them. Every module is
+imported in a fresh interpreter, and the benchmark also lists which of
+the heavy dependencies were imported along the way::
+
+    python -m benchmarks.import_time --repeat 10 --output imports.json
+
+Use ``--profile`` to show the slowest imports of a module, as reported
+by ``python -X importtime``.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import subprocess
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+MODULES = ['catafolk.utils', 'catafolk.file', 'catafolk.instrument',
+    'catafolk.operations', 'catafolk.transformer', 'catafolk.source',
+    'catafolk.index', 'catafolk.dataset', 'catafolk.build', 'catafolk.search',
+    'catafolk.geocoding']
+
+HEAVY_MODULES = ['numpy', 'pandas', 'pyarrow', 'yaml', 'graphkit', 'networkx',
+    'geopy']
+
+_SCRIPT = """\
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps(dict(seconds=seconds, heavy=heavy)))
+"""
+
+def _run(args):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    return subprocess.run([sys.executable] + args, cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, check=True)
+
+def time_import(module, repeat=5):
+    """Import a module in ``repeat`` fresh interpreters
+
+    Returns
+    -------
+    dict
+        The best import time in seconds (``seconds``), the best time
+        of the whole process including the start of the interpreter
+        (``process_seconds``) and the heavy dependencies that were
+        imported (``heavy``)
+    """
+    script = _SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    best, best_process, heavy = float('inf'), float('inf'), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = json.loads(_run(['-c', script]).stdout)
+        best_process = min(best_process, time.perf_counter() - start)
+        best = min(best, result['seconds'])
+        heavy = result['heavy']
+    return dict(module=module, seconds=best, process_seconds=best_process, heavy=heavy)
+
+def import_profile(module, limit=10):
+    """The top-level packages that take most time to import, according
+    to ``python -X importtime``. The time of a package is the sum of
+    the time spent in its own modules, excluding their dependencies.
+
+    Returns
+    -------
+    list
+        Tuples ``(package, seconds)``, slowest first
+    """
+    stderr = _run(['-X', 'importtime', '-c', f'import {module}']).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            package = name.strip().split('.')[0]
+            times[package] = times.get(package, 0) + int(own) / 1e6
+    return sorted(times.items(), key=lambda item: -item[1])[:limit]
+
+def format_results(results):
+    """Format the results as a table"""
+    lines = [f'{"module":<22} {"import (s)":>10} {"process (s)":>11}  heavy dependencies']
+    for result in results:
+        heavy = ', '.join(result['heavy']) or '-'
+        lines.append(f'{result["module"]:<22} {result["seconds"]:10.3f} '
+                     f'{result["process_seconds"]:11.3f}  {heavy}')
+    return '\n'.join(lines)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_time')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--profile', action='store_true',
+        help='show the slowest imports of every module')
+    parser.add_argument('--output', default=None, help='write the results to a JSON file')
+    args = parser.parse_args(args)
+
+    results = [time_import(module, repeat=args.repeat) for module in args.modules]
+    print(f'Import times in seconds (best of {args.repeat})')
+    print(format_results(results))
+    if args.profile:
+        for module in args.modules:
+            print(f'\nSlowest imports of {module}:')
+            for package, seconds in import_profile(module):
+                print(f'  {package:<30} {seconds:8.3f}')
+
+    if args.output is not None:
+        report = dict(
+            benchmark='import_time',
+            created=datetime.datetime.now().isoformat(timespec='seconds'),
+            command=' '.join(sys.argv),
+            environment=dict(python=platform.python_version(),
+                platform=platform.platform()),
+            parameters=dict(vars(args)),
+            results=results)
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
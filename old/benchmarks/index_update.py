@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark :meth:`catafolk.index.Index.update` on large indices,
+comparing the bulk upsert to the old implementation, which used
+``DataFrame.update`` for existing entries and then appended the new
+ones. Every update changes 10% of the existing entries and adds 10%
+new entries::
+
+    python -m benchmarks.index_update --sizes 10000 100000 1000000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from catafolk.index import Index
+
+NUM_COLUMNS = 10
+
+def legacy_update(index, df):
+    """The original implementation of `Index.update` (using `pd.concat`,
+    since `DataFrame.append` no longer exists)"""
+    columns = [col for col in df.columns if col in index.fields]
+    subset = df[columns]
+    updates = subset.index.intersection(index.data.index)
+    index.data.update(subset.loc[updates, :])
+    new_entries = subset.index.difference(index.data.index)
+    index._data = pd.concat([index.data, subset.loc[new_entries, :]])
+
+def make_frame(ids, seed=0):
+    """A frame of half string and half numeric columns"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(NUM_COLUMNS):
+        if i % 2 == 0:
+            data[f'field{i}'] = rng.integers(0, 1000, len(ids)).astype(str).astype(object)
+        else:
+            data[f'field{i}'] = rng.random(len(ids))
+    return pd.DataFrame(data, index=pd.Index(ids, name='id'))
+
+def setup(size):
+    fields = [f'field{i}' for i in range(NUM_COLUMNS)]
+    data = make_frame([f'entry{i}' for i in range(size)])
+    num_changes = size // 10
+    updated_ids = [f'entry{i}' for i in range(0, size, 10)][:num_changes]
+    new_ids = [f'entry{i}' for i in range(size, size + num_changes)]
+    updates = make_frame(updated_ids + new_ids, seed=1)
+    return fields, data, updates
+
+def run(size, repeat=3):
+    """Time both implementations on an index of a given size, and check
+    that the results agree. Returns the best times in seconds."""
+    fields, data, updates = setup(size)
+    times = {}
+    results = {}
+    for name, update in [('legacy', legacy_update), ('upsert', Index.update)]:
+        best = float('inf')
+        for _ in range(repeat):
+            index = Index('index.csv', fields=fields)
+            index._data = data.copy()
+            start = time.perf_counter()
+            update(index, updates)
+            best = min(best, time.perf_counter() - start)
+        times[name] = best
+        results[name] = index.data
+    pd.testing.assert_frame_equal(results['legacy'], results['upsert'])
+    return times
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.index_update')
+    parser.add_argument('--sizes', type=int, nargs='+',
+        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(args)
+
+    print(f'{"entries":>10} {"legacy (s)":>11} {"upsert (s)":>11} {"speedup":>8}')
+    for size in args.sizes:
+        times = run(size, repeat=args.repeat)
+        speedup = times['legacy'] / times['upsert']
+        print(f'{size:>10} {times["legacy"]:11.3f} {times["upsert"]:11.3f} '
+              f'{speedup:7.1f}x')
+
+if __name__ == '__main__':
+    main()
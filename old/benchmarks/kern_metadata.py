@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark the extraction of metadata from kern files, comparing the
+current :class:`catafolk.file.KernFile` parser to the original
+implementation, which matched a regular expression against every line.
+
+By default, all kern files of all datasets are used::
+
+    python -m benchmarks.kern_metadata
+
+The music files are not distributed with catafolk, so if no files are
+found you can benchmark on a synthetic corpus instead::
+
+    python -m benchmarks.kern_metadata --synthetic 2000
+"""
+import os
+import re
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+
+from catafolk.file import KernFile
+
+CUR_DIR = os.path.dirname(__file__)
+ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir))
+DEFAULT_PATTERN = os.path.join(ROOT_DIR, 'datasets', '*', '**', '*.krn')
+
+def legacy_collect_metadata(path, encoding):
+    """The original KernFile._collect_metadata"""
+    metadata = {}
+    with open(path, 'r', encoding=encoding) as handle:
+        for line in handle:
+            key = False
+            if line.startswith('!! '):
+                key = '_comments'
+                value = line[3:].strip()
+            else:
+                match = re.match(r'^\!{3}([^:]+):[ \t]*(.+)', line)
+                if match:
+                    key = match[1]
+                    value = match[2]
+            if key:
+                if key == 'id': key = '_id'
+                if key not in metadata:
+                    metadata[key] = value
+                elif type(metadata[key]) == list:
+                    metadata[key].append(value)
+                else:
+                    metadata[key] = [metadata[key], value]
+    return metadata
+
+def write_synthetic_corpus(directory, num_files, num_notes=400):
+    """Write kern files with a header, a body of notes and trailing 
+    reference records, roughly like the files in the Essen collection"""
+    for i in range(num_files):
+        lines = [f'!!!OTL: Synthetic song {i}', '!!!ARE: Europa, Deutschland',
+                 '!! A global comment', '!! Ethnic Group: Han', '**kern', '*M4/4', '*k[]']
+        lines += ['4c', '8d', '8e', '=', '2f'] * (num_notes // 5)
+        lines += ['==', '*-', '!!!AMT: simple duple', f'!!!SCT: S{i:05d}',
+                  '!!!YEM: Copyright 1995, estate of Helmut Schaffrath.',
+                  '!!!EED: Helmut Schaffrath', '!!!EEV: 1.0']
+        path = os.path.join(directory, f'synthetic{i:05d}.krn')
+        with open(path, 'w') as handle:
+            handle.write('\n'.join(lines) + '\n')
+
+def time_function(fn, paths, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(paths, encoding='ISO-8859-1', repeat=3):
+    """Time the parsers on a list of files and check that they return
+    the same metadata. Returns a dictionary with the best time of 
+    each parser in seconds."""
+    legacy = lambda path: legacy_collect_metadata(path, encoding)
+    full = lambda path: KernFile(path, encoding=encoding)._collect_metadata()
+    header = lambda path: KernFile(path, encoding=encoding,
+        trailing_records=False)._collect_metadata()
+
+    for path in paths:
+        if legacy(path) != full(path):
+            raise AssertionError(f'Parsers disagree on {path}')
+
+    return {
+        'legacy': time_function(legacy, paths, repeat),
+        'full': time_function(full, paths, repeat),
+        'header_only': time_function(header, paths, repeat),
+    }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.kern_metadata')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN,
+        help='glob pattern of the kern files to use')
+    parser.add_argument('--synthetic', type=int, default=None,
+        help='benchmark on this many synthetic files instead')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(args)
+
+    directory = None
+    if args.synthetic is not None:
+        directory = tempfile.mkdtemp()
+        write_synthetic_corpus(directory, args.synthetic)
+        paths = glob.glob(os.path.join(directory, '*.krn'))
+    else:
+        paths = glob.glob(args.pattern, recursive=True)
+    if len(paths) == 0:
+        parser.error('No kern files found. Use --synthetic to generate files.')
+
+    try:
+        times = run(paths, repeat=args.repeat)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+    print(f'{len(paths)} files (best of {args.repeat})')
+    for name, duration in times.items():
+        speedup = times['legacy'] / duration
+        print(f'{name:<12} {duration:8.3f}s  {len(paths) / duration:10.0f} files/s  {speedup:5.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""End-to-end benchmark of building a dataset, which times every stage
+of :meth:`catafolk.index.Index.make` separately on synthetic corpora
+of increasing size (see :mod:`benchmarks.corpus`):
+
+- ``discovery``: loading the configuration and finding all files
+- ``extraction``: extracting the metadata from all sources
+- ``collect``: combining the sources (:meth:`Index.collect`)
+- ``transform``: transforming the entries (:meth:`Index.transform`)
+- ``update``: updating the index (:meth:`Index.update`)
+- ``save``: writing the index to disk (:meth:`Index.save`)
+
+The results are printed and can be written to a JSON file, to compare
+them across changes or machines::
+
+    python -m benchmarks.stages --sizes 100 1000 10000 --output stages.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import datetime
+import numpy as np
+import pandas as pd
+
+from catafolk.dataset import Dataset
+from .corpus import DATASET_ID
+from .corpus import generate_corpus
+
+STAGES = ['discovery', 'extraction', 'collect', 'transform', 'update', 'save']
+
+def time_stages(directory, options={}):
+    """Build the dataset in a directory, timing every stage
+
+    Returns
+    -------
+    (dict, int)
+        The duration of every stage in seconds and the number of
+        entries in the index
+    """
+    times = {}
+    start = time.perf_counter()
+    dataset = Dataset(DATASET_ID, options=dict(options, dir=directory))
+    for source in dataset.file_sources:
+        source.files
+    times['discovery'] = time.perf_counter() - start
+
+    index = dataset.index
+    index.clear()
+    start = time.perf_counter()
+    for source in index.sources.values():
+        source.data
+    times['extraction'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = index.collect()
+    times['collect'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transformed = index.transform(data)
+    times['transform'] = time.perf_counter() - start
+
+    index.initialize()
+    start = time.perf_counter()
+    index.update(transformed)
+    times['update'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.save()
+    times['save'] = time.perf_counter() - start
+    return times, len(index.data)
+
+def run(sizes, repeat=3, xml_fraction=0.2, num_notes=200, seed=0, options={}):
+    """Run the benchmark on corpora of several sizes. Every stage is
+    timed ``repeat`` times and the best time is reported.
+
+    Returns
+    -------
+    list
+        A list with a dictionary of results for every size
+    """
+    results = []
+    for num_files in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            generate_corpus(directory, num_files, xml_fraction=xml_fraction,
+                num_notes=num_notes, seed=seed)
+            generation_time = time.perf_counter() - start
+            best = {stage: float('inf') for stage in STAGES}
+            for _ in range(repeat):
+                times, num_entries = time_stages(directory, options)
+                for stage in STAGES:
+                    best[stage] = min(best[stage], times[stage])
+        finally:
+            shutil.rmtree(directory)
+        stages = {stage: dict(seconds=best[stage],
+                              entries_per_second=num_entries / best[stage] if best[stage] > 0 else None)
+                  for stage in STAGES}
+        results.append(dict(
+            num_files=num_files,
+            num_entries=num_entries,
+            generation_seconds=generation_time,
+            total_seconds=sum(best.values()),
+            stages=stages))
+    return results
+
+def environment():
+    """Describe the machine and the versions of the main dependencies"""
+    return dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        processor=platform.processor(),
+        cpu_count=os.cpu_count(),
+        numpy=np.__version__,
+        pandas=pd.__version__)
+
+def format_results(results):
+    """Format the results as a table, with the time per stage in seconds"""
+    header = f'{"files":>9} ' + ' '.join(f'{stage:>10}' for stage in STAGES) + f' {"total":>10}'
+    lines = [header]
+    for result in results:
+        times = ' '.join(f'{result["stages"][stage]["seconds"]:10.3f}' for stage in STAGES)
+        lines.append(f'{result["num_files"]:>9} {times} {result["total_seconds"]:10.3f}')
+    return '\n'.join(lines)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stages')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+        help='numbers of files in the synthetic corpora')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--xml-fraction', type=float, default=0.2)
+    parser.add_argument('--num-notes', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--index-store', default=None, choices=['feather', 'parquet'],
+        help='also store the index in a binary format')
+    parser.add_argument('--output', default=None, help='write the results to a JSON file')
+    args = parser.parse_args(args)
+
+    options = dict(index_store=args.index_store)
+    results = run(args.sizes, repeat=args.repeat, xml_fraction=args.xml_fraction,
+        num_notes=args.num_notes, seed=args.seed, options=options)
+    print(f'Time per stage in seconds (best of {args.repeat})')
+    print(format_results(results))
+
+    if args.output is not None:
+        report = dict(
+            benchmark='stages',
+            created=datetime.datetime.now().isoformat(timespec='seconds'),
+            command=' '.join(sys.argv),
+            environment=environment(),
+            parameters=dict(vars(args)),
+            results=results)
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Benchmark :meth:`catafolk.index.Index.transform`, comparing the 
+row-wise transformation to the columnar transformation, using the
+transformations of the Essen datasets. The datasets are built from a 
+synthetic corpus, since the music files are not distributed with 
+catafolk::
+
+    python -m benchmarks.transform --num-files 5000
+"""
+import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+from catafolk.dataset import Dataset
+from catafolk.dataset import DATASETS_DIR
+from .kern_metadata import write_synthetic_corpus
+
+def setup_dataset(dataset_id, directory, num_files):
+    """Copy the configuration of a dataset to a directory, and add a
+    synthetic corpus"""
+    config_path = os.path.join(DATASETS_DIR, dataset_id, 'dataset.yml')
+    shutil.copy(config_path, directory)
+    data_dir = os.path.join(directory, 'data')
+    os.makedirs(data_dir)
+    write_synthetic_corpus(data_dir, num_files)
+    return Dataset(dataset_id, options={'dir': directory})
+
+def run(dataset_id, num_files, repeat=3):
+    """Time both transformation modes on a dataset and check that they
+    give the same results. Returns the best times in seconds."""
+    directory = tempfile.mkdtemp()
+    try:
+        dataset = setup_dataset(dataset_id, directory, num_files)
+        data = dataset.index.collect()
+        times = {}
+        results = {}
+        for mode, columnar in [('rowwise', False), ('columnar', True)]:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[mode] = dataset.index.transform(data, columnar=columnar)
+                best = min(best, time.perf_counter() - start)
+            times[mode] = best
+        pd.testing.assert_frame_equal(results['rowwise'], results['columnar'],
+            check_like=True)
+    finally:
+        shutil.rmtree(directory)
+    return times
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.transform')
+    parser.add_argument('--num-files', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('datasets', nargs='*', default=None, 
+        help='ids of the datasets, by default all Essen datasets')
+    args = parser.parse_args(args)
+    
+    dataset_ids = args.datasets
+    if not dataset_ids:
+        paths = glob.glob(os.path.join(DATASETS_DIR, 'essen-*', 'dataset.yml'))
+        dataset_ids = sorted(os.path.basename(os.path.dirname(p)) for p in paths)
+
+    print(f'{args.num_files} entries per dataset (best of {args.repeat})')
+    for dataset_id in dataset_ids:
+        times = run(dataset_id, args.num_files, repeat=args.repeat)
+        speedup = times['rowwise'] / times['columnar']
+        print(f'{dataset_id:<24} rowwise {times["rowwise"]:7.3f}s   '
+              f'columnar {times["columnar"]:7.3f}s   {speedup:5.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Run the command line interface: ``python -m catafolk build``"""
+import sys
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Building a dataset means collecting all its metadata and writing
+the index (see :meth:`catafolk.dataset.Dataset.make`). Datasets are
+completely independent, so several of them can be built at the same
+time. This module runs those builds in a pool of worker processes.
+
+>>> report = build_datasets(['densmore-pawnee', 'essen-china-han'], num_workers=2) # doctest: +SKIP
+>>> print(format_report(report)) # doctest: +SKIP
+
+Every build returns a result dictionary with the ``dataset_id``, its
+``status`` (``'success'`` or ``'failed'``), the wall time in seconds
+(``duration``) and, if the build failed, the ``error`` and a
+``traceback``. A failing dataset never interrupts the other builds.
+If the datasets are instrumented (option ``build_report_fn``, see
+:mod:`catafolk.instrument`), the result also lists the ``stages``.
+
+To avoid rebuilding datasets that did not change, you can first check
+which datasets are outdated: those whose files or configuration 
+changed since they were last built (see 
+:meth:`catafolk.dataset.Dataset.outdated`):
+
+>>> checks = check_datasets(num_workers=4) # doctest: +SKIP
+>>> outdated = [check['dataset_id'] for check in checks if check['outdated']] # doctest: +SKIP
+>>> report = build_datasets(outdated) # doctest: +SKIP
+
+The command line interface (see :mod:`catafolk.cli`) does exactly this
+when it is called as ``catafolk build --changed-only``.
+"""
+import os
+import time
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from .dataset import Dataset
+from .dataset import DATASETS_DIR
+
+__all__ = ['list_datasets', 'build_dataset', 'build_datasets', 'format_report',
+    'check_dataset', 'check_datasets', 'format_checks']
+
+_CONFIG_FILENAMES = ['dataset.yml', 'config.json']
+
+def list_datasets(datasets_dir=DATASETS_DIR):
+    """List the ids of all datasets in a directory. Every subdirectory
+    containing a configuration file (``dataset.yml`` or the deprecated
+    ``config.json``) is considered a dataset.
+
+    Parameters
+    ----------
+    datasets_dir : str, optional
+        The directory containing all datasets, by default the
+        ``datasets`` directory.
+
+    Returns
+    -------
+    list
+        A sorted list of dataset ids
+    """
+    dataset_ids = []
+    for name in os.listdir(datasets_dir):
+        directory = os.path.join(datasets_dir, name)
+        if not os.path.isdir(directory):
+            continue
+        for config_fn in _CONFIG_FILENAMES:
+            if os.path.exists(os.path.join(directory, config_fn)):
+                dataset_ids.append(name)
+                break
+    return sorted(dataset_ids)
+
+def build_dataset(dataset_id, options={}, make_options={}):
+    """Build a single dataset and report how that went. Exceptions are
+    caught and reported in the result, so that this function can safely
+    be used in a worker process.
+
+    Parameters
+    ----------
+    dataset_id : str
+        The id of the dataset
+    options : dict, optional
+        Options passed to :class:`catafolk.dataset.Dataset`
+    make_options : dict, optional
+        Keyword arguments passed to :meth:`catafolk.dataset.Dataset.make`
+
+    Returns
+    -------
+    dict
+        The build result
+    """
+    start = time.perf_counter()
+    result = dict(dataset_id=dataset_id, pid=os.getpid())
+    try:
+        dataset = Dataset(dataset_id, options=options)
+        dataset.make(**make_options)
+        result['status'] = 'success'
+        result['num_entries'] = len(dataset.index.data)
+        if dataset.instrument.enabled:
+            result['stages'] = dataset.build_report()['stages']
+    except Exception as e:
+        logging.error(f'Building {dataset_id} failed: {e}')
+        result['status'] = 'failed'
+        result['error'] = f'{e.__class__.__name__}: {e}'
+        result['traceback'] = traceback.format_exc()
+    result['duration'] = time.perf_counter() - start
+    return result
+
+def build_datasets(dataset_ids=None, num_workers=None,
+    datasets_dir=DATASETS_DIR, options={}, make_options={}):
+    """Build multiple datasets in parallel.
+
+    Parameters
+    ----------
+    dataset_ids : list, optional
+        The ids of the datasets to build. By default all datasets
+        in the ``datasets_dir`` are built (see :func:`list_datasets`).
+    num_workers : int, optional
+        The number of worker processes. Defaults to the number of
+        CPUs. If ``num_workers=1``, all datasets are built in the
+        current process, one after the other.
+    datasets_dir : str, optional
+        The directory containing the datasets
+    options : dict, optional
+        Options passed to every :class:`catafolk.dataset.Dataset`.
+    make_options : dict, optional
+        Keyword arguments passed to :meth:`catafolk.dataset.Dataset.make`
+
+    Returns
+    -------
+    dict
+        A report containing the total wall time (``duration``), the
+        number of workers and a list with the result of every build
+        (``datasets``), in the same order as ``dataset_ids``.
+    """
+    if dataset_ids is None:
+        dataset_ids = list_datasets(datasets_dir)
+    start = time.perf_counter()
+    results, num_workers = _map_datasets(build_dataset, dataset_ids,
+        num_workers, datasets_dir, options, make_options)
+    report = dict(
+        duration=time.perf_counter() - start,
+        num_workers=num_workers,
+        datasets=results)
+    return report
+
+def check_dataset(dataset_id, options={}):
+    """Check whether a dataset is outdated, that is, whether its files
+    or configuration changed since it was last built (see 
+    :meth:`catafolk.dataset.Dataset.outdated`). A dataset that cannot 
+    be loaded is considered outdated, so that building it reports the
+    error.
+
+    Parameters
+    ----------
+    dataset_id : str
+        The id of the dataset
+    options : dict, optional
+        Options passed to :class:`catafolk.dataset.Dataset`
+
+    Returns
+    -------
+    dict
+        The ``dataset_id`` and the reason why it is ``outdated``, 
+        which is None for datasets that are up to date.
+    """
+    result = dict(dataset_id=dataset_id)
+    try:
+        dataset = Dataset(dataset_id, options=options)
+        result['outdated'] = dataset.outdated()
+    except Exception as e:
+        result['outdated'] = f'cannot be loaded ({e.__class__.__name__}: {e})'
+    return result
+
+def check_datasets(dataset_ids=None, num_workers=None,
+    datasets_dir=DATASETS_DIR, options={}):
+    """Check in parallel which datasets are outdated (see 
+    :func:`check_dataset`). The arguments are the same as those of
+    :func:`build_datasets`.
+
+    Returns
+    -------
+    list
+        The result of every check, in the same order as ``dataset_ids``
+    """
+    if dataset_ids is None:
+        dataset_ids = list_datasets(datasets_dir)
+    results, _ = _map_datasets(check_dataset, dataset_ids, num_workers,
+        datasets_dir, options)
+    for result in results:
+        if 'outdated' not in result:
+            result['outdated'] = f'cannot be checked ({result["error"]})'
+    return results
+
+def _map_datasets(func, dataset_ids, num_workers, datasets_dir, options, *args):
+    """Call ``func(dataset_id, options, *args)`` for every dataset,
+    using a pool of worker processes. Returns the results and the 
+    number of workers used."""
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(dataset_ids)))
+
+    options = dict(options)
+    if 'dir' not in options:
+        options['dir'] = os.path.join(datasets_dir, '{dataset_id}')
+
+    if num_workers == 1:
+        results = [func(dataset_id, options, *args) for dataset_id in dataset_ids]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(func, dataset_id, options, *args)
+                       for dataset_id in dataset_ids]
+            results = []
+            for dataset_id, future in zip(dataset_ids, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    logging.error(f'Worker processing {dataset_id} crashed: {e}')
+                    results.append(dict(dataset_id=dataset_id, status='failed',
+                        error=f'{e.__class__.__name__}: {e}', duration=None))
+    return results, num_workers
+
+def format_report(report):
+    """Format a build report (see :func:`build_datasets`) as a table
+    listing the status and wall time of every build.
+
+    >>> report = {
+    ...     'duration': 3.5, 'num_workers': 2,
+    ...     'datasets': [
+    ...         {'dataset_id': 'foo', 'status': 'success', 'duration': 2.25},
+    ...         {'dataset_id': 'bar', 'status': 'failed', 'duration': 0.5,
+    ...          'error': 'ValueError: oops'}]}
+    >>> print(format_report(report))
+    dataset    status   time (s)
+    foo        success      2.25
+    bar        failed       0.50  ValueError: oops
+    Built 1 of 2 datasets in 3.50s using 2 workers (1 failed)
+
+    Parameters
+    ----------
+    report : dict
+        The build report
+
+    Returns
+    -------
+    str
+        The formatted report
+    """
+    results = report['datasets']
+    width = max([len('dataset')] + [len(r['dataset_id']) for r in results])
+    lines = [f'{"dataset":<{width}}    {"status":<8} {"time (s)":>8}']
+    for result in results:
+        duration = result.get('duration')
+        duration = f'{duration:8.2f}' if duration is not None else f'{"-":>8}'
+        line = f'{result["dataset_id"]:<{width}}    {result["status"]:<8} {duration}'
+        if 'error' in result:
+            line += f'  {result["error"]}'
+        lines.append(line)
+
+    num_failed = sum(r['status'] == 'failed' for r in results)
+    summary = (f'Built {len(results) - num_failed} of {len(results)} datasets '
+               f'in {report["duration"]:.2f}s using {report["num_workers"]} workers')
+    if num_failed > 0:
+        summary += f' ({num_failed} failed)'
+    lines.append(summary)
+    return '\n'.join(lines)
+
+def format_checks(checks, selected=None):
+    """Format the results of :func:`check_datasets` as a table listing
+    whether every dataset would be built or skipped, and why.
+
+    >>> checks = [
+    ...     {'dataset_id': 'foo', 'outdated': '2 files new or changed, 0 removed'},
+    ...     {'dataset_id': 'bar', 'outdated': None}]
+    >>> print(format_checks(checks))
+    dataset    action  reason
+    foo        build   2 files new or changed, 0 removed
+    bar        skip    up to date
+    1 of 2 datasets would be built
+
+    Parameters
+    ----------
+    checks : list
+        The results of the checks
+    selected : list, optional
+        The ids of the datasets that would be built. By default all
+        outdated datasets.
+
+    Returns
+    -------
+    str
+        The formatted table
+    """
+    if selected is None:
+        selected = [check['dataset_id'] for check in checks if check['outdated']]
+    width = max([len('dataset')] + [len(check['dataset_id']) for check in checks])
+    lines = [f'{"dataset":<{width}}    {"action":<7} reason']
+    for check in checks:
+        action = 'build' if check['dataset_id'] in selected else 'skip'
+        reason = check['outdated'] or 'up to date'
+        lines.append(f'{check["dataset_id"]:<{width}}    {action:<7} {reason}')
+    lines.append(f'{len(selected)} of {len(checks)} datasets would be built')
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Extracting metadata from thousands of music files takes time, and
+has to be repeated every time the files are loaded in a new process.
+The :class:`MetadataCache` stores the extracted metadata on disk, in a
+single SQLite database, so that unchanged files never have to be
+parsed twice.
+
+Entries are addressed by the checksum of the file's *contents*, the
+file format and the version of the parser (plus any options that
+affect parsing, such as the encoding). The cache can therefore safely
+be shared by all datasets: moving or renaming a file does not
+invalidate its entry, and a new parser version automatically ignores
+old entries.
+
+>>> cache = MetadataCache(':memory:')
+>>> cache.get('350fc2b9839d7d7669d83f77efdc03c2', 'kern', 1) is None
+True
+>>> cache.set('350fc2b9839d7d7669d83f77efdc03c2', 'kern', 1, {'OTL': 'Title'})
+>>> cache.get('350fc2b9839d7d7669d83f77efdc03c2', 'kern', 1)
+{'OTL': 'Title'}
+>>> len(cache)
+1
+
+Files use a cache if you pass one (or the path to one) to
+:func:`catafolk.file.get_file`. In a dataset, set the option
+``metadata_cache`` to the path of the cache.
+
+The cache can be limited in size: when it grows beyond ``max_size``
+bytes, the least recently used entries are evicted. In a dataset, set
+the option ``metadata_cache_max_size``. Entries written
+by outdated parsers or that have not been used for a long time can be
+removed from the command line::
+
+    python -m catafolk.cache prune --max-age 90
+
+The cache also remembers the checksums of files, together with their
+inode, size and modification time (see :meth:`MetadataCache.checksum`).
+As long as these do not change, the file is not read again: computing
+the checksums of an unchanged dataset only takes a ``stat`` per file.
+Datasets always cache the checksums of their files, by default in
+``DEFAULT_CHECKSUM_CACHE_PATH``, even if they do not cache metadata
+(see the option ``checksum_cache`` of :class:`catafolk.dataset.Dataset`).
+"""
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+
+from .utils import file_checksum
+
+CUR_DIR = os.path.dirname(__file__)
+ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir))
+DEFAULT_CACHE_PATH = os.path.join(ROOT_DIR, '.cache', 'metadata.sqlite')
+DEFAULT_CHECKSUM_CACHE_PATH = os.path.join(ROOT_DIR, '.cache', 'checksums.sqlite')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    checksum TEXT NOT NULL,
+    format TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (checksum, format, version, options)
+);
+CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed);
+CREATE TABLE IF NOT EXISTS checksums (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+"""
+
+# Checksums of files modified less than this many nanoseconds ago are
+# not cached: the file could change again without changing its mtime
+_RACY_INTERVAL_NS = 2 * 10**9
+
+# Cache instances per process and path; see `open_cache`
+_CACHES = {}
+
+def open_cache(path=DEFAULT_CACHE_PATH, **kwargs):
+    """Return the cache stored at a given path. Every process opens a
+    cache only once, so that all files in that process share the same
+    database connection.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the SQLite database, by default ``DEFAULT_CACHE_PATH``
+    **kwargs
+        Keyword arguments passed to :class:`MetadataCache`. If the
+        cache is already open, only a ``max_size`` is applied to it.
+
+    Returns
+    -------
+    MetadataCache
+        The cache
+    """
+    key = (os.getpid(), os.path.abspath(path))
+    if key not in _CACHES:
+        _CACHES[key] = MetadataCache(path, **kwargs)
+    elif kwargs.get('max_size') is not None:
+        _CACHES[key].max_size = kwargs['max_size']
+    return _CACHES[key]
+
+class MetadataCache(object):
+    """A persistent cache for metadata extracted from files.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the SQLite database. It is created if it does not
+        exist yet. By default ``DEFAULT_CACHE_PATH``
+    max_size : int, optional
+        The maximum total size of all cached metadata in bytes. If
+        None (default), the size is unlimited.
+    timeout : float, optional
+        Number of seconds to wait for other processes writing to the
+        cache, by default 30
+    """
+
+    flush_every = 500
+    """Number of cache hits after which their access times are written"""
+
+    evict_every = 100
+    """Number of new entries after which the size of the cache is checked"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_size=None, timeout=30):
+        self.path = path
+        self.max_size = max_size
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=timeout)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        self._accessed = []
+        self._checksums = {}
+        self._stored_checksums = None
+        self._num_inserted = 0
+        atexit.register(self.close)
+
+    def __repr__(self):
+        return f'<MetadataCache path={self.path}>'
+
+    def __len__(self):
+        cursor = self._connection.execute('SELECT COUNT(*) FROM metadata')
+        return cursor.fetchone()[0]
+
+    @property
+    def size(self):
+        """The total size of all cached metadata in bytes"""
+        cursor = self._connection.execute('SELECT TOTAL(size) FROM metadata')
+        return int(cursor.fetchone()[0])
+
+    def get(self, checksum, format, version, options={}):
+        """Look up cached metadata
+
+        Parameters
+        ----------
+        checksum : str
+            Checksum of the contents of the file
+        format : str
+            The file format
+        version : int
+            Version of the parser that extracted the metadata
+        options : dict, optional
+            Options affecting the extracted metadata, such as the encoding
+
+        Returns
+        -------
+        dict
+            The metadata, or None if it has not been cached.
+        """
+        key = (checksum, format, version, json.dumps(options, sort_keys=True))
+        cursor = self._connection.execute(
+            'SELECT metadata FROM metadata WHERE checksum=? AND format=? '
+            'AND version=? AND options=?', key)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        self._accessed.append((time.time(),) + key)
+        if len(self._accessed) >= self.flush_every:
+            self.flush()
+        return json.loads(row[0])
+
+    def set(self, checksum, format, version, metadata, options={}):
+        """Store metadata in the cache. See :meth:`get` for details
+        on the parameters."""
+        key = (checksum, format, version, json.dumps(options, sort_keys=True))
+        value = json.dumps(metadata)
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)',
+                key + (value, len(value), time.time()))
+        self._num_inserted += 1
+        if self.max_size is not None and self._num_inserted % self.evict_every == 0:
+            self.evict()
+
+    def checksum(self, path, algorithm='md5'):
+        """Return the checksum of a file. The checksum is only computed
+        if the inode, size or modification time of the file differ from
+        those stored with the cached checksum.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file
+        algorithm : str, optional
+            The hash algorithm (see :func:`catafolk.utils.file_checksum`),
+            by default ``'md5'``
+
+        Returns
+        -------
+        str
+            The checksum of the file
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if self._stored_checksums is None:
+            # Load all checksums at once: far faster than a query per file
+            cursor = self._connection.execute('SELECT * FROM checksums')
+            self._stored_checksums = {(row[0], row[1]): row[2:] for row in cursor}
+        row = self._checksums.get((path, algorithm))
+        if row is None:
+            row = self._stored_checksums.get((path, algorithm))
+        if row is not None and tuple(row[:3]) == key:
+            return row[3]
+
+        checksum = file_checksum(path, algorithm)
+        if time.time_ns() - stat.st_mtime_ns > _RACY_INTERVAL_NS:
+            self._checksums[path, algorithm] = key + (checksum,)
+            if len(self._checksums) >= self.flush_every:
+                self.flush()
+        return checksum
+
+    def flush(self):
+        """Write the access times of recent cache hits and newly
+        computed checksums to the database"""
+        if len(self._accessed) == 0 and len(self._checksums) == 0:
+            return
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE metadata SET accessed=? WHERE checksum=? AND format=? '
+                'AND version=? AND options=?', self._accessed)
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?)',
+                [key + row for key, row in self._checksums.items()])
+        if self._stored_checksums is not None:
+            self._stored_checksums.update(self._checksums)
+        self._accessed = []
+        self._checksums = {}
+
+    def evict(self, max_size=None):
+        """Remove the least recently used entries until the cache is
+        smaller than ``max_size`` bytes.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            The maximum size in bytes, by default the ``max_size`` of
+            the cache.
+
+        Returns
+        -------
+        int
+            The number of evicted entries
+        """
+        if max_size is None:
+            max_size = self.max_size
+        if max_size is None:
+            return 0
+        self.flush()
+        excess = self.size - max_size
+        if excess <= 0:
+            return 0
+
+        rowids = []
+        cursor = self._connection.execute(
+            'SELECT rowid, size FROM metadata ORDER BY accessed ASC')
+        for rowid, size in cursor:
+            rowids.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._connection:
+            self._connection.executemany('DELETE FROM metadata WHERE rowid=?', rowids)
+        logging.info(f'Evicted {len(rowids)} entries from the metadata cache')
+        return len(rowids)
+
+    def prune(self, versions={}, max_age=None):
+        """Remove stale entries from the cache.
+
+        Parameters
+        ----------
+        versions : dict, optional
+            A dictionary mapping file formats to the current parser
+            version. Entries of those formats with a different version
+            are removed.
+        max_age : float, optional
+            Remove entries that have not been used for more than
+            ``max_age`` seconds, by default None
+
+        Returns
+        -------
+        int
+            The number of removed entries
+        """
+        self.flush()
+        num_removed = 0
+        with self._connection:
+            for format, version in versions.items():
+                cursor = self._connection.execute(
+                    'DELETE FROM metadata WHERE format=? AND version!=?',
+                    (format, version))
+                num_removed += cursor.rowcount
+            if max_age is not None:
+                cursor = self._connection.execute(
+                    'DELETE FROM metadata WHERE accessed<?',
+                    (time.time() - max_age,))
+                num_removed += cursor.rowcount
+
+            # Forget the checksums of files that no longer exist
+            paths = self._connection.execute('SELECT DISTINCT path FROM checksums')
+            missing = [(path,) for path, in paths.fetchall() if not os.path.exists(path)]
+            self._connection.executemany('DELETE FROM checksums WHERE path=?', missing)
+        self._stored_checksums = None
+        return num_removed
+
+    def clear(self):
+        """Remove all entries and checksums from the cache"""
+        self._accessed = []
+        self._checksums = {}
+        self._stored_checksums = None
+        with self._connection:
+            self._connection.execute('DELETE FROM metadata')
+            self._connection.execute('DELETE FROM checksums')
+
+    def vacuum(self):
+        """Reclaim the disk space of removed entries"""
+        self._connection.execute('VACUUM')
+
+    def close(self):
+        """Write pending changes and close the database connection"""
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+def main(args=None):
+    """Command line interface for maintaining the cache"""
+    import argparse
+    from .file import PARSER_VERSIONS
+
+    parser = argparse.ArgumentParser(prog='python -m catafolk.cache',
+        description='Maintain the catafolk metadata cache')
+    parser.add_argument('command', choices=['prune', 'clear', 'info'])
+    parser.add_argument('--path', default=DEFAULT_CACHE_PATH,
+        help='path to the cache database')
+    parser.add_argument('--max-age', type=float, default=None,
+        help='prune entries that were not used in this many days')
+    parser.add_argument('--max-size', type=float, default=None,
+        help='evict the least recently used entries until the cache '
+             'is smaller than this many megabytes')
+    args = parser.parse_args(args)
+
+    cache = MetadataCache(args.path)
+    if args.command == 'prune':
+        max_age = args.max_age * 24 * 3600 if args.max_age is not None else None
+        num_removed = cache.prune(versions=PARSER_VERSIONS, max_age=max_age)
+        if args.max_size is not None:
+            num_removed += cache.evict(max_size=int(args.max_size * 1e6))
+        cache.vacuum()
+        print(f'Removed {num_removed} entries')
+    elif args.command == 'clear':
+        cache.clear()
+        cache.vacuum()
+    print(f'{len(cache)} entries ({cache.size / 1e6:.1f} MB) in {cache.path}')
+    cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Every dataset has its own index, ``datasets/<dataset_id>/index.csv``.
+The :class:`Catalogue` merges all these indices into a single store,
+in which entries are identified by their dataset id and their id.
+The store is a Feather file that is memory-mapped when it is opened,
+so that loading the full catalogue (or some of its columns) is fast:
+
+>>> catalogue = Catalogue() # doctest: +SKIP
+>>> catalogue.refresh() # doctest: +SKIP
+>>> df = catalogue.load(columns=['title', 'location']) # doctest: +SKIP
+>>> df.loc[('essen-china-han', 'han0001')] # doctest: +SKIP
+
+The catalogue keeps a converted copy of every dataset index and a
+manifest with the checksum of every dataset, taken from its
+``properties.json`` (or, if the dataset has no properties, the
+checksum of its index). Refreshing the catalogue only converts the
+datasets whose checksum or index file has changed, and then merges
+the converted indices again. The manifest also stores the checksum
+of every converted index, so that the merge is skipped if the
+converted datasets turn out to be unchanged. From the command line::
+
+    python -m catafolk.catalogue refresh
+
+The catalogue requires pyarrow.
+"""
+import os
+import json
+import logging
+import pandas as pd
+
+from .index import _arrow_compatible
+from .index import _import_pyarrow
+from .utils import file_checksum
+from .utils import ROOT_DIR
+from .utils import DATASETS_DIR
+
+DEFAULT_CATALOGUE_DIR = os.path.join(ROOT_DIR, '.cache', 'catalogue')
+
+_MANIFEST_VERSION = 2
+
+def _same_state(entry, state):
+    """Whether a manifest entry matches the current state of a dataset.
+    The entry also contains the checksum of the converted index.
+
+    >>> _same_state({'checksum': 'abc', 'part_checksum': 'def'}, {'checksum': 'abc'})
+    True
+    >>> _same_state(None, {'checksum': 'abc'})
+    False
+    """
+    if entry is None:
+        return False
+    return all(entry.get(key) == value for key, value in state.items())
+
+class Catalogue(object):
+    """A merged catalogue of all datasets.
+
+    Parameters
+    ----------
+    directory : str, optional
+        The directory where the catalogue is stored, by default
+        ``DEFAULT_CATALOGUE_DIR``
+    datasets_dir : str, optional
+        The directory containing all datasets, by default the
+        ``datasets`` directory.
+    index_fn : str, optional
+        The filename of the index of every dataset, by default
+        ``index.csv``
+    """
+
+    def __init__(self, directory=DEFAULT_CATALOGUE_DIR,
+        datasets_dir=DATASETS_DIR, index_fn='index.csv'):
+        self.dir = directory
+        self.datasets_dir = datasets_dir
+        self.index_fn = index_fn
+        self.path = os.path.join(directory, 'catalogue.feather')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.parts_dir = os.path.join(directory, 'datasets')
+
+    def __repr__(self):
+        return f'<Catalogue path={self.path}>'
+
+    @property
+    def manifest(self):
+        """A dictionary with the state of every dataset in the catalogue
+        at the last refresh"""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r') as handle:
+            manifest = json.load(handle)
+        if manifest.get('version') != _MANIFEST_VERSION:
+            return {}
+        return manifest['datasets']
+
+    def list_datasets(self):
+        """List the ids of all datasets that have an index"""
+        dataset_ids = []
+        for dataset_id in sorted(os.listdir(self.datasets_dir)):
+            if os.path.exists(self._index_path(dataset_id)):
+                dataset_ids.append(dataset_id)
+        return dataset_ids
+
+    def _index_path(self, dataset_id):
+        return os.path.join(self.datasets_dir, dataset_id, self.index_fn)
+
+    def _part_path(self, dataset_id):
+        return os.path.join(self.parts_dir, f'{dataset_id}.feather')
+
+    def dataset_state(self, dataset_id):
+        """The state of a dataset: its checksum and the size and
+        modification time of its index. The checksum is read from
+        ``properties.json``; datasets without properties use the
+        checksum of their index instead.
+
+        Parameters
+        ----------
+        dataset_id : str
+            The dataset id
+
+        Returns
+        -------
+        dict
+            The state of the dataset
+        """
+        index_path = self._index_path(dataset_id)
+        properties_path = os.path.join(self.datasets_dir, dataset_id, 'properties.json')
+        checksum = None
+        if os.path.exists(properties_path):
+            with open(properties_path, 'r') as handle:
+                checksum = json.load(handle).get('checksum')
+        if checksum is None:
+            checksum = file_checksum(index_path)
+        stat = os.stat(index_path)
+        return dict(checksum=checksum, index_size=stat.st_size,
+                    index_mtime=stat.st_mtime_ns)
+
+    def changes(self):
+        """Compare all datasets to the manifest of the catalogue
+
+        Returns
+        -------
+        (list, list)
+            The ids of all new or changed datasets, and the ids of the
+            datasets in the catalogue that no longer exist.
+        """
+        manifest = self.manifest
+        dataset_ids = self.list_datasets()
+        changed = [dataset_id for dataset_id in dataset_ids
+                   if not _same_state(manifest.get(dataset_id), self.dataset_state(dataset_id))
+                   or not os.path.exists(self._part_path(dataset_id))]
+        removed = [dataset_id for dataset_id in manifest
+                   if dataset_id not in dataset_ids]
+        return changed, removed
+
+    def _convert(self, dataset_id):
+        """Convert the index of a dataset to a Feather file"""
+        pa = _import_pyarrow()
+        from pyarrow import feather
+        df = pd.read_csv(self._index_path(dataset_id), index_col='id')
+        df['dataset_id'] = dataset_id
+        df = _arrow_compatible(df)
+        columns = ['dataset_id', 'id']
+        df = df[columns + [col for col in df.columns if col not in columns]]
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, self._part_path(dataset_id))
+
+    def refresh(self, force=False):
+        """Update the catalogue: convert the indices of all new or
+        changed datasets and merge all dataset indices in a single store.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Convert all datasets, also if they have not changed. By
+            default False.
+
+        Returns
+        -------
+        (list, list)
+            The ids of all (re)converted datasets and of all removed
+            datasets.
+        """
+        pa = _import_pyarrow()
+        from pyarrow import feather
+        os.makedirs(self.parts_dir, exist_ok=True)
+        changed, removed = self.changes()
+        if force:
+            changed = self.list_datasets()
+        if len(changed) == 0 and len(removed) == 0 and os.path.exists(self.path):
+            logging.info('The catalogue is up to date')
+            return changed, removed
+
+        manifest = self.manifest
+        for dataset_id in removed:
+            if os.path.exists(self._part_path(dataset_id)):
+                os.remove(self._part_path(dataset_id))
+            del manifest[dataset_id]
+        merge = len(removed) > 0 or not os.path.exists(self.path)
+        for dataset_id in changed:
+            logging.info(f'Converting the index of {dataset_id}')
+            self._convert(dataset_id)
+            state = self.dataset_state(dataset_id)
+            state['part_checksum'] = file_checksum(self._part_path(dataset_id))
+            previous = manifest.get(dataset_id, {})
+            if previous.get('part_checksum') != state['part_checksum']:
+                merge = True
+            manifest[dataset_id] = state
+
+        if merge:
+            # Datasets may use different types for the same field, so merge
+            # them as dataframes and convert the merged result once.
+            parts = [feather.read_table(self._part_path(dataset_id), memory_map=True).to_pandas()
+                     for dataset_id in sorted(manifest)]
+            merged = pd.concat(parts, ignore_index=True) if len(parts) > 0 else pd.DataFrame(
+                [], columns=['dataset_id', 'id'])
+            merged = _arrow_compatible(merged.set_index(['dataset_id', 'id']))
+            table = pa.Table.from_pandas(merged, preserve_index=False)
+            feather.write_feather(table, self.path, compression='uncompressed')
+        else:
+            logging.info('The converted indices are unchanged: not merging them')
+
+        with open(self.manifest_path, 'w') as handle:
+            json.dump(dict(version=_MANIFEST_VERSION, datasets=manifest),
+                      handle, indent=4, sort_keys=True)
+        logging.info(f'Catalogue refreshed: {len(changed)} datasets converted, '
+                     f'{len(removed)} removed')
+        return changed, removed
+
+    def open(self, columns=None, dataset_ids=None):
+        """Open the catalogue as a memory-mapped Arrow table. This is
+        nearly instantaneous, since nothing is read until the data is
+        actually used.
+
+        Parameters
+        ----------
+        columns : list, optional
+            The columns to include. The ``dataset_id`` and ``id`` columns
+            are always included. By default all columns.
+        dataset_ids : list, optional
+            Only include entries from these datasets, by default all.
+
+        Returns
+        -------
+        pyarrow.Table
+            The catalogue
+        """
+        pa = _import_pyarrow()
+        from pyarrow import feather
+        import pyarrow.compute as pc
+        if not os.path.exists(self.path):
+            raise FileNotFoundError('The catalogue does not exist. Refresh the catalogue.')
+        if columns is not None:
+            columns = ['dataset_id', 'id'] + [col for col in columns
+                                              if col not in ['dataset_id', 'id']]
+        table = feather.read_table(self.path, columns=columns, memory_map=True)
+        if dataset_ids is not None:
+            value_set = pa.array(list(dataset_ids), type=table['dataset_id'].type)
+            table = table.filter(pc.is_in(table['dataset_id'], value_set=value_set))
+        return table
+
+    def load(self, columns=None, dataset_ids=None):
+        """Load the catalogue as a dataframe indexed by dataset id and id.
+        See :meth:`open` for the parameters.
+
+        Returns
+        -------
+        pd.DataFrame
+            The catalogue
+        """
+        table = self.open(columns=columns, dataset_ids=dataset_ids)
+        return table.to_pandas().set_index(['dataset_id', 'id'])
+
+def main(args=None):
+    """Command line interface for the catalogue"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m catafolk.catalogue',
+        description='Maintain the merged catafolk catalogue')
+    parser.add_argument('command', choices=['refresh', 'info'])
+    parser.add_argument('--dir', default=DEFAULT_CATALOGUE_DIR,
+        help='directory where the catalogue is stored')
+    parser.add_argument('--force', action='store_true',
+        help='convert all datasets, also if they have not changed')
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    catalogue = Catalogue(args.dir)
+    if args.command == 'refresh':
+        catalogue.refresh(force=args.force)
+    table = catalogue.open()
+    print(f'{table.num_rows} entries from {len(catalogue.manifest)} datasets '
+          f'in {catalogue.path}')
+
+if __name__ == '__main__':
+    main()
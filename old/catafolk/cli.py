@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""The command line interface of catafolk. It is installed as the
+``catafolk`` command (see ``setup.py``) and can also be run as
+``python -m catafolk``. To build datasets::
+
+    catafolk build                          # all datasets
+    catafolk build essen-china-han -j 4     # selected datasets
+    catafolk build --changed-only           # only outdated datasets
+    catafolk build --changed-only --dry-run # list outdated datasets
+
+A dataset is outdated if its files or its configuration changed since
+it was last built, as determined by their checksums (see
+:meth:`catafolk.dataset.Dataset.outdated`). With ``--incremental``,
+only the files that changed are processed. With ``--streaming``, 
+indices are made in batches, so that large datasets can be built with
+little memory (see :meth:`catafolk.index.Index.make_streaming`).
+
+The exit code tells scripts what happened:
+
+======================  ==  =============================================
+``EXIT_OK``              0  All builds succeeded, or nothing had to be built
+``EXIT_FAILED``          1  At least one build failed
+``EXIT_USAGE``           2  Invalid arguments, such as an unknown dataset
+``EXIT_OUTDATED``        3  Dry run: at least one dataset would be built
+======================  ==  =============================================
+
+Catafolk itself is only imported once the arguments have been parsed,
+so that ``catafolk --help`` responds immediately.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_OUTDATED = 3
+
+def build(args):
+    """Build datasets (the ``build`` command). Returns the exit code."""
+    from .build import list_datasets
+    from .build import build_datasets
+    from .build import check_datasets
+    from .build import format_report
+    from .build import format_checks
+
+    available = list_datasets(args.datasets_dir)
+    dataset_ids = args.datasets or available
+    unknown = [dataset_id for dataset_id in dataset_ids if dataset_id not in available]
+    if len(unknown) > 0:
+        print(f'Unknown datasets: {", ".join(unknown)}', file=sys.stderr)
+        return EXIT_USAGE
+
+    options = {}
+    if args.index_store is not None:
+        options['index_store'] = args.index_store
+
+    if args.changed_only or args.dry_run:
+        checks = check_datasets(dataset_ids, num_workers=args.jobs,
+            datasets_dir=args.datasets_dir, options=options)
+        if args.changed_only:
+            dataset_ids = [check['dataset_id'] for check in checks if check['outdated']]
+        if args.dry_run:
+            print(format_checks(checks, selected=dataset_ids))
+            _write_report(args.report, dict(dry_run=True, checks=checks,
+                selected=dataset_ids))
+            return EXIT_OUTDATED if len(dataset_ids) > 0 else EXIT_OK
+
+    if len(dataset_ids) == 0:
+        print('All datasets are up to date')
+        _write_report(args.report, dict(duration=0, num_workers=0, datasets=[]))
+        return EXIT_OK
+
+    make_options = dict(incremental=args.incremental, streaming=args.streaming,
+        batch_size=args.batch_size)
+    report = build_datasets(dataset_ids, num_workers=args.jobs,
+        datasets_dir=args.datasets_dir, options=options, make_options=make_options)
+    print(format_report(report))
+    _write_report(args.report, report)
+    failed = any(result['status'] != 'success' for result in report['datasets'])
+    return EXIT_FAILED if failed else EXIT_OK
+
+def _write_report(path, report):
+    if path is not None:
+        with open(path, 'w') as handle:
+            json.dump(report, handle, indent=4)
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'should be at least 1: {value}')
+    return number
+
+def parser():
+    """The argument parser of the command line interface"""
+    # The datasets directory is computed here to avoid importing catafolk.dataset
+    root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+    parser = argparse.ArgumentParser(prog='catafolk',
+        description='A catalogue of folk music datasets')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log progress')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    build_parser = subparsers.add_parser('build', help='build datasets',
+        description='Build the index of selected or all datasets')
+    build_parser.add_argument('datasets', nargs='*', metavar='dataset',
+        help='ids of the datasets to build, by default all datasets')
+    build_parser.add_argument('-j', '--jobs', type=_positive_int, default=None,
+        help='number of worker processes, by default the number of CPUs')
+    build_parser.add_argument('--changed-only', action='store_true',
+        help='only build datasets whose files or configuration changed')
+    build_parser.add_argument('--dry-run', action='store_true',
+        help='only report which datasets would be built')
+    build_parser.add_argument('--incremental', action='store_true',
+        help='only process the files that changed since the last build')
+    build_parser.add_argument('--streaming', action='store_true',
+        help='make the indices in batches to limit memory use')
+    build_parser.add_argument('--batch-size', type=_positive_int, default=1000,
+        help='number of entries per batch when streaming (default: 1000)')
+    build_parser.add_argument('--index-store', choices=['feather', 'parquet'],
+        default=None, help='also store the indices in a binary format')
+    build_parser.add_argument('--datasets-dir', default=os.path.join(root_dir, 'datasets'),
+        help='directory containing the datasets')
+    build_parser.add_argument('--report', default=None,
+        help='write a JSON report of the build to this file')
+    build_parser.set_defaults(func=build)
+    return parser
+
+def main(args=None):
+    """Run the command line interface and return the exit code"""
+    args = parser().parse_args(args)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(levelname)s %(message)s')
+    if not os.path.isdir(getattr(args, 'datasets_dir', '.')):
+        print(f'Datasets directory does not exist: {args.datasets_dir}', file=sys.stderr)
+        return EXIT_USAGE
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,30 +5,23 @@ import glob
 import json
 import yaml 
 import pandas as pd
-import hashlib
 import re
-import warnings
 import logging
 
+from .cache import DEFAULT_CHECKSUM_CACHE_PATH
 from .file import get_file
-from .geocoding import Locator
 from .index import Index
+from .instrument import Instrument
+from .instrument import NULL_INSTRUMENT
+from .merkle import MerkleTree
+from .operations import _mapping_file
+from . import schema
 from .source import *
 from .transformer import Transformer
-
-CUR_DIR = os.path.dirname(__file__)
-ROOT_DIR = os.path.abspath(join(CUR_DIR, os.path.pardir))
-DATASETS_DIR = join(ROOT_DIR, 'datasets')
-
-# Load fields from the schema file
-schema_path = os.path.join(ROOT_DIR, 'schemas', 'index-schema.csv')
-if os.path.exists(schema_path):
-    schema = pd.read_csv(schema_path)
-    schema.sort_values('order', ascending=True, inplace=True)
-    _FIELDS = schema['field'].tolist()
-else:
-    warnings.warn(f'Schema file does not exist: {schema_path}')
-    _FIELDS = ['id', 'dataset_id']
+from .utils import file_checksum
+from .utils import checksum_iterable
+from .utils import ROOT_DIR
+from .utils import DATASETS_DIR
 
 # TODO also move dataset options to a schema. Automatically check if
 # the dataset yml file is complete/valid
@@ -44,11 +37,45 @@ class Dataset(object):
         'config_fields': ['transformations', 'sources'],
         # The CSV file where all metadata is indexed
         'index_fn': 'index.csv',
-        # A list of all accepted fields
-        'index_fields': _FIELDS
+        # Properties of the dataset, such as its checksum, and the Merkle
+        # tree from which the checksum is computed (see catafolk.merkle)
+        'properties_fn': 'properties.json',
+        'merkle_fn': 'merkle.json',
+        # A list of all accepted fields. By default None: all fields in
+        # the schema (see catafolk.schema), which is read when needed
+        'index_fields': None,
+        # Path to a persistent cache for metadata extracted from files
+        # (see catafolk.cache). By default no cache is used.
+        'metadata_cache': None,
+        # Maximum size of the metadata cache in bytes; the least recently
+        # used entries are evicted beyond it. None means unlimited.
+        'metadata_cache_max_size': None,
+        # Path to a cache for the checksums of files, so that unchanged
+        # files are not read again to compute the Merkle tree. None 
+        # disables it. The metadata cache also caches checksums.
+        'checksum_cache': DEFAULT_CHECKSUM_CACHE_PATH,
+        # Also store the index in a binary columnar format ('feather' or
+        # 'parquet'; see catafolk.index.Index). Requires pyarrow.
+        'index_store': None,
+        # Record the time and memory used by every stage of `make` and
+        # write them to this JSON file (see catafolk.instrument). By 
+        # default None: no instrumentation.
+        'build_report_fn': None
     }
 
-    def __init__(self, dataset_id, options={}):
+    def __init__(self, dataset_id, options={}, instrument=None):
+        """
+        Parameters
+        ----------
+        dataset_id : str
+            The id of the dataset
+        options : dict, optional
+            Options overriding the default options
+        instrument : catafolk.instrument.Instrument, optional
+            Records the time and memory used by every stage of loading
+            and making the dataset. By default, an instrument is only
+            used if the option ``build_report_fn`` is set.
+        """
         self.dataset_id = dataset_id
         
         # Set up options required to load the config file
@@ -65,6 +92,13 @@ class Dataset(object):
         self.options.update(self._load_config())
         self.options.update(options)
 
+        self.build_report_path = None
+        if self.options['build_report_fn'] is not None:
+            self.build_report_path = join(self.dir, self.options['build_report_fn'])
+            if instrument is None:
+                instrument = Instrument()
+        self.instrument = instrument if instrument is not None else NULL_INSTRUMENT
+
         # Set up transformer
         self.transformer = None
         if 'transformations' in self.options:
@@ -96,11 +130,23 @@ class Dataset(object):
         return config
 
     def _setup_index(self):
+        self.properties_path = join(self.dir, self.options['properties_fn'])
+        self.merkle_path = join(self.dir, self.options['merkle_fn'])
         self.index_path = join(self.dir, self.options['index_fn'])
+        fields = self.options['index_fields']
+        if fields is None:
+            fields = schema.fields()
         self.index = Index(self.index_path, 
                            transformer=self.transformer,
-                           fields=self.options['index_fields'])
+                           fields=fields,
+                           store=self.options['index_store'],
+                           instrument=self.instrument)
+
+        with self.instrument.stage('discovery') as stage:
+            self._setup_sources()
+            stage.num_entries = sum(len(source.filepaths) for source in self.file_sources)
 
+    def _setup_sources(self):
         if "sources" in self.options:
             for options in self.options['sources']:
                 kwargs = dict(name=options['name'])
@@ -112,10 +158,19 @@ class Dataset(object):
                 if options['type'] == 'file':
                     kwargs['data_dir'] = self.dir
                     kwargs['file_pattern'] = options.get('file_pattern')
-                    if 'file_options' in options:
-                        kwargs['file_options'] = options['file_options']
+                    file_options = dict(options.get('file_options', {}))
+                    if self.options['metadata_cache'] is not None:
+                        file_options.setdefault('cache', self.options['metadata_cache'])
+                        file_options.setdefault('cache_max_size', self.options['metadata_cache_max_size'])
+                    if self.options['checksum_cache'] is not None:
+                        file_options.setdefault('checksum_cache', self.options['checksum_cache'])
+                    kwargs['file_options'] = file_options
                     if 'exclude' in options:
                         kwargs['exclude'] = options['exclude']
+                    if 'num_workers' in options:
+                        kwargs['num_workers'] = options['num_workers']
+                    if 'chunksize' in options:
+                        kwargs['chunksize'] = options['chunksize']
                     source = FileSource(**kwargs)
                     self.index.register_sources(source)
 
@@ -127,20 +182,228 @@ class Dataset(object):
                     source = CSVSource(path, **kwargs)
                     self.index.register_sources(source)
 
-    def make(self, clear=True):
-        if clear:
-            self.index.clear()
-        self.index.make()
+    def make(self, clear=True, incremental=False, streaming=False, batch_size=1000):
+        """Make the index of the dataset and update the properties of 
+        the dataset (see :meth:`write_properties`).
+        
+        Parameters
+        ----------
+        clear : bool, optional
+            Whether to remove the existing index first, by default True.
+            Ignored for incremental updates.
+        incremental : bool, optional
+            Only process files that are new or have changed since the last
+            time the index was made (see :meth:`catafolk.index.Index.make`),
+            by default False. The changed files are found by comparing 
+            the Merkle tree of the dataset to the stored tree. Files 
+            without an entry in the index, for instance because their
+            transformation failed, are processed again as well. If the
+            configuration changed (see :meth:`config_checksum`), the 
+            whole index is remade.
+        streaming : bool, optional
+            Make the index in batches of ``batch_size`` entries, which 
+            bounds the memory use (see 
+            :meth:`catafolk.index.Index.make_streaming`). By default False.
+        batch_size : int, optional
+            The number of entries per batch when streaming, by default 1000
+
+        If the dataset has an instrument, the time and memory used by
+        every stage are recorded, and if the option ``build_report_fn``
+        is set, they are written to a JSON build report.
+        """
+        tree = None
+        if len(self.file_sources) > 0:
+            with self.instrument.stage('checksums') as stage:
+                tree = self.merkle_tree()
+                stage.num_entries = len(tree)
+        if incremental and self.properties().get('config_checksum') != self.config_checksum():
+            logging.info('The configuration changed: remaking the whole index')
+            incremental = False
+        if incremental:
+            changes = None
+            old_tree = MerkleTree.load(self.merkle_path)
+            if tree is not None and old_tree is not None:
+                changed, removed = tree.diff(old_tree)
+                # Files without entries in the index, e.g. because their
+                # transformation failed, are retried as well
+                changed = sorted(set(changed) | set(self._unindexed_files(tree)))
+                changes = (changed, removed)
+            self.index.make(incremental=True, changes=changes)
+        else:
+            if clear:
+                self.index.clear()
+            self.index.make(streaming=streaming, batch_size=batch_size)
+        with self.instrument.stage('properties'):
+            self.write_properties(tree)
+        if self.build_report_path is not None:
+            self.write_build_report()
+
+    def _unindexed_files(self, tree):
+        """The paths of the files in a Merkle tree that have no entry 
+        in the index"""
+        index = self.index
+        if not index.has_file or index.path_field not in index.data.columns:
+            return []
+        indexed = set(index.data[index.path_field].dropna())
+        return [path for path in tree.checksums() if path not in indexed]
+
+    def build_report(self):
+        """A report of the time and memory used by every stage of
+        loading and making the dataset (see :mod:`catafolk.instrument`)"""
+        return self.instrument.report(dataset_id=self.dataset_id, 
+            num_entries=len(self.index.data))
+
+    def write_build_report(self, path=None):
+        """Write the build report (see :meth:`build_report`) to a
+        JSON file, by default the file ``build_report_fn``"""
+        if path is None:
+            path = self.build_report_path
+        with open(path, 'w') as handle:
+            json.dump(self.build_report(), handle, indent=4)
 
     def plot_transformations(self):
         path = join(self.dir, 'transformations.pdf')
         self.transformer.plot(path)
 
+    @property
+    def file_sources(self):
+        """All file sources of the dataset"""
+        return [source for source in self.index._sources.values()
+                if isinstance(source, FileSource)]
+
+    def merkle_tree(self):
+        """Compute the Merkle tree over the checksums of all files in
+        the dataset (see :mod:`catafolk.merkle`).
+
+        Returns
+        -------
+        catafolk.merkle.MerkleTree
+            The tree
+        """
+        checksums = {}
+        for source in self.file_sources:
+            checksums.update(source.checksums())
+        return MerkleTree.from_checksums(checksums)
+
     def checksum(self, refresh=False):
-        if refresh:
-            checksums = [file.checksum for file_id, file in self.files.items()]
-        else:
-            checksums = self._index['checksum'].tolist()
-        hash_md5 = hashlib.md5()
-        hash_md5.update(''.join(checksums).encode('utf-8'))
-        return hash_md5.hexdigest()
\ No newline at end of file
+        """The checksum of the dataset: the root hash of the Merkle tree
+        over all its files.
+
+        Parameters
+        ----------
+        refresh : bool, optional
+            If True, the checksum is computed from the files. Otherwise
+            the checksum stored when the dataset was last made is used,
+            if there is one. By default False.
+
+        Returns
+        -------
+        str
+            The checksum
+        """
+        if not refresh:
+            tree = MerkleTree.load(self.merkle_path)
+            if tree is not None:
+                return tree.hash
+        return self.merkle_tree().hash
+
+    def changes(self):
+        """Compare the files in the dataset to the files when the dataset
+        was last made, using the stored Merkle tree.
+
+        Returns
+        -------
+        (list, list)
+            The paths of all new or changed files, and of all removed
+            files, or None if no Merkle tree has been stored.
+        """
+        old_tree = MerkleTree.load(self.merkle_path)
+        if old_tree is None:
+            return None
+        return self.merkle_tree().diff(old_tree)
+
+    def config_checksum(self):
+        """The checksum of the configuration of the dataset: of the
+        configuration file, the files of all CSV sources and the 
+        mapping files used by the transformations. Together
+        with the Merkle tree of the music files (see :meth:`merkle_tree`), 
+        it determines the index.
+
+        Returns
+        -------
+        str
+            The checksum
+        """
+        config_path = self.config_path
+        if exists(self.json_config_path):
+            config_path = self.json_config_path
+        sources = self.index._sources.values()
+        paths = [config_path] + [source.path for source in sources
+                                 if isinstance(source, CSVSource)]
+        transformers = [self.transformer] + [source.id_transformer for source in sources]
+        mapping_paths = set()
+        for transformer in transformers:
+            mapping_paths.update(getattr(transformer, 'mapping_paths', []))
+        paths += [_mapping_file(path) for path in sorted(mapping_paths)]
+        return checksum_iterable(
+            f'{os.path.relpath(path, self.dir)}:{file_checksum(path) if exists(path) else ""}\n'
+            for path in paths)
+
+    def properties(self):
+        """The properties stored when the dataset was last made (see
+        :meth:`write_properties`), or an empty dictionary"""
+        if not exists(self.properties_path):
+            return {}
+        with open(self.properties_path, 'r') as handle:
+            return json.load(handle)
+
+    def outdated(self):
+        """Check whether the index has to be remade, because the files 
+        or the configuration of the dataset changed since the index was 
+        last made.
+
+        Returns
+        -------
+        str
+            The reason why the index is outdated, or None if the index
+            is up to date.
+        """
+        properties = self.properties()
+        if not exists(self.index_path) or len(properties) == 0:
+            return 'not built'
+        if 'config_checksum' not in properties:
+            return 'configuration checksum unknown'
+        if properties['config_checksum'] != self.config_checksum():
+            return 'configuration changed'
+        if len(self.file_sources) > 0:
+            changes = self.changes()
+            if changes is None:
+                return 'not built'
+            changed, removed = changes
+            if len(changed) > 0 or len(removed) > 0:
+                return f'{len(changed)} files new or changed, {len(removed)} removed'
+        return None
+
+    def write_properties(self, tree=None):
+        """Store the Merkle tree of the dataset in ``merkle.json`` and 
+        update its checksum, the number of files and the checksum of the
+        configuration (see :meth:`config_checksum`) in ``properties.json``.
+        Datasets without files only store the configuration checksum.
+
+        Parameters
+        ----------
+        tree : catafolk.merkle.MerkleTree, optional
+            The Merkle tree of the dataset, by default it is computed.
+        """
+        if tree is None and len(self.file_sources) > 0:
+            tree = self.merkle_tree()
+        properties = self.properties()
+        properties['dataset_id'] = self.dataset_id
+        if tree is not None:
+            properties['num_files'] = len(tree)
+            properties['checksum'] = tree.hash
+        properties['config_checksum'] = self.config_checksum()
+        with open(self.properties_path, 'w') as handle:
+            json.dump(properties, handle, indent=4)
+        if tree is not None:
+            tree.save(self.merkle_path)
@@ -24,6 +24,12 @@ Note that metadata is collected only once and then stored internally.
 In the code above, we accessed ``file.metadata`` twice, but the file
 was only read out once. You can reset the stored metadata using 
 :meth:`File.reset`.
+
+To avoid parsing the same files again in every new process, you can
+also store the metadata in a persistent cache 
+(see :class:`catafolk.cache.MetadataCache`):
+
+>>> file = get_file(f'{data_dir}/child01.krn', cache='metadata.sqlite') # doctest: +SKIP
 """
 
 
@@ -31,9 +37,18 @@ import os
 import re
 import xml.etree.ElementTree as ET
 from .utils import file_checksum
+from .cache import open_cache
 # Map of extensions to file formats
 _EXTENSIONS = dict(krn='kern', xml='xml')
 
+# Containers of metadata in MusicXML files, and the tags at which the
+# music (and the search for metadata) starts
+_XML_META_CONTAINERS = ['work', 'identification']
+_XML_STOP_TAGS = ['part-list', 'part']
+
+# Kern reference records of the form `!!!key: value`
+_REFERENCE_RECORD = re.compile(r'^\!{3}([^:]+):[ \t]*(.+)')
+
 def get_file(filepath, format='infer', **kwargs):
     """File factory that returns a File instance of the right type
     
@@ -67,14 +82,25 @@ class File:
     format = None
     """The file format, e.g. ``'kern'`` or ``'xml'``"""
 
+    parser_version = 1
+    """Version of the metadata parser. Increase it whenever a change to
+    the parser changes the extracted metadata, to invalidate the cache."""
+
     #TODO document properties
     
-    def __init__(self, filepath, encoding='utf-8'):
+    def __init__(self, filepath, encoding='utf-8', cache=None, checksum_cache=None,
+        cache_max_size=None):
         self.path = filepath
         if not os.path.exists(filepath):
             raise FileNotFoundError()
 
         self.encoding = encoding
+        if type(cache) == str:
+            cache = open_cache(cache, max_size=cache_max_size)
+        self.cache = cache
+        if type(checksum_cache) == str:
+            checksum_cache = open_cache(checksum_cache)
+        self.checksum_cache = checksum_cache
         filename = os.path.basename(self.path)
         self.name = os.path.splitext(filename)[0]
         self.reset()
@@ -90,23 +116,65 @@ class File:
         the path are *not* included in the metadata.
 
         Metadata is collected only once, and then stored in the 
-        class. You can reset the file using :meth:`reset`."""
+        class. You can reset the file using :meth:`reset`. If the 
+        file has a cache, the metadata is only extracted if it is
+        not in the cache yet."""
         if self._metadata is None:
-            self._metadata = self._collect_metadata()
+            if self.cache is None:
+                self._metadata = self._collect_metadata()
+            else:
+                self._metadata = self._cached_metadata()
         return self._metadata
 
+    @property
+    def parser_options(self):
+        """Options that affect the extracted metadata. These are part
+        of the key of the metadata in the cache."""
+        return dict(encoding=self.encoding)
+
+    def _cached_metadata(self):
+        """Look up the metadata in the cache, or collect and cache it"""
+        key = (self.checksum, self.format, self.parser_version)
+        metadata = self.cache.get(*key, options=self.parser_options)
+        if metadata is None:
+            metadata = self._collect_metadata()
+            self.cache.set(*key, metadata, options=self.parser_options)
+        return metadata
+
     @property
     def checksum(self):
-        """An md5 checksum of the file.
+        """An md5 checksum of the file. If the file has a cache or a
+        checksum cache, the file is only read if it changed since the
+        checksum was cached.
         
         >>> file = get_file('tests/datasets/bronson-child-ballads/data/child01.krn')
         >>> file.checksum
         '350fc2b9839d7d7669d83f77efdc03c2'
         """
         if self._checksum is None:
-            self._checksum = file_checksum(self.path)
+            self._checksum = self.digest()
         return self._checksum
 
+    def digest(self, algorithm='md5'):
+        """Return a checksum of the file using any hash algorithm 
+        supported by :mod:`hashlib`, such as ``'blake2b'``. The 
+        :attr:`checksum` always uses md5.
+
+        Parameters
+        ----------
+        algorithm : str, optional
+            The hash algorithm, by default ``'md5'``
+
+        Returns
+        -------
+        str
+            The checksum
+        """
+        cache = self.cache if self.cache is not None else self.checksum_cache
+        if cache is not None:
+            return cache.checksum(self.path, algorithm)
+        return file_checksum(self.path, algorithm)
+
     def relpath(self, root):
         """Return the relative path with respect to some
         root directory.
@@ -151,21 +219,60 @@ class KernFile(File):
     records* of the form ``!!![key]: [value]``. These are collected 
     in a dictionary. If a key is encountered multiple times, all
     values are collected in a list.
+
+    Reference records usually appear at the start of the file, but many
+    files (including the Essen collection) also have trailing reference
+    records after the data. By default, the whole file is scanned. If
+    you are only interested in the records at the start of the file, 
+    pass ``trailing_records=False``: the scan then stops at the first
+    line of data, which is much faster for long files.
+
+    >>> path = 'tests/datasets/bronson-child-ballads/data/child01.krn'
+    >>> file = get_file(path, trailing_records=False)
+    >>> file.metadata['ONM']
+    'Child Ballad No. 1, Tune No. 1'
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file
+    trailing_records : bool, optional
+        Whether to also collect reference records and comments after
+        the first line of data, by default True
+    **kwargs
+        Keyword arguments passed to :class:`File`
     """
 
     format = 'kern'
 
+    def __init__(self, filepath, trailing_records=True, **kwargs):
+        self.trailing_records = trailing_records
+        super().__init__(filepath, **kwargs)
+
+    @property
+    def parser_options(self):
+        options = super().parser_options
+        options['trailing_records'] = self.trailing_records
+        return options
+
     def _collect_metadata(self):
         """Extract metadata from a kern file."""
         metadata = {}
         with open(self.path, 'r', encoding=self.encoding) as handle:
             for line in handle:
+                # Only comments can contain metadata, the rest is data
+                if not line.startswith('!'):
+                    if self.trailing_records or line.strip() == '':
+                        continue
+                    else:
+                        break
+                
                 key = False
                 if line.startswith('!! '):
                     key = '_comments'
                     value = line[3:].strip()
-                else:
-                    match = re.match(r'^\!{3}([^:]+):[ \t]*(.+)', line)
+                elif line.startswith('!!!'):
+                    match = _REFERENCE_RECORD.match(line)
                     if match:
                         key = match[1]
                         value = match[2]
@@ -181,21 +288,87 @@ class KernFile(File):
         return metadata
 
 class XMLFile(File):
+    """A class for loading MusicXML files.
+
+    The metadata is collected from all elements in the ``<work>`` and
+    ``<identification>`` containers: the tag of every element with 
+    text is used as the key. The file is parsed incrementally and 
+    parsing stops when the ``<part-list>`` or first ``<part>`` is 
+    reached: in MusicXML, the metadata containers precede the music. 
+    This means that the time and memory needed to parse a file do not
+    depend on the size of the score.
+    """
+
     format = 'xml'
 
     def _collect_metadata(self):
+        # Text of all elements in the containers, in document order
+        texts = {tag: [] for tag in _XML_META_CONTAINERS}
+        container = None
+        container_elements = []
+        stack = []
+        with open(self.path, 'rb') as handle:
+            for event, element in ET.iterparse(handle, events=('start', 'end')):
+                if event == 'start':
+                    if container is None and element.tag in _XML_STOP_TAGS:
+                        break
+                    if container is None and element.tag in _XML_META_CONTAINERS:
+                        container = element
+                    if container is not None:
+                        container_elements.append(element)
+                    stack.append(element)
+                    continue
+
+                stack.pop()
+                if element is container:
+                    texts[container.tag].extend((el.tag, el.text) 
+                        for el in container_elements)
+                    container = None
+                    container_elements = []
+                if container is None:
+                    # Free memory: discard everything that has been parsed
+                    element.clear()
+                    if len(stack) == 1:
+                        stack[0].clear()
+
         metadata = {}
-        root = ET.parse(self.path).getroot()
-        meta_containers = ['work', 'identification']
-        for container_tag in meta_containers:
-            containers = root.iter(container_tag)
-            if containers is not None:
-                for container in containers:
-                    for element in container.iter():
-                        if type(element.text) is str and element.text.strip() != '':
-                            metadata[element.tag] = element.text
+        for container_tag in _XML_META_CONTAINERS:
+            for tag, text in texts[container_tag]:
+                if type(text) is str and text.strip() != '':
+                    metadata[tag] = text
         return metadata
 
+# Current parser versions of all formats
+PARSER_VERSIONS = {
+    KernFile.format: KernFile.parser_version,
+    XMLFile.format: XMLFile.parser_version
+}
+
+def _file_entry(file, data_dir, prefix):
+    """Returns a dictionary with the metadata of a file and the fields
+    added by the source: its path, checksum, format and name."""
+    entry = file.metadata
+    entry[f'{prefix}path'] = file.relpath(data_dir)
+    entry[f'{prefix}checksum'] = file.checksum
+    entry[f'{prefix}format'] = file.format
+    entry[f'{prefix}name'] = file.name
+    return entry
+
+def _extract_entry(path, file_options={}, data_dir=None, prefix='cf_', flush=False):
+    """Load a file and return its entry. This function is used by the
+    worker processes of :class:`catafolk.source.FileSource`. It lives 
+    in this module, rather than in :mod:`catafolk.source`, so that 
+    workers started with the ``spawn`` or ``forkserver`` method only 
+    import this module and not pandas. Worker processes do not run
+    ``atexit`` handlers, so they pass ``flush=True`` to write the 
+    pending changes to the caches right away."""
+    file = get_file(path, **file_options)
+    entry = _file_entry(file, data_dir, prefix)
+    if flush:
+        for cache in {file.cache, file.checksum_cache} - {None}:
+            cache.flush()
+    return entry
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
\ No newline at end of file
@@ -1 +1,6 @@
-from .location import Locator
\ No newline at end of file
+from .location import Locator
+from .location import LocationCache
+from .location import RateLimiter
+from .location import GeocodingBackend
+from .location import NominatimBackend
+from .location import StubBackend
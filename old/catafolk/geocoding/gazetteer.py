@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""An offline geocoding backend based on a local gazetteer. A
+:class:`Gazetteer` bulk-loads a dump in the GeoNames format (such as
+``allCountries.txt`` or ``cities500.txt`` from
+https://download.geonames.org/export/dump/) into an indexed SQLite
+database, after which locations can be resolved without any network
+requests::
+
+    python -m catafolk.geocoding.gazetteer load allCountries.txt
+    python -m catafolk.geocoding.gazetteer match "Asia, China, Shanxi, Zizhou"
+
+Locations in the indexes are hierarchical, comma-separated strings,
+from the least to the most specific place. They are matched most
+specific first: the gazetteer looks for places named ``Zizhou`` that
+lie in a country named ``China`` and a region named ``Shanxi``. If
+there is no such place, it falls back to ``Shanxi``, and so on:
+
+>>> gazetteer = Gazetteer() # doctest: +SKIP
+>>> gazetteer.match('Asia, China, Shanxi, Zizhou')['name'] # doctest: +SKIP
+'Zizhou'
+>>> locator = Locator(backend=gazetteer) # doctest: +SKIP
+
+Names are folded before they are indexed (see
+:func:`catafolk.utils.fold`), so ``Boehmen`` matches ``Böhmen``.
+The name index is a B-tree, which also supports prefix lookups
+(:meth:`Gazetteer.prefix`).
+"""
+import os
+import csv
+import sqlite3
+import logging
+import threading
+
+from ..utils import fold
+from .location import ROOT_DIR
+from .location import GeocodingBackend
+
+GAZETTEER = os.path.join(ROOT_DIR, '.cache', 'gazetteer.sqlite')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    geonameid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    altitude REAL,
+    feature_class TEXT,
+    feature_code TEXT,
+    country_code TEXT,
+    admin1_code TEXT,
+    admin2_code TEXT,
+    population INTEGER
+);
+CREATE TABLE IF NOT EXISTS names (
+    name TEXT NOT NULL,
+    geonameid INTEGER NOT NULL
+);
+"""
+
+_INDICES = """
+CREATE INDEX IF NOT EXISTS names_name ON names (name);
+CREATE INDEX IF NOT EXISTS names_geonameid ON names (geonameid);
+"""
+
+# Feature classes that are preferred when several places match equally
+# well: populated places, then administrative regions
+_CLASS_RANK = {'P': 2, 'A': 1}
+
+def normalize(name):
+    """Normalize a place name for matching
+
+    >>> normalize('  Böhmen ')
+    'boehmen'
+    >>> normalize('Sankt  Gallen')
+    'sankt gallen'
+    """
+    return ' '.join(fold(name).split())
+
+def _level(place):
+    """The administrative level of a place: 1 for countries, 2 for
+    first-order and 3 for second-order divisions, and None for all
+    other places."""
+    code = place['feature_code'] or ''
+    if code.startswith('PCL'):
+        return 1
+    if code in ('ADM1', 'ADM1H'):
+        return 2
+    if code in ('ADM2', 'ADM2H'):
+        return 3
+    return None
+
+def _contains(region, place):
+    """Whether a place lies in an administrative region"""
+    level = _level(region)
+    if level is None or not region['country_code']:
+        return False
+    keys = ['country_code', 'admin1_code', 'admin2_code'][:level]
+    return all(region[key] == place[key] for key in keys)
+
+def _float(value):
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return None if value == -9999 else value
+
+class Gazetteer(GeocodingBackend):
+    """A gazetteer stored in an SQLite database, which can be used as
+    a geocoding backend for the :class:`~catafolk.geocoding.Locator`.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the database, by default ``GAZETTEER``. Use
+        ``':memory:'`` for a temporary gazetteer.
+    """
+
+    rate = None
+
+    def __init__(self, path=GAZETTEER):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA + _INDICES)
+        self._lock = threading.Lock()
+        self._places_cache = {}
+
+    def __repr__(self):
+        return f'<Gazetteer path={self.path}>'
+
+    def __len__(self):
+        with self._lock:
+            cursor = self._connection.execute('SELECT COUNT(*) FROM places')
+            return cursor.fetchone()[0]
+
+    def load_geonames(self, path, feature_classes=('A', 'P'), min_population=0,
+        alternate_names=True, batch_size=50000):
+        """Bulk-load a GeoNames dump. Places that are already in the
+        gazetteer are replaced.
+
+        Parameters
+        ----------
+        path : str
+            Path to a tab-separated file in the GeoNames format
+        feature_classes : list, optional
+            Only load places of these feature classes, by default
+            administrative regions (``A``) and populated places (``P``).
+            If None, all places are loaded.
+        min_population : int, optional
+            Only load places with at least this population, by default 0.
+            Countries and administrative regions are always loaded.
+        alternate_names : bool, optional
+            Also index the alternate names of places, by default True
+        batch_size : int, optional
+            Number of places inserted at once, by default 50000
+
+        Returns
+        -------
+        int
+            The number of loaded places
+        """
+        num_places = 0
+        places, names = [], []
+        def insert():
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                places)
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO loaded VALUES (?)', [(p[0],) for p in places])
+            self._connection.executemany('INSERT INTO names VALUES (?, ?)', names)
+            places.clear()
+            names.clear()
+
+        with self._lock, self._connection, open(path, 'r', encoding='utf-8', newline='') as handle:
+            # Dropping the indices makes loading large dumps much faster
+            self._connection.execute('DROP INDEX IF EXISTS names_name')
+            self._connection.execute('DROP INDEX IF EXISTS names_geonameid')
+            self._connection.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS loaded (geonameid INTEGER PRIMARY KEY)')
+            # A previous load that failed halfway may have left rows behind
+            self._connection.execute('DELETE FROM loaded')
+            last_rowid = self._connection.execute(
+                'SELECT IFNULL(MAX(rowid), 0) FROM names').fetchone()[0]
+            for row in csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) < 17 or row[0].startswith('#'):
+                    continue
+                feature_class = row[6]
+                if feature_classes is not None and feature_class not in feature_classes:
+                    continue
+                population = int(row[14] or 0)
+                if population < min_population and feature_class != 'A':
+                    continue
+                altitude = _float(row[15]) if row[15] else _float(row[16])
+                geonameid = int(row[0])
+                places.append((geonameid, row[1], float(row[4]), float(row[5]),
+                    altitude, feature_class, row[7], row[8], row[10], row[11],
+                    population))
+                all_names = [row[1], row[2]]
+                if alternate_names and row[3]:
+                    all_names.extend(row[3].split(','))
+                for name in set(map(normalize, all_names)):
+                    if name:
+                        names.append((name, geonameid))
+                num_places += 1
+                if len(places) >= batch_size:
+                    insert()
+            insert()
+            # Remove the old names of all places that were replaced
+            self._connection.execute(
+                'DELETE FROM names WHERE rowid <= ? AND geonameid IN '
+                '(SELECT geonameid FROM loaded)', (last_rowid,))
+            self._connection.execute('DROP TABLE loaded')
+            self._connection.executescript(_INDICES)
+        self._places_cache = {}
+        logging.info(f'Loaded {num_places} places from {path}')
+        return num_places
+
+    def lookup(self, name):
+        """Return all places with a given name
+
+        Parameters
+        ----------
+        name : str
+            The name of the place, which is normalized (see
+            :func:`normalize`)
+
+        Returns
+        -------
+        list
+            A list of places: dictionaries with the fields of the place
+        """
+        key = normalize(name)
+        with self._lock:
+            if key not in self._places_cache:
+                cursor = self._connection.execute(
+                    'SELECT DISTINCT places.* FROM names '
+                    'JOIN places ON names.geonameid = places.geonameid '
+                    'WHERE names.name=?', (key,))
+                self._places_cache[key] = [dict(row) for row in cursor]
+            return self._places_cache[key]
+
+    def prefix(self, prefix, limit=10):
+        """Return the names that start with a prefix, ordered by the
+        population of the largest place with that name
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix, which is normalized (see :func:`normalize`)
+        limit : int, optional
+            The maximum number of names, by default 10
+
+        Returns
+        -------
+        list
+            A list of normalized names
+        """
+        start = normalize(prefix)
+        if not start:
+            return []
+        # All strings with this prefix lie in the range [start, stop)
+        stop = start[:-1] + chr(ord(start[-1]) + 1)
+        with self._lock:
+            cursor = self._connection.execute(
+                'SELECT names.name FROM names '
+                'JOIN places ON names.geonameid = places.geonameid '
+                'WHERE names.name >= ? AND names.name < ? '
+                'GROUP BY names.name ORDER BY MAX(places.population) DESC, names.name '
+                'LIMIT ?', (start, stop, limit))
+            return [row[0] for row in cursor]
+
+    def match(self, location):
+        """Find the place that best matches a hierarchical location.
+
+        The parts of the location are tried from the most to the least
+        specific. The candidates for a part are the places with that
+        name, and they are ranked by the number of less specific parts
+        that are administrative regions (countries or divisions)
+        containing the candidate. If those parts include known regions,
+        but none of them contains a candidate, the candidate is
+        rejected. Ties are broken by feature class and population.
+
+        Parameters
+        ----------
+        location : str
+            A location such as ``'Asia, China, Shanxi, Zizhou'``
+
+        Returns
+        -------
+        dict
+            The matching place, or None if no part of the location
+            matches a place
+        """
+        parts = [part for part in location.split(',') if normalize(part)]
+        regions = [[place for place in self.lookup(part) if _level(place)]
+                   for part in parts]
+        for i in range(len(parts) - 1, -1, -1):
+            candidates = self.lookup(parts[i])
+            if len(candidates) == 0:
+                continue
+            context = [places for places in regions[:i] if len(places) > 0]
+            def rank(place):
+                score = sum(any(_contains(region, place) for region in places)
+                            for places in context)
+                return (score, _CLASS_RANK.get(place['feature_class'], 0),
+                        place['population'] or 0)
+            best = max(candidates, key=rank)
+            if len(context) > 0 and rank(best)[0] == 0:
+                continue
+            return best
+        return None
+
+    def geocode(self, location):
+        place = self.match(location)
+        if place is None:
+            return None
+        return (place['latitude'], place['longitude'], place['altitude'])
+
+    def close(self):
+        """Close the database connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def main(args=None):
+    """Command line interface for the gazetteer"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m catafolk.geocoding.gazetteer',
+        description='Offline geocoding using a GeoNames gazetteer')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load_parser = subparsers.add_parser('load', help='load a GeoNames dump')
+    load_parser.add_argument('dump')
+    load_parser.add_argument('--min-population', type=int, default=0)
+    load_parser.add_argument('--all-classes', action='store_true',
+        help='load all feature classes, not only regions and populated places')
+    match_parser = subparsers.add_parser('match', help='match locations')
+    match_parser.add_argument('locations', nargs='+')
+    parser.add_argument('--path', default=GAZETTEER, help='path to the gazetteer')
+    args = parser.parse_args(args)
+
+    gazetteer = Gazetteer(args.path)
+    if args.command == 'load':
+        logging.basicConfig(level=logging.INFO)
+        feature_classes = None if args.all_classes else ('A', 'P')
+        gazetteer.load_geonames(args.dump, feature_classes=feature_classes,
+            min_population=args.min_population)
+        print(f'{len(gazetteer)} places in {gazetteer.path}')
+    else:
+        for location in args.locations:
+            place = gazetteer.match(location)
+            if place is None:
+                print(f'{location}: not found')
+            else:
+                print(f'{location}: {place["name"]} ({place["feature_code"]}, '
+                      f'{place["country_code"]}) {place["latitude"]}, {place["longitude"]}')
+    gazetteer.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,95 +1,413 @@
-from geopy.geocoders import Nominatim
-import pandas as pd
-import time
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Geocoding locations: finding the coordinates of place names such as
+``'Deutschland, Altmark'``. The :class:`Locator` answers as many
+locations as possible from a local :class:`LocationCache`, and sends the
+remaining ones to a geocoding backend, such as Nominatim (see
+:class:`NominatimBackend`). Requests are made by several threads at the
+same time, but never faster than the rate limit of the service:
+
+>>> locator = Locator(backend=StubBackend({'Amsterdam': (52.37, 4.89, 0.0)}),
+...                   cache=':memory:', corrections=None)
+>>> locator.coordinates_many(['Amsterdam', 'Atlantis', 'Amsterdam'])
+{'Amsterdam': (52.37, 4.89), 'Atlantis': (None, None)}
+
+Locations that could not be found are cached as well, so they are
+not looked up again (unless ``refresh=True``). Manual corrections in
+``location-corrections.csv`` always override the cache.
+
+By default the locator does not use a backend at all, and only looks
+locations up in the cache. The cache used to be a CSV file,
+``location-cache.csv``; its contents are imported when the cache
+database is created.
+"""
 import os
+import time
+import sqlite3
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+import pandas as pd
 
 CUR_DIR = os.path.dirname(__file__)
-CACHE = os.path.join(CUR_DIR, 'location-cache.csv')
+ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir, os.path.pardir))
+CACHE = os.path.join(ROOT_DIR, '.cache', 'locations.sqlite')
+LEGACY_CACHE = os.path.join(CUR_DIR, 'location-cache.csv')
 CORRECTIONS = os.path.join(CUR_DIR, 'location-corrections.csv')
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    location TEXT PRIMARY KEY,
+    latitude REAL,
+    longitude REAL,
+    altitude REAL,
+    updated REAL NOT NULL
+);
+"""
+
+# SQLite limits the number of parameters in a query
+_BATCH_SIZE = 500
+
+def _value(value):
+    return None if pd.isnull(value) else float(value)
+
+class LocationCache(object):
+    """A cache of geocoded locations, stored in an SQLite database.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the database, by default ``CACHE``. Use ``':memory:'``
+        for a temporary cache.
+    legacy_cache : str, optional
+        A CSV file with cached locations that is imported when the
+        database is created, by default ``LEGACY_CACHE``
+    """
+
+    def __init__(self, path=CACHE, legacy_cache=LEGACY_CACHE):
+        self.path = path
+        is_new = path == ':memory:' or not os.path.exists(path)
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        if is_new and legacy_cache is not None and os.path.exists(legacy_cache):
+            num_imported = self.import_csv(legacy_cache)
+            logging.info(f'Imported {num_imported} locations from {legacy_cache}')
+
+    def __repr__(self):
+        return f'<LocationCache path={self.path}>'
+
+    def __len__(self):
+        with self._lock:
+            cursor = self._connection.execute('SELECT COUNT(*) FROM locations')
+            return cursor.fetchone()[0]
+
+    def __contains__(self, location):
+        return location in self.get_many([location])
+
+    def get_many(self, locations):
+        """Look up many locations at once
+
+        Parameters
+        ----------
+        locations : list
+            The locations
+
+        Returns
+        -------
+        dict
+            A dictionary mapping all cached locations to a tuple
+            ``(latitude, longitude, altitude)``. The coordinates of
+            locations that could not be geocoded are None.
+        """
+        locations = list(locations)
+        results = {}
+        with self._lock:
+            for i in range(0, len(locations), _BATCH_SIZE):
+                batch = locations[i:i + _BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                cursor = self._connection.execute(
+                    'SELECT location, latitude, longitude, altitude FROM locations '
+                    f'WHERE location IN ({placeholders})', batch)
+                for location, *coordinates in cursor:
+                    results[location] = tuple(coordinates)
+        return results
+
+    def set_many(self, results):
+        """Store geocoded locations
+
+        Parameters
+        ----------
+        results : dict
+            A dictionary mapping locations to a tuple ``(latitude,
+            longitude, altitude)``, or to None if the location could
+            not be found
+        """
+        now = time.time()
+        rows = []
+        for location, coordinates in results.items():
+            if coordinates is None:
+                coordinates = (None, None, None)
+            rows.append((location,) + tuple(map(_value, coordinates)) + (now,))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO locations VALUES (?, ?, ?, ?, ?)', rows)
+
+    def clear(self):
+        """Remove all locations from the cache"""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM locations')
+
+    def import_csv(self, path):
+        """Import locations from a CSV file with columns ``location``,
+        ``latitude``, ``longitude`` and ``altitude``. Returns the
+        number of imported locations."""
+        df = pd.read_csv(path)
+        results = {row.location: (row.latitude, row.longitude, row.altitude)
+                   for row in df.itertuples()}
+        self.set_many(results)
+        return len(results)
+
+    def export_csv(self, path):
+        """Export the cache to a CSV file, sorted by location"""
+        with self._lock:
+            df = pd.read_sql_query(
+                'SELECT location, latitude, longitude, altitude FROM locations '
+                'ORDER BY location', self._connection)
+        df.to_csv(path, index=False)
+
+    def close(self):
+        """Close the database connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+class RateLimiter(object):
+    """A thread-safe token bucket rate limiter. Tokens are added at a
+    fixed rate, up to a maximum of ``burst`` tokens. Every request has
+    to acquire a token first.
+
+    >>> limiter = RateLimiter(rate=100, burst=1)
+    >>> start = time.monotonic()
+    >>> for _ in range(5): limiter.acquire()
+    >>> time.monotonic() - start >= 0.04
+    True
+
+    Parameters
+    ----------
+    rate : float
+        The number of tokens added per second
+    burst : int, optional
+        The maximum number of tokens, by default 1
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError('The rate should be positive')
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst,
+                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class GeocodingBackend(object):
+    """Base class of geocoding services"""
+
+    rate = None
+    """The maximum number of requests per second, or None if unlimited"""
+
+    def geocode(self, location):
+        """Geocode a single location
+
+        Returns
+        -------
+        tuple
+            A tuple ``(latitude, longitude, altitude)``, or None if
+            the location could not be found.
+        """
+        raise NotImplementedError()
+
+class NominatimBackend(GeocodingBackend):
+    """Geocoding using the OpenStreetMap Nominatim service. Its usage
+    policy allows at most one request per second. Requires geopy.
+
+    Parameters
+    ----------
+    user_agent : str, optional
+        The user agent sent to Nominatim, by default ``'catafolk'``
+    timeout : float, optional
+        Timeout of the requests in seconds, by default 10
+    """
+
+    rate = 1.0
+
+    def __init__(self, user_agent='catafolk', timeout=10):
+        from geopy.geocoders import Nominatim
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, location):
+        loc = self.geolocator.geocode(location, exactly_one=True)
+        if loc is None:
+            return None
+        return (loc.latitude, loc.longitude, loc.altitude)
+
+class StubBackend(GeocodingBackend):
+    """An offline backend that looks locations up in a dictionary.
+    Useful for testing.
+
+    Parameters
+    ----------
+    locations : dict
+        A dictionary mapping locations to ``(latitude, longitude,
+        altitude)`` tuples
+    delay : float, optional
+        Time in seconds that every request takes, by default 0
+    """
+
+    def __init__(self, locations={}, delay=0):
+        self.locations = dict(locations)
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def geocode(self, location):
+        with self._lock:
+            self.requests.append(location)
+        if self.delay > 0:
+            time.sleep(self.delay)
+        return self.locations.get(location)
+
 class Locator(object):
-    def __init__(self, sleep=1, cache=CACHE, corrections=CORRECTIONS):
-        self.geolocator = Nominatim(user_agent="catafolk")
-        self.cache = {}
-        self.sleep = sleep
-        self.cache_path = cache
+    """Find the coordinates of locations.
+
+    Parameters
+    ----------
+    backend : GeocodingBackend, optional
+        The geocoding service used for locations that are not cached.
+        By default None: only cached locations are found.
+    cache : str or LocationCache, optional
+        The cache, or the path to the cache database, by default ``CACHE``
+    corrections : str, optional
+        A CSV file with corrected coordinates, which override the cache,
+        by default ``CORRECTIONS``
+    rate : float, optional
+        The maximum number of requests per second, by default the rate
+        of the backend
+    num_workers : int, optional
+        The number of threads making requests, by default 4
+    """
+
+    write_every = 50
+    """Number of lookups after which the results are written to the cache"""
+
+    def __init__(self, backend=None, cache=CACHE, corrections=CORRECTIONS,
+        rate=None, num_workers=4):
+        self.backend = backend
+        if not isinstance(cache, LocationCache):
+            cache = LocationCache(cache)
+        self.cache = cache
+        if rate is None and backend is not None:
+            rate = backend.rate
+        self.rate_limiter = RateLimiter(rate) if rate is not None else None
+        self.num_workers = num_workers
         self.corrections_path = corrections
-        self.load_cache()
-    
+        self.corrections = self._load_corrections(corrections)
+
+    @staticmethod
+    def _load_corrections(path):
+        corrections = {}
+        if path is not None and os.path.exists(path):
+            df = pd.read_csv(path)
+            for row in df.itertuples():
+                corrections[row.location] = (row.latitude, row.longitude)
+        return corrections
+
     def coordinates(self, location, refresh=False):
-        if refresh or location not in self.cache:
-            result = self.lookup(location)
-            if result == False:
-                return (None, None)
-        loc = self.cache[location]
-        return loc['longitude'], loc['latitude']
-        return (latitude, longitude)
-
-    def lookup(self, location):
-        # Temporarily disable
-        return False
+        """Return the coordinates of a location. See :meth:`coordinates_many`.
 
-        loc = self.geolocator.geocode(location, exactly_one=True)
-        self.cache[location] = {
-            'location': location,
-            'latitude': loc.latitude if loc is not None else None,
-            'longitude': loc.longitude if loc is not None else None,
-            'altitude': loc.altitude if loc is not None else None,
-            # 'address': loc.address if loc is not None else None,
-            # 'bbox': loc.raw.boundingbox if loc is not None else None
-        }
-        logging.info(f'Looked up {location}')
-        time.sleep(self.sleep)
-        return True
-        
-    def load_cache(self):
-        cache = {}
-        if os.path.exists(self.cache_path):
-            cache_df = pd.read_csv(self.cache_path)
-            cache_df.index = cache_df['location']
-            cache = cache_df.T.to_dict()
-
-        # Load corrections that override the cache
-        if os.path.exists(self.corrections_path):
-            corrections_df = pd.read_csv(self.corrections_path).set_index('location')
-            for loc, (lat, long, alt) in corrections_df.iterrows():
-                if loc not in cache:
-                    cache[loc] = {}
-                    cache[loc]['location'] = loc
-                if not pd.isnull(lat):
-                    cache[loc]['latitude'] = lat
-                if not pd.isnull(long):
-                    cache[loc]['longitude'] = long
-                if not pd.isnull('altitude'):
-                    cache[loc]['altitude'] = alt
-
-        self.cache = cache    
-    
-    def save_cache(self):
-        if len(self.cache) == 0:
-            with open(self.cache_path, 'w') as handle:
-                handle.write('location,latitude,longitude,altitude')
-        else:
-            df = pd.DataFrame(self.cache).T.set_index('location')
-            df.sort_index(inplace=True)
-            df.to_csv(self.cache_path)
+        Returns
+        -------
+        tuple
+            A tuple ``(latitude, longitude)``, or ``(None, None)`` if the
+            location could not be found.
+        """
+        return self.coordinates_many([location], refresh=refresh)[location]
+
+    def coordinates_many(self, locations, refresh=False):
+        """Return the coordinates of many locations. Every location is
+        looked up only once, first in the cache and then, if the locator
+        has a backend, using the backend.
+
+        Parameters
+        ----------
+        locations : iterable
+            The locations. Missing values (None or NaN) are skipped.
+        refresh : bool, optional
+            Look up all locations using the backend, also if they are
+            cached. By default False.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping every location to a tuple ``(latitude,
+            longitude)``. Both are None if the location was not found.
+        """
+        unique = [loc for loc in dict.fromkeys(locations) if not pd.isnull(loc)]
+        results = {}
+        if not refresh:
+            for location, (latitude, longitude, _) in self.cache.get_many(unique).items():
+                results[location] = (latitude, longitude)
+        misses = [loc for loc in unique if loc not in results]
+        if len(misses) > 0 and self.backend is not None:
+            for location, coordinates in self._lookup_many(misses).items():
+                results[location] = coordinates[:2] if coordinates else (None, None)
+
+        coordinates = {}
+        for location in unique:
+            latitude, longitude = results.get(location, (None, None))
+            if location in self.corrections:
+                corrected_lat, corrected_long = self.corrections[location]
+                if not pd.isnull(corrected_lat):
+                    latitude = corrected_lat
+                if not pd.isnull(corrected_long):
+                    longitude = corrected_long
+            coordinates[location] = (_value(latitude), _value(longitude))
+        return coordinates
+
+    def _lookup(self, location):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return self.backend.geocode(location)
+
+    def _lookup_many(self, locations):
+        """Geocode locations using the backend. Results are written to
+        the cache as they come in; failed requests are not cached. Returns
+        a dictionary mapping locations to the results of the backend."""
+        results = {}
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            futures = {executor.submit(self._lookup, loc): loc for loc in locations}
+            for future in as_completed(futures):
+                location = futures[future]
+                try:
+                    coordinates = future.result()
+                except Exception as e:
+                    logging.warning(f'Geocoding {location} failed: {e}')
+                    continue
+                logging.info(f'Looked up {location}')
+                results[location] = coordinates
+                pending[location] = coordinates
+                if len(pending) >= self.write_every:
+                    self.cache.set_many(pending)
+                    pending = {}
+        if len(pending) > 0:
+            self.cache.set_many(pending)
+        return results
 
     def clear_cache(self):
-        self.cache = {}
-        self.save_cache()
-
-# if __name__ == '__main__':
-#     L = Locator()
-#     locations = ["175 5th Avenue NYC", "Amsterdam", "Amsterdam", "Paris", "Amsterdam"]
-#     L.load_cache()
-    
-#     for loc in locations:
-#         print(L.coordinates(loc))
-#     L.clear_cache()
-#     L.save_cache()
-
-    
-    # get_coordinates(locations)
-    # print(location.address)
-    # print(location)
\ No newline at end of file
+        """Remove all locations from the cache"""
+        self.cache.clear()
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
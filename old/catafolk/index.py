@@ -4,22 +4,247 @@
 # Copyright © 2020 Bas Cornelissen
 # -------------------------------------------------------------------
 import os
+import itertools
+import contextlib
+import numpy as np
 import pandas as pd
+from pandas.api.extensions import take
+from pandas.api.types import is_bool_dtype
+from pandas.api.types import is_numeric_dtype
 import logging
 
 from .source import *
+from .instrument import NULL_INSTRUMENT
 
 # TODO test for duplicate keys and raise error if this 
 
+# File extensions of the supported binary stores
+_STORE_EXTENSIONS = {
+    'feather': '.feather',
+    'parquet': '.parquet',
+}
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Binary index stores require pyarrow. '
+                          'Install it using `pip install pyarrow`.')
+    return pyarrow
+
+def _arrow_compatible(df):
+    """Return a copy of an index dataframe that can be converted to an
+    Arrow table: the ids are moved to a regular column ``id`` and object
+    columns holding values of incompatible types (say, strings and
+    booleans) are converted to strings, just like they would be when
+    written to and read from a CSV file. A multi-index is moved to
+    regular columns as well."""
+    pa = _import_pyarrow()
+    if df.index.nlevels == 1:
+        df = df.rename_axis('id')
+    df = df.reset_index()
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            values = df[column]
+            df[column] = values.where(values.isna(), values.astype(str))
+    return df
+
+def _batches(iterable, batch_size):
+    """Split an iterable in lists of at most ``batch_size`` items
+
+    >>> list(_batches(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if len(batch) == 0:
+            return
+        yield batch
+
+def _column_names(source, columns):
+    """The names of the columns of a source in the collected data"""
+    if source.name == '':
+        return list(columns)
+    return [f'{source.name}.{col}' for col in columns]
+
+def _with_missing_values(df):
+    """Convert integer and boolean columns to the dtypes they get when
+    missing values are introduced, e.g. by an outer join, so that the
+    values are the same whether or not any values are missing.
+
+    >>> df = pd.DataFrame({'a': [1, 2], 'b': [True, False], 'c': [0.5, 1.5]})
+    >>> _with_missing_values(df).dtypes.to_list()
+    [dtype('float64'), dtype('O'), dtype('float64')]
+    """
+    df = df.copy()
+    for column in df.columns:
+        if is_bool_dtype(df[column].dtype):
+            df[column] = df[column].astype(object)
+        elif is_numeric_dtype(df[column].dtype) and df[column].dtype.kind in 'iu':
+            df[column] = df[column].astype('float64')
+    return df
+
+def _merge_indexes(indexes):
+    """Merge sorted indexes into their sorted union. This is a 
+    multi-way merge that folds the indexes in one by one, using a 
+    sorted merge join (:meth:`pandas.Index.join`) for every step.
+
+    Returns
+    -------
+    (pandas.Index, list)
+        The union and, for every index, an array with the position in 
+        that index of every id in the union, or -1 where it is missing
+
+    >>> union, rows = _merge_indexes([pd.Index(['a', 'c', 'd']), pd.Index(['b', 'c'])])
+    >>> union.to_list()
+    ['a', 'b', 'c', 'd']
+    >>> [row.tolist() for row in rows]
+    [[0, -1, 1, 2], [-1, 0, 1, -1]]
+    """
+    union = indexes[0]
+    rows = [np.arange(len(union))]
+    for index in indexes[1:]:
+        union, left, right = union.join(index, how='outer', return_indexers=True)
+        if left is not None:
+            rows = [np.where(left >= 0, row[left], -1) for row in rows]
+        rows.append(right if right is not None else np.arange(len(union)))
+    return union, rows
+
+def _take_rows(df, rows, index):
+    """Select rows of a dataframe by their position, and give them a 
+    new index. Position -1 selects a missing value, in which case
+    integer and boolean columns are converted as in 
+    :func:`_with_missing_values`. Columns with the same numpy dtype 
+    are copied one by one into a single array, so that the result
+    does not have to be consolidated afterwards.
+
+    >>> df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    >>> _take_rows(df, np.array([1, -1, 0]), pd.Index(['i', 'j', 'k']))
+         a    b
+    i  2.0    y
+    j  NaN  NaN
+    k  1.0    x
+    """
+    if len(df.columns) == 0:
+        return pd.DataFrame(index=index)
+    missing = rows < 0
+    has_missing = missing.any()
+    groups = {}
+    for position, dtype in enumerate(df.dtypes):
+        groups.setdefault(dtype, []).append(position)
+
+    frames = []
+    order = []
+    for dtype, positions in groups.items():
+        if isinstance(dtype, np.dtype):
+            if has_missing and dtype.kind in 'iu':
+                dtype = np.dtype('float64')
+            elif has_missing and dtype.kind == 'b':
+                dtype = np.dtype(object)
+            values = np.empty((len(index), len(positions)), dtype=dtype, order='F')
+            # If no rows are selected (e.g. the dataframe is empty),
+            # all values are missing and there is nothing to take
+            if not missing.all():
+                for i, position in enumerate(positions):
+                    values[:, i] = df.iloc[:, position].to_numpy().take(rows, mode='clip')
+            if has_missing:
+                values[missing] = np.datetime64('NaT') if dtype.kind in 'mM' else np.nan
+            frame = pd.DataFrame(values, index=index, dtype=dtype, copy=False)
+        else:
+            frame = pd.DataFrame({i: pd.Series(take(df.iloc[:, position].array, 
+                rows, allow_fill=True), index=index, copy=False) 
+                for i, position in enumerate(positions)})
+        frames.append(frame)
+        order.extend(positions)
+
+    result = pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+    if order != sorted(order):
+        result = result.iloc[:, np.argsort(order)]
+    result.columns = df.columns
+    return result
+
+def _set_values(values, position, updates):
+    """Set ``values[position] = updates`` for all updates that are not
+    missing, converting the values to a common dtype if needed."""
+    notna = pd.notna(updates)
+    if not notna.any():
+        return values
+    if values.dtype != updates.dtype:
+        numeric = [is_numeric_dtype(v.dtype) and not is_bool_dtype(v.dtype)
+                   for v in [values, updates]]
+        dtype = 'float64' if all(numeric) else object
+        values = np.asarray(values, dtype=dtype)
+        updates = np.asarray(updates, dtype=dtype)
+    values[position[notna]] = updates[notna]
+    return values
+
 class Index():
-    def __init__(self, path, fields=[], transformer=None):
+    """An index of all entries in a dataset.
+
+    Parameters
+    ----------
+    path : str
+        Path to the index CSV file
+    fields : list, optional
+        The fields (columns) of the index
+    transformer : callable, optional
+        A transformer that maps collected entries to index entries
+    path_field : str, optional
+        The index field holding the path of the file from which an
+        entry was extracted. Used for incremental updates, by default
+        ``'file_path'``
+    checksum_field : str, optional
+        The index field holding the checksum of that file. Used for
+        incremental updates, by default ``'file_checksum'``
+    columnar : bool, optional
+        Whether to transform all entries at once (see 
+        :meth:`catafolk.transformer.Transformer.transform_columns`)
+        rather than one by one. By default True.
+    store : str, optional
+        Also store the index in a binary columnar format, either
+        ``'feather'`` or ``'parquet'``, next to the CSV file (e.g. 
+        ``index.feather`` next to ``index.csv``). The index is then 
+        loaded from the binary store, which is much faster and allows
+        loading only some of the columns (see :meth:`load`). The CSV
+        file remains the canonical export and is generated from the 
+        binary store. If the CSV file is newer than the store, e.g. 
+        because it was edited by hand, the store is regenerated from 
+        it when the index is loaded. Feather files are written 
+        uncompressed, so that they can be memory mapped without 
+        decompressing them first; Parquet files are smaller, but have
+        to be decoded when loaded. Requires pyarrow. By default None: 
+        only CSV.
+    instrument : catafolk.instrument.Instrument, optional
+        Records the time and memory used by every stage of 
+        :meth:`make`. By default instrumentation is disabled.
+    """
+    def __init__(self, path, fields=[], transformer=None, 
+        path_field='file_path', checksum_field='file_checksum',
+        columnar=True, store=None, instrument=None):
+        if store is not None and store not in _STORE_EXTENSIONS:
+            raise ValueError(f'Unknown index store "{store}". Choose one of: '
+                             f'{", ".join(_STORE_EXTENSIONS)}')
         self.path = path
+        self.store = store
+        self.store_path = None
+        if store is not None:
+            self.store_path = os.path.splitext(path)[0] + _STORE_EXTENSIONS[store]
+        self.columnar = columnar
+        self.instrument = instrument if instrument is not None else NULL_INSTRUMENT
+        self.path_field = path_field
+        self.checksum_field = checksum_field
         self.transformer = transformer
         self.fields = fields
         if 'id' not in fields:
             self.fields = ['id'] + fields
         self._sources = {}
         self._data = None
+        self.unmatched_ids = {}
 
     @property
     def sources(self):
@@ -30,7 +255,18 @@ class Index():
     
     @property
     def has_file(self):
-        return os.path.exists(self.path)
+        return os.path.exists(self.path) or self.has_store
+
+    @property
+    def has_store(self):
+        """Whether the binary store of the index exists"""
+        return self.store is not None and os.path.exists(self.store_path)
+
+    @property
+    def store_outdated(self):
+        """Whether the CSV file was modified after the binary store"""
+        return (self.has_store and os.path.exists(self.path)
+            and os.stat(self.path).st_mtime_ns > os.stat(self.store_path).st_mtime_ns)
 
     @property
     def data(self):
@@ -50,48 +286,251 @@ class Index():
         self._data = pd.DataFrame([], columns=self.fields)
         self._data.set_index('id', inplace=True)
     
-    def load(self):
-        if os.path.exists(self.path):
-            self._data = pd.read_csv(self.path, index_col='id')
+    def load(self, columns=None):
+        """Load the index from disk. The binary store is used if it
+        exists, otherwise the CSV file. If the CSV file is newer than
+        the store, the store is first regenerated from the CSV file.
+
+        Parameters
+        ----------
+        columns : list, optional
+            Load only these columns (the ids are always loaded). The 
+            binary stores only read the requested columns from disk, 
+            using memory mapping. A partially loaded index is returned,
+            but is not kept as the :attr:`data` of the index, so that 
+            it cannot accidentally be saved. By default all columns 
+            are loaded.
+
+        Returns
+        -------
+        pd.DataFrame
+            The index
+        """
+        if columns is not None:
+            columns = ['id'] + [col for col in columns if col != 'id']
+        if self.store_outdated:
+            logging.info(f'The index {self.path} is newer than its store: '
+                          'regenerating the store')
+            self._write_store(pd.read_csv(self.path, index_col='id'))
+            self._touch_store()
+        if self.has_store:
+            data = self._read_store(columns)
+        elif os.path.exists(self.path):
+            data = pd.read_csv(self.path, index_col='id', usecols=columns)
         else:
             raise FileNotFoundError('Index file does not exist. Update the index.') 
+        if columns is None:
+            self._data = data
+        return data
+
+    def _read_store(self, columns=None):
+        _import_pyarrow()
+        if self.store == 'feather':
+            from pyarrow import feather
+            table = feather.read_table(self.store_path, columns=columns, 
+                                       memory_map=True)
+        else:
+            from pyarrow import parquet
+            table = parquet.read_table(self.store_path, columns=columns, 
+                                       memory_map=True)
+        return table.to_pandas().set_index('id')
 
     def save(self):
-        self.data.to_csv(self.path, index=True)
+        if self.store is None:
+            self.data.to_csv(self.path, index=True)
+        else:
+            self._write_store(self.data)
+            self.export_csv()
+
+    def _write_store(self, df):
+        """Write a dataframe to the binary store"""
+        pa = _import_pyarrow()
+        table = pa.Table.from_pandas(_arrow_compatible(df), preserve_index=False)
+        if self.store == 'feather':
+            from pyarrow import feather
+            # Compressed files cannot be memory mapped (see `load`)
+            feather.write_feather(table, self.store_path, compression='uncompressed')
+        else:
+            from pyarrow import parquet
+            parquet.write_table(table, self.store_path)
+
+    def export_csv(self, path=None):
+        """Export the binary store of the index to a CSV file.
+
+        Parameters
+        ----------
+        path : str, optional
+            The path of the CSV file, by default the path of the index
+        """
+        if path is None:
+            path = self.path
+        self._read_store().to_csv(path, index=True)
+        if os.path.abspath(path) == os.path.abspath(self.path):
+            self._touch_store()
+
+    def _touch_store(self):
+        """Give the store the modification time of the CSV file, as 
+        they contain the same data (see :attr:`store_outdated`)"""
+        stat = os.stat(self.path)
+        os.utime(self.store_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
     
     def clear(self):
-        if self.has_file:
+        if os.path.exists(self.path):
             os.remove(self.path)
+        if self.has_store:
+            os.remove(self.store_path)
         self._data = None
 
-    def update(self, df, **kwargs):
+    def remove(self, ids):
+        """Remove entries from the index
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the entries to remove
+        """
+        self._data = self.data.drop(index=ids)
+
+    def update(self, df, missing='keep'):
+        """Insert or update entries (an 'upsert'), matching them by id.
+        Values in ``df`` overwrite the values in the index, except for 
+        missing values (NaN), which never overwrite existing values. 
+        Entries with new ids are added at the end of the index.
+
+        The update is a single pass over every column that does not 
+        copy the index as a whole, so that it scales linearly with the 
+        size of the index.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The new entries, indexed by id. Columns that are not 
+            fields of the index are ignored.
+        missing : str, optional
+            What to do with entries in the index whose id does not 
+            appear in ``df``: ``'keep'`` them (default) or ``'drop'`` 
+            them, so that the index contains exactly the ids in ``df``.
+
+        Raises
+        ------
+        ValueError
+            If ``df`` contains duplicate ids
+        """
+        if missing not in ['keep', 'drop']:
+            raise ValueError(f'Unknown policy for missing entries "{missing}": '
+                             'use "keep" or "drop"')
+        if df.index.has_duplicates:
+            duplicates = df.index[df.index.duplicated()].unique()
+            raise ValueError(f'Duplicate ids: {", ".join(map(str, duplicates[:10]))}')
+
         columns = [col for col in df.columns if col in self.fields]
-        subset = df[columns]
+        current = self.data
 
-        updates = subset.index.intersection(self.data.index)
-        self.data.update(subset.loc[updates, :])
+        # Match the ids only once: `position` holds the row of every 
+        # new entry in the updated index, `indexer` the row of every 
+        # entry of the updated index in the current index (or -1)
+        position = current.index.get_indexer(df.index)
+        is_new = position == -1
+        if missing == 'drop':
+            keep = np.zeros(len(current), dtype=bool)
+            keep[position[~is_new]] = True
+            indexer = np.flatnonzero(keep)
+            position[~is_new] = (np.cumsum(keep) - 1)[position[~is_new]]
+            index = current.index[keep]
+        else:
+            indexer = np.arange(len(current))
+            index = current.index
+        position[is_new] = len(indexer) + np.arange(is_new.sum())
+        index = index.append(df.index[is_new])
+        index.name = 'id'
+        indexer = np.concatenate([indexer, np.full(is_new.sum(), -1)])
 
-        new_entries = subset.index.difference(self.data.index)
-        self._data = self.data.append(subset.loc[new_entries,:])
+        data = {}
+        for column in current.columns:
+            values = take(current[column].array, indexer, allow_fill=True)
+            if column in columns:
+                values = _set_values(values, position, df[column].array)
+            data[column] = values
+        if any(column not in data for column in columns):
+            df_indexer = np.full(len(index), -1)
+            df_indexer[position] = np.arange(len(df))
+            for column in columns:
+                if column not in data:
+                    data[column] = take(df[column].array, df_indexer, allow_fill=True)
+        self._data = pd.DataFrame(data, index=index, columns=list(data.keys()))
 
     def collect(self, fields=None):
-        dataframes = []
+        """Combine the data of all sources into a single dataframe, 
+        with one row for every id that occurs in any of the sources.
+        The columns are named after the source, e.g. ``csv.col1``.
+
+        The sources are combined using a sorted merge of their 
+        indices, which are sorted already (see 
+        :attr:`catafolk.source.BaseSource.data`), after which the rows
+        of every source are copied once into the result. The ids that 
+        only occur in one of several sources are stored in 
+        :attr:`unmatched_ids`: a dictionary from the source name to 
+        those ids.
+        """
+        sources = list(self.sources.values())
+        self.unmatched_ids = {}
+        if len(sources) == 0:
+            return pd.DataFrame(index=pd.Index([], name='id'))
+
+        for source in sources:
+            if not source.data.index.is_unique:
+                duplicates = source.data.index[source.data.index.duplicated()]
+                raise ValueError(f'Source "{source.name}" contains duplicate '
+                                 f'ids: {", ".join(map(str, duplicates.unique()[:5]))}')
+        ids, rows = _merge_indexes([source.data.index for source in sources])
+        ids = ids.rename('id')
+
+        frames = []
         columns = []
-        for name, source in self.sources.items():
-            if name != '':
-                columns.extend([f'{name}.{col}' for col in source.data.columns])
+        for source, row in zip(sources, rows):
+            columns.extend(_column_names(source, source.data.columns))
+            if len(row) == len(source.data) and (row == np.arange(len(row))).all():
+                # The source contains all ids, in the same order
+                frames.append(source.data.set_axis(ids))
             else:
-                columns.extend(source.data.columns)
-            dataframes.append(source.data)
-        df = pd.concat(dataframes, axis=1, join='outer')
+                frames.append(_take_rows(source.data, row, ids))
+        df = pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
         df.columns = columns
-        df.index.name = 'id'
+
+        if len(sources) > 1:
+            num_sources = sum(row >= 0 for row in rows)
+            for source, row in zip(sources, rows):
+                unmatched = ids[(num_sources == 1) & (row >= 0)]
+                self.unmatched_ids[source.name] = unmatched
+                if len(unmatched) > 0:
+                    logging.info(f'{len(unmatched)} ids only occur in source '
+                                 f'"{source.name}", e.g. {unmatched[0]}')
         return df
 
-    def transform(self, df):
+    def transform(self, df, columnar=None):
+        """Transform the collected entries using the transformer
+        
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The collected entries
+        columnar : bool, optional
+            Transform all entries at once, rather than one by one. The
+            results are the same. Defaults to the ``columnar`` attribute
+            of the index.
+        
+        Returns
+        -------
+        pd.DataFrame
+            The transformed entries
+        """
         if self.transformer is None:
             logging.warn('This index has no transformer; returning dataframe')
             return df
+        if columnar is None:
+            columnar = self.columnar
+        if columnar:
+            return self._transform_columnar(df)
 
         transformed_entries = []
         for entry_id, row in df.iterrows():
@@ -106,13 +545,267 @@ class Index():
         transformed_df = pd.DataFrame(transformed_entries).set_index('id')
         return transformed_df
 
-    def make(self):
-        data = self.collect()
+    def _transform_columnar(self, df):
+        # Extract columns exactly like `df.iterrows()` and `to_dict()`
+        # would extract the values of every row
+        values = df.values
+        columns = {}
+        for j, column in enumerate(df.columns):
+            columns[column] = [v.item() if isinstance(v, np.generic) else v 
+                               for v in values[:, j]]
+        ids = list(df.index)
+        columns['id'] = ids
+        
+        outputs, errors = self.transformer.transform_columns(columns, len(ids))
+        for i, error in sorted(errors.items()):
+            print(f'Transforming {ids[i]} failed: {error}')
+        
+        keep = [i for i in range(len(ids)) if i not in errors]
+        del outputs['id']
+        if len(errors) > 0:
+            outputs = {name: [values[i] for i in keep] 
+                       for name, values in outputs.items()}
+        index = pd.Index([ids[i] for i in keep], name='id')
+        return pd.DataFrame(outputs, index=index)
+
+    def changes(self):
+        """Compare the files of all file sources to the entries in the
+        index, using the checksums of the files.
+
+        Returns
+        -------
+        (list, list)
+            The paths of all new or changed files, and the paths of all
+            files in the index that no longer exist.
+        """
+        current = {}
+        for source in self.sources.values():
+            if isinstance(source, FileSource):
+                current.update(source.checksums())
+
+        stored = self.data[[self.path_field, self.checksum_field]].dropna()
+        stored = dict(zip(stored[self.path_field], stored[self.checksum_field]))
+        changed = [path for path, checksum in current.items()
+                   if str(stored.get(path)) != checksum]
+        removed = [path for path in stored.keys() if path not in current]
+        return changed, removed
+
+    def _supports_incremental_updates(self):
+        has_file_sources = any(isinstance(source, FileSource) 
+                               for source in self.sources.values())
+        has_fields = (self.path_field in self.data.columns 
+                      and self.checksum_field in self.data.columns)
+        return self.has_file and has_file_sources and has_fields
+
+    def make(self, incremental=False, changes=None, streaming=False, batch_size=1000):
+        """Collect, transform and store all entries. The stages 
+        (``extraction``, ``collect``, ``transform``, ``update`` and 
+        ``save``) are recorded by the :attr:`instrument`.
+        
+        Parameters
+        ----------
+        incremental : bool, optional
+            If True, only files that are new or have changed since the
+            index was last made are (re)extracted and transformed, and 
+            entries of files that no longer exist are removed. Changes 
+            to other sources or to the transformations are not detected.
+            By default False.
+        changes : (list, list), optional
+            For incremental updates: the paths of all new or changed 
+            files and of all removed files, if they are already known
+            (e.g. from a Merkle tree). By default they are determined
+            using :meth:`changes`.
+        streaming : bool, optional
+            Make the index in batches of ``batch_size`` entries, so that
+            memory use is bounded by the batch size rather than the size
+            of the dataset (see :meth:`make_streaming`). Ignored for 
+            incremental updates. By default False.
+        batch_size : int, optional
+            The number of entries per batch when streaming, by default 
+            1000
+        """
+        if incremental:
+            if self._supports_incremental_updates():
+                return self._make_incremental(changes)
+            logging.warning('Incremental updates are not possible: '
+                'making the full index instead.')
+        if streaming:
+            return self.make_streaming(batch_size)
+            
+        self._extract()
+        with self.instrument.stage('collect') as stage:
+            data = self.collect()
+            stage.num_entries = len(data)
         logging.info(f'Collected {len(data.columns)} columns:')
         logging.info(list(data.columns))
-        transformed_data = self.transform(data)
-        self.update(transformed_data)
-        self.save()
+        self._transform_update_save(data)
+
+    def make_streaming(self, batch_size=1000):
+        """Make the index in batches, without ever holding all entries 
+        in memory. The records of the file source (see 
+        :meth:`catafolk.source.BaseSource.records`) are read in batches
+        of ``batch_size`` entries. Every batch is combined with the 
+        matching entries of the other sources, transformed, and appended
+        to the CSV file straight away. The other sources, such as CSV 
+        files with additional metadata, are small and are loaded 
+        entirely. Entries that only occur in those sources are written 
+        at the end. 
         
-    
+        The index contains the same entries as one made in memory, but
+        they are ordered by the paths of the files rather than by id. 
+        The file is written to a temporary file first and only replaces
+        the index once all entries have been written. If the index has
+        a binary store, it is created from the CSV file. The stages
+        ``extraction`` (of the other sources), ``stream`` and ``save`` 
+        are recorded by the :attr:`instrument`.
+
+        Since a batch only contains the fields of its own entries, the 
+        inputs of the transformer that are missing from a batch are 
+        added as empty (NaN) fields, just like they would be when the 
+        entries were collected all at once. Similarly, integer fields 
+        of the other sources are converted to floats, as they are when 
+        an outer join introduces missing values. This assumes that not 
+        every entry occurs in all sources.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            The number of entries per batch, by default 1000
+
+        Raises
+        ------
+        ValueError
+            If the file source contains duplicate ids
+        """
+        file_sources = [source for source in self.sources.values()
+                        if isinstance(source, FileSource)]
+        if len(file_sources) != 1:
+            logging.warning('Streaming requires exactly one file source: '
+                'making the index in memory instead.')
+            return self.make()
+        streamed = file_sources[0]
+        others = [source for source in self.sources.values() if source is not streamed]
+        with self.instrument.stage('extraction') as stage:
+            others = [(source, _with_missing_values(source.data)) for source in others]
+            stage.num_entries = sum(len(data) for _, data in others)
+
+        inputs = []
+        if self.transformer is not None:
+            inputs = [name for name in self.transformer.inputs if name != 'id']
+        columns = [field for field in self.fields if field != 'id']
+        partial_path = f'{self.path}.partial'
+        try:
+            with self.instrument.stage('stream') as stage, \
+                open(partial_path, 'w', newline='') as handle:
+                empty = pd.DataFrame([], columns=columns, index=pd.Index([], name='id'))
+                empty.to_csv(handle)
+                seen = set()
+                num_entries = 0
+                for batch in _batches(streamed.records(), batch_size):
+                    ids = [entry_id for entry_id, _ in batch]
+                    duplicates = [entry_id for entry_id in ids if entry_id in seen]
+                    duplicates.extend(pd.Index(ids)[pd.Index(ids).duplicated()])
+                    if len(duplicates) > 0:
+                        raise ValueError(f'Duplicate ids: {", ".join(map(str, duplicates[:10]))}')
+                    seen.update(ids)
+                    entries = [entry for _, entry in batch]
+                    num_entries += self._stream_batch(handle, streamed, entries, ids,
+                        others, inputs, columns)
+
+                remaining = [entry_id for _, data in others for entry_id in data.index
+                             if entry_id not in seen]
+                remaining = list(dict.fromkeys(remaining))
+                for ids in _batches(remaining, batch_size):
+                    num_entries += self._stream_batch(handle, streamed, [], ids,
+                        others, inputs, columns)
+                stage.num_entries = num_entries
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        
+        with self.instrument.stage('save') as stage:
+            os.replace(partial_path, self.path)
+            if self.store is not None:
+                self._write_store(pd.read_csv(self.path, index_col='id'))
+            stage.num_entries = num_entries
+        self._data = None
 
+    def _stream_batch(self, handle, streamed, entries, ids, others, inputs, columns):
+        """Collect, transform and write a batch of entries. ``others`` 
+        lists the other sources and their data. Returns the number of 
+        entries written."""
+        index = pd.Index(ids, name='id')
+        if len(entries) > 0:
+            df = pd.DataFrame(entries, index=index)
+        else:
+            df = pd.DataFrame([], index=index)
+        names = _column_names(streamed, df.columns)
+        dataframes = [df]
+        for source, data in others:
+            names.extend(_column_names(source, data.columns))
+            dataframes.append(data.reindex(index))
+        data = pd.concat(dataframes, axis=1)
+        data.columns = names
+        missing = [name for name in inputs if name not in data.columns]
+        if len(missing) > 0:
+            data = data.reindex(columns=names + missing)
+        data.index.name = 'id'
+
+        transformed = self.transform(data)
+        transformed = transformed.reindex(columns=columns)
+        transformed.to_csv(handle, header=False)
+        return len(transformed)
+
+    def _extract(self):
+        """Extract the data of all sources"""
+        with self.instrument.stage('extraction') as stage:
+            stage.num_entries = sum(len(source.data) for source in self.sources.values())
+
+    def _transform_update_save(self, data):
+        with self.instrument.stage('transform') as stage:
+            transformed_data = self.transform(data)
+            stage.num_entries = len(transformed_data)
+        with self.instrument.stage('update') as stage:
+            self.update(transformed_data)
+            stage.num_entries = len(transformed_data)
+        with self.instrument.stage('save') as stage:
+            self.save()
+            stage.num_entries = len(self.data)
+
+    def _make_incremental(self, changes=None):
+        if changes is None:
+            changes = self.changes()
+        changed, removed = changes
+        logging.info(f'Incremental update: {len(changed)} new or changed '
+                     f'files, {len(removed)} removed files')
+
+        # Changed entries are removed and then added again, so that
+        # fields that are no longer present do not linger in the index
+        outdated = self.data[self.path_field].isin(changed + removed)
+        self.remove(self.data.index[outdated])
+
+        if len(changed) > 0:
+            file_sources = [source for source in self.sources.values() 
+                            if isinstance(source, FileSource)]
+            # The file sources are only restricted to the changed files
+            # during this update, so that they can be reused afterwards
+            with contextlib.ExitStack() as stack:
+                for source in file_sources:
+                    stack.enter_context(source.restricted(changed))
+                self._extract()
+                with self.instrument.stage('collect') as stage:
+                    data = self.collect()
+
+                    # Drop entries from other sources that are not linked
+                    # to any of the changed files
+                    ids = set()
+                    for source in file_sources:
+                        ids.update(source.data.index)
+                    data = data[data.index.isin(ids)]
+                    stage.num_entries = len(data)
+            self._transform_update_save(data)
+        else:
+            with self.instrument.stage('save') as stage:
+                self.save()
+                stage.num_entries = len(self.data)
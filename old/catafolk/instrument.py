@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Instrumentation of dataset builds. An :class:`Instrument` records
+the wall time, CPU time, throughput and peak memory use of every stage
+of a build, such as the extraction of metadata from the files or the
+transformation of the entries:
+
+>>> instrument = Instrument()
+>>> with instrument.stage('extraction') as stage:
+...     entries = [{'id': i} for i in range(1000)]
+...     stage.num_entries = len(entries)
+>>> stage = instrument.stages[0]
+>>> stage.name, stage.num_entries
+('extraction', 1000)
+>>> stage.wall_time > 0
+True
+
+Callbacks are called whenever a stage ends, e.g. to log progress
+(see :func:`log_stage`) or to collect statistics across builds. A
+dataset records its stages when it is given an instrument, or when
+the option ``build_report_fn`` is set, in which case a JSON report is
+written after every build (see :meth:`catafolk.dataset.Dataset.make`):
+
+>>> dataset = Dataset('essen-china-han', instrument=Instrument([log_stage])) # doctest: +SKIP
+>>> dataset.make() # doctest: +SKIP
+
+When instrumentation is disabled, the :data:`NULL_INSTRUMENT` is used.
+Its stages do nothing at all, so that there is no overhead.
+"""
+import sys
+import time
+import json
+import logging
+import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+__all__ = ['Stage', 'Instrument', 'NullInstrument', 'NULL_INSTRUMENT',
+    'peak_rss', 'log_stage', 'format_stages']
+
+def peak_rss():
+    """The peak resident set size (memory use) of the current process
+    in bytes, or None if it cannot be determined on this platform"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def _cpu_time():
+    """CPU time used by this process and its terminated children"""
+    times = time.process_time()
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        times += usage.ru_utime + usage.ru_stime
+    return times
+
+class Stage(object):
+    """A stage of a build and the resources it used.
+
+    Attributes
+    ----------
+    name : str
+        The name of the stage
+    wall_time : float
+        Wall time in seconds
+    cpu_time : float
+        CPU time in seconds, including the time used by worker
+        processes that finished during the stage
+    num_entries : int
+        The number of entries (or files) processed, if known
+    peak_rss : int
+        The peak memory use of the process in bytes at the end of the
+        stage. Note that this is the peak since the start of the
+        process, so it never decreases.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_time = None
+        self.cpu_time = None
+        self.num_entries = None
+        self.peak_rss = None
+
+    def __repr__(self):
+        return f'<Stage {self.name} wall_time={self.wall_time}>'
+
+    @property
+    def entries_per_second(self):
+        """The throughput of the stage, or None if unknown"""
+        if self.num_entries is None or not self.wall_time:
+            return None
+        return self.num_entries / self.wall_time
+
+    def to_dict(self):
+        return dict(name=self.name, wall_time=self.wall_time,
+            cpu_time=self.cpu_time, num_entries=self.num_entries,
+            entries_per_second=self.entries_per_second, peak_rss=self.peak_rss)
+
+class _StageContext(object):
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.stage = Stage(name)
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_time()
+        return self.stage
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stage = self.stage
+        stage.wall_time = time.perf_counter() - self._wall
+        stage.cpu_time = _cpu_time() - self._cpu
+        stage.peak_rss = peak_rss()
+        self.instrument._end_stage(stage)
+        return False
+
+class Instrument(object):
+    """Records the stages of a build.
+
+    Parameters
+    ----------
+    callbacks : list, optional
+        Functions that are called with the :class:`Stage` whenever a
+        stage ends
+    """
+
+    enabled = True
+
+    def __init__(self, callbacks=[]):
+        self.callbacks = list(callbacks)
+        self.stages = []
+        self.started = datetime.datetime.now()
+
+    def __repr__(self):
+        return f'<Instrument stages={len(self.stages)}>'
+
+    def add_callback(self, callback):
+        """Add a function that is called whenever a stage ends"""
+        self.callbacks.append(callback)
+
+    def stage(self, name):
+        """A context manager that times a stage. It returns the
+        :class:`Stage`, on which you can set the number of entries
+        processed (``num_entries``)."""
+        return _StageContext(self, name)
+
+    def _end_stage(self, stage):
+        self.stages.append(stage)
+        for callback in self.callbacks:
+            callback(stage)
+
+    def reset(self):
+        """Forget all recorded stages"""
+        self.stages = []
+        self.started = datetime.datetime.now()
+
+    def report(self, **info):
+        """A report of all stages, as a dictionary that can be stored
+        as JSON. Keyword arguments are added to the report."""
+        rss = [stage.peak_rss for stage in self.stages if stage.peak_rss is not None]
+        report = dict(info)
+        report.update(
+            started=self.started.isoformat(timespec='seconds'),
+            wall_time=sum(stage.wall_time for stage in self.stages),
+            cpu_time=sum(stage.cpu_time for stage in self.stages),
+            peak_rss=max(rss) if len(rss) > 0 else None,
+            stages=[stage.to_dict() for stage in self.stages])
+        return report
+
+    def save(self, path, **info):
+        """Write the report (see :meth:`report`) to a JSON file"""
+        with open(path, 'w') as handle:
+            json.dump(self.report(**info), handle, indent=4)
+
+class _NullStage(object):
+    """A stage that ignores everything that is recorded"""
+    name = None
+    num_entries = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class NullInstrument(object):
+    """An instrument that records nothing, used when instrumentation
+    is disabled"""
+
+    enabled = False
+    stages = []
+    _stage = _NullStage()
+
+    def __repr__(self):
+        return '<NullInstrument>'
+
+    def add_callback(self, callback):
+        raise ValueError('Cannot add callbacks to a disabled instrument')
+
+    def stage(self, name):
+        return self._stage
+
+    def reset(self):
+        pass
+
+    def report(self, **info):
+        """A report without any stages (see :meth:`Instrument.report`)"""
+        report = dict(info)
+        report.update(started=None, wall_time=0, cpu_time=0, 
+            peak_rss=None, stages=[])
+        return report
+
+    def save(self, path, **info):
+        """Does nothing: nothing was recorded"""
+        pass
+
+NULL_INSTRUMENT = NullInstrument()
+"""The instrument used when instrumentation is disabled"""
+
+def log_stage(stage):
+    """A callback that logs the resources used by a stage"""
+    message = f'{stage.name}: {stage.wall_time:.3f}s wall, {stage.cpu_time:.3f}s CPU'
+    if stage.entries_per_second is not None:
+        message += f', {stage.entries_per_second:,.0f} entries/s'
+    if stage.peak_rss is not None:
+        message += f', peak RSS {stage.peak_rss / 2**20:.0f} MB'
+    logging.info(message)
+
+def format_stages(report):
+    """Format the stages of a report as a table
+
+    >>> report = {'wall_time': 1.5, 'cpu_time': 1.25, 'peak_rss': 104857600,
+    ...     'stages': [
+    ...         {'name': 'extraction', 'wall_time': 1.0, 'cpu_time': 0.9,
+    ...          'num_entries': 500, 'entries_per_second': 500.0, 'peak_rss': 52428800},
+    ...         {'name': 'save', 'wall_time': 0.5, 'cpu_time': 0.35,
+    ...          'num_entries': None, 'entries_per_second': None, 'peak_rss': 104857600}]}
+    >>> print(format_stages(report))
+    stage         wall (s)   cpu (s)   entries/s   peak RSS (MB)
+    extraction       1.000     0.900         500              50
+    save             0.500     0.350           -             100
+    total            1.500     1.250           -             100
+    """
+    def row(name, wall_time, cpu_time, throughput, rss):
+        throughput = f'{throughput:11,.0f}' if throughput is not None else f'{"-":>11}'
+        rss = f'{rss / 2**20:15.0f}' if rss is not None else f'{"-":>15}'
+        return f'{name:<12} {wall_time:9.3f} {cpu_time:9.3f} {throughput} {rss}'
+
+    lines = ['stage         wall (s)   cpu (s)   entries/s   peak RSS (MB)']
+    for stage in report['stages']:
+        lines.append(row(stage['name'], stage['wall_time'], stage['cpu_time'],
+            stage['entries_per_second'], stage['peak_rss']))
+    lines.append(row('total', report['wall_time'], report['cpu_time'], None,
+        report['peak_rss']))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""The checksum of a dataset is the root of a Merkle tree over the
+checksums of all its files. Every directory is a subtree whose hash
+depends only on its contents, so comparing two trees only requires
+descending into the subtrees whose hashes differ:
+
+>>> old = MerkleTree.from_checksums({
+...     'data/a.krn': '0cc175b9c0f1b6a831c399e269772661',
+...     'data/b.krn': '92eb5ffee6ae2fec3ad71c777531578f',
+...     'extra/c.krn': '4a8a08f09d37b73795649038408b5f33'})
+>>> new = MerkleTree.from_checksums({
+...     'data/a.krn': '0cc175b9c0f1b6a831c399e269772661',
+...     'data/b.krn': 'e1671797c52e15f763380b45e841ec32',
+...     'data/d.krn': '8277e0910d750195b448797616e091ad'})
+>>> new.diff(old)
+(['data/b.krn', 'data/d.krn'], ['extra/c.krn'])
+>>> new.changed_directories(old)
+['', 'data', 'extra']
+
+Directories with many files (more than ``MerkleTree.max_leaves``) are
+split into 16 buckets based on a hash of the filenames, recursively,
+so that finding a changed file in a large, flat directory also takes
+a logarithmic number of steps.
+
+The tree of a dataset is stored in ``merkle.json``, next to
+``properties.json``; see :meth:`catafolk.dataset.Dataset.checksum`.
+"""
+import os
+import json
+import hashlib
+
+_FORMAT_VERSION = 1
+
+def _hash(lines):
+    hash_md5 = hashlib.md5()
+    for line in lines:
+        hash_md5.update(line.encode('utf-8'))
+        hash_md5.update(b'\n')
+    return hash_md5.hexdigest()
+
+def _bucket(name, depth):
+    """The bucket of a file at a given depth: a hex digit"""
+    return hashlib.md5(name.encode('utf-8')).hexdigest()[depth]
+
+class MerkleTree(object):
+    """A Merkle tree over the checksums of a set of files. Use
+    :meth:`from_checksums` to build a tree.
+
+    A tree is made of nested dictionaries. A directory node has a
+    ``hash``, its subdirectories (``dirs``) and a node with its files
+    (``files``). A files node either lists the checksums of all files
+    (``leaves``) or splits them over ``buckets``.
+
+    Parameters
+    ----------
+    root : dict
+        The root node
+    """
+
+    max_leaves = 64
+    """The maximum number of files in a node before it is split"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def __repr__(self):
+        return f'<MerkleTree hash={self.hash}>'
+
+    def __len__(self):
+        return len(self.checksums())
+
+    def __eq__(self, other):
+        return isinstance(other, MerkleTree) and self.hash == other.hash
+
+    @property
+    def hash(self):
+        """The root hash, which serves as the checksum of all files"""
+        return self.root['hash']
+
+    @classmethod
+    def from_checksums(cls, checksums):
+        """Build a tree from the checksums of files
+
+        Parameters
+        ----------
+        checksums : dict
+            A dictionary mapping relative paths (using ``/`` as a
+            separator) to the checksums of the files
+
+        Returns
+        -------
+        MerkleTree
+            The tree
+        """
+        structure = {}
+        for path, checksum in checksums.items():
+            parts = path.replace(os.sep, '/').split('/')
+            directory = structure
+            for part in parts[:-1]:
+                directory = directory.setdefault('/' + part, {})
+            directory[parts[-1]] = checksum
+        return cls(cls._build_directory(structure))
+
+    @classmethod
+    def _build_directory(cls, structure):
+        dirs = {name[1:]: cls._build_directory(contents)
+                for name, contents in structure.items() if name.startswith('/')}
+        leaves = {name: checksum for name, checksum in structure.items()
+                  if not name.startswith('/')}
+        files = cls._build_files(leaves, depth=0)
+        lines = [f'd {name} {dirs[name]["hash"]}' for name in sorted(dirs)]
+        lines.append(f'f {files["hash"]}')
+        return dict(hash=_hash(lines), dirs=dirs, files=files)
+
+    @classmethod
+    def _build_files(cls, leaves, depth):
+        if len(leaves) <= cls.max_leaves or depth >= 32:
+            lines = [f'{name} {leaves[name]}' for name in sorted(leaves)]
+            return dict(hash=_hash(lines), leaves=leaves)
+        groups = {}
+        for name, checksum in leaves.items():
+            groups.setdefault(_bucket(name, depth), {})[name] = checksum
+        buckets = {key: cls._build_files(group, depth + 1)
+                   for key, group in groups.items()}
+        lines = [f'b {key} {buckets[key]["hash"]}' for key in sorted(buckets)]
+        return dict(hash=_hash(lines), buckets=buckets)
+
+    def checksums(self):
+        """Return a dictionary mapping the paths of all files to their
+        checksums"""
+        checksums = {}
+        def walk(node, prefix):
+            for name, checksum in _leaves(node['files']).items():
+                checksums[prefix + name] = checksum
+            for name, subnode in node['dirs'].items():
+                walk(subnode, f'{prefix}{name}/')
+        walk(self.root, '')
+        return checksums
+
+    def diff(self, old):
+        """Compare this tree to an older version. Only subtrees whose
+        hashes differ are visited.
+
+        Parameters
+        ----------
+        old : MerkleTree
+            The old tree. If None, all files are considered new.
+
+        Returns
+        -------
+        (list, list)
+            The sorted paths of all new or changed files, and of all
+            files in the old tree that no longer exist.
+        """
+        changed, removed = [], []
+        old_root = old.root if old is not None else None
+        _diff_directories(self.root, old_root, '', changed, removed)
+        return sorted(changed), sorted(removed)
+
+    def changed_directories(self, old):
+        """Return the paths of all directories whose contents changed,
+        including the root directory (``''``)."""
+        directories = []
+        def walk(new, old, path):
+            if new is not None and old is not None and new['hash'] == old['hash']:
+                return
+            directories.append(path)
+            new_dirs = new['dirs'] if new is not None else {}
+            old_dirs = old['dirs'] if old is not None else {}
+            for name in sorted(set(new_dirs) | set(old_dirs)):
+                subpath = f'{path}/{name}' if path else name
+                walk(new_dirs.get(name), old_dirs.get(name), subpath)
+        walk(self.root, old.root if old is not None else None, '')
+        return directories
+
+    def to_dict(self):
+        return dict(version=_FORMAT_VERSION, hash=self.hash, tree=self.root)
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != _FORMAT_VERSION:
+            raise ValueError('Unsupported Merkle tree format')
+        return cls(data['tree'])
+
+    def save(self, path):
+        """Store the tree as a JSON file"""
+        with open(path, 'w') as handle:
+            json.dump(self.to_dict(), handle)
+
+    @classmethod
+    def load(cls, path):
+        """Load a tree stored using :meth:`save`. Returns None if the
+        file does not exist or has an unsupported format."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as handle:
+            try:
+                return cls.from_dict(json.load(handle))
+            except (ValueError, KeyError):
+                return None
+
+def _leaves(node):
+    """All leaves in a files node"""
+    if 'leaves' in node:
+        return node['leaves']
+    leaves = {}
+    for bucket in node['buckets'].values():
+        leaves.update(_leaves(bucket))
+    return leaves
+
+def _diff_files(new, old, prefix, changed, removed):
+    if new is not None and old is not None and new['hash'] == old['hash']:
+        return
+    if (new is not None and old is not None
+        and 'buckets' in new and 'buckets' in old):
+        for key in set(new['buckets']) | set(old['buckets']):
+            _diff_files(new['buckets'].get(key), old['buckets'].get(key),
+                        prefix, changed, removed)
+        return
+    new_leaves = _leaves(new) if new is not None else {}
+    old_leaves = _leaves(old) if old is not None else {}
+    for name, checksum in new_leaves.items():
+        if old_leaves.get(name) != checksum:
+            changed.append(prefix + name)
+    for name in old_leaves:
+        if name not in new_leaves:
+            removed.append(prefix + name)
+
+def _diff_directories(new, old, prefix, changed, removed):
+    if new is not None and old is not None and new['hash'] == old['hash']:
+        return
+    _diff_files(new['files'] if new is not None else None,
+                old['files'] if old is not None else None,
+                prefix, changed, removed)
+    new_dirs = new['dirs'] if new is not None else {}
+    old_dirs = old['dirs'] if old is not None else {}
+    for name in set(new_dirs) | set(old_dirs):
+        _diff_directories(new_dirs.get(name), old_dirs.get(name),
+                          f'{prefix}{name}/', changed, removed)
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -17,17 +17,32 @@ will get a single output, and not a list with one item:
 """
 import re
 import html
-from pandas import isnull
 import logging
 import json
 import os
-import yaml
 
-CUR_DIR = os.path.dirname(__file__)
-ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir))
-DATASETS_DIR = os.path.join(ROOT_DIR, 'datasets')
+from .utils import DATASETS_DIR
+
 MAPPING_CACHE = {}
 
+def _isnull(value):
+    """Whether a value is missing, like :func:`pandas.isnull`. Common
+    scalars are checked directly, so that pandas is only imported
+    (and only needed) for other values, such as ``pd.NA``.
+
+    >>> _isnull(None), _isnull(float('nan')), _isnull('nan'), _isnull(3)
+    (True, True, False, False)
+    """
+    if value is None:
+        return True
+    value_type = type(value)
+    if value_type is str or value_type is int or value_type is bool:
+        return False
+    if value_type is float:
+        return value != value
+    from pandas import isnull
+    return isnull(value)
+
 def _return(args):
     """Returns a single value if a single argument was passed,
     and a list of values if multiple arguments were passed.
@@ -56,7 +71,7 @@ def join(*args, sep=''):
         outputs = [join(*arg, sep=sep) for arg in args]
         return _return(outputs)
     else:
-        joined = sep.join(str(arg) for arg in args if not isnull(arg))
+        joined = sep.join(str(arg) for arg in args if not _isnull(arg))
     return joined
 
 def split(*args, sep=None):
@@ -357,16 +372,7 @@ def map_values(*args, mapping={}, mapping_path=None, regex=True, return_missing=
         return _return(outputs)
     
     if mapping_path is not None:
-        path = os.path.join(DATASETS_DIR, mapping_path)
-        if not path in MAPPING_CACHE:
-            if not os.path.exists(path):
-                raise ValueError(f'Mapping file does not exist {path}')
-            with open(path, 'r') as stream:
-                mapping = yaml.safe_load(stream)
-                MAPPING_CACHE[path] = mapping
-        else:
-            mapping = MAPPING_CACHE[path]
-    # print(mapping)
+        mapping = _load_mapping(mapping_path)
     if not regex:
         if return_missing:
             outputs = [mapping.get(arg, arg) for arg in args]
@@ -374,21 +380,93 @@ def map_values(*args, mapping={}, mapping_path=None, regex=True, return_missing=
             outputs = [mapping.get(arg, None) for arg in args]
         return _return(outputs)
     else:
+        if not isinstance(mapping, _RegexMapping):
+            mapping = _RegexMapping(mapping)
         outputs = []
         for orig_value in args:
-            found_match = False
-            for pattern, target_value in mapping.items():
-                if not type(orig_value) == str: continue
-                matches = re.match(pattern, orig_value)
-                if matches:
-                    outputs.append(target_value)
-                    found_match = True
-                    continue
-            if not found_match:
-                default = orig_value if return_missing else None
+            default = orig_value if return_missing else None
+            if not type(orig_value) == str:
                 outputs.append(default)
+            else:
+                outputs.append(mapping.lookup(orig_value, default))
         return _return(outputs)
 
+def _mapping_file(mapping_path):
+    """The path of a mapping file given relative to the datasets directory"""
+    return os.path.join(DATASETS_DIR, mapping_path)
+
+def _load_mapping(mapping_path):
+    """Load a mapping from a YAML file relative to the datasets directory"""
+    path = _mapping_file(mapping_path)
+    if not path in MAPPING_CACHE:
+        if not os.path.exists(path):
+            raise ValueError(f'Mapping file does not exist {path}')
+        import yaml
+        with open(path, 'r') as stream:
+            MAPPING_CACHE[path] = yaml.safe_load(stream)
+    return MAPPING_CACHE[path]
+
+# Backreferences and conditionals refer to groups by number or name, 
+# which breaks when patterns are combined in one regular expression
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+class _RegexMapping(object):
+    """A compiled mapping of regex patterns to values, used by 
+    :func:`map_values`. The value of the first pattern that matches
+    is returned. All patterns are combined into a single alternation
+    ``(p1)|(p2)|...``, so that a single regex match suffices. Since 
+    the alternatives are tried in order, this finds the same pattern 
+    as trying all patterns one after the other. If the patterns cannot 
+    be combined (e.g. because they use backreferences), they are 
+    compiled and tried separately.
+
+    >>> mapping = _RegexMapping({'fo.': 'FOO!', 'f.*': 'F', 'b(a)r': 'BAR'})
+    >>> mapping.lookup('fop'), mapping.lookup('fa'), mapping.lookup('bar')
+    ('FOO!', 'F', 'BAR')
+    >>> mapping.lookup('baz', default='?')
+    '?'
+    """
+
+    def __init__(self, mapping):
+        self.values = list(mapping.values())
+        self.combined = None
+        self.patterns = []
+        for pattern in mapping.keys():
+            try:
+                self.patterns.append(re.compile(pattern))
+            except (TypeError, re.error):
+                # Keep the raw pattern: the error is raised when it is used
+                self.patterns.append(pattern)
+        
+        compiled = [p for p in self.patterns if isinstance(p, re.Pattern)]
+        can_combine = (len(compiled) == len(self.patterns) > 0 and 
+            not any(_BACKREFERENCE.search(p.pattern) for p in compiled))
+        if can_combine:
+            # Index of the group wrapping every pattern
+            self.group_values = {}
+            group = 1
+            for pattern, value in zip(compiled, self.values):
+                self.group_values[group] = value
+                group += pattern.groups + 1
+            alternatives = '|'.join(f'({p.pattern})' for p in compiled)
+            try:
+                self.combined = re.compile(alternatives)
+            except re.error:
+                self.combined = None
+
+    def lookup(self, value, default=None):
+        """Returns the value of the first pattern matching ``value``,
+        or ``default`` if no pattern matches."""
+        if self.combined is not None:
+            match = self.combined.match(value)
+            if match:
+                return self.group_values[match.lastindex]
+            return default
+        for pattern, target_value in zip(self.patterns, self.values):
+            if re.match(pattern, value):
+                return target_value
+        return default
+
 def map_numeric_bins(*args, bins=[], default=None):
     """Map numbers to values corresponding to certain bins.
     Bins are dictionaries with a `min`, `max` (exclusive)
@@ -583,7 +661,7 @@ def to_string_list(*args, replace_sep_by='/', sep="|"):
 def drop_none(*args):
     if type(args[0]) == list:
         return _return([drop_none(*arg) for arg in args])
-    outputs = [arg for arg in args if arg is not None and not isnull(arg)]
+    outputs = [arg for arg in args if arg is not None and not _isnull(arg)]
     if len(outputs) == 0:
         return None
     return _return(outputs)
@@ -601,6 +679,163 @@ def unique(*args):
         return _return([unique(*arg) for arg in args])
     return _return(list(set(args)))
 
+# —————————————————————————————————————————————————————————————————
+# Compiled parameters
+# —————————————————————————————————————————————————————————————————
+# Parameters of some operations can be prepared once, when the 
+# operation is added to a Transformer, rather than every time the 
+# operation is called: regular expressions are compiled, and mappings 
+# are loaded and compiled.
+
+def _compile_pattern(pattern):
+    try:
+        return re.compile(pattern)
+    except (TypeError, re.error):
+        return pattern
+
+def _compile_extract_groups(params):
+    if 'pattern' in params:
+        params['pattern'] = _compile_pattern(params['pattern'])
+    return params
+
+def _compile_replace(params):
+    if params.get('regex', True) and 'old' in params:
+        params['old'] = _compile_pattern(params['old'])
+    return params
+
+def _compile_map_values(params):
+    if params.get('mapping_path') is not None:
+        params['mapping'] = _load_mapping(params['mapping_path'])
+        params['mapping_path'] = None
+    if params.get('regex', True):
+        params['mapping'] = _RegexMapping(params.get('mapping', {}))
+    return params
+
+_PARAMETER_COMPILERS = {
+    extract_groups: _compile_extract_groups,
+    replace: _compile_replace,
+    map_values: _compile_map_values,
+}
+
+# —————————————————————————————————————————————————————————————————
+# Columnar forms
+# —————————————————————————————————————————————————————————————————
+# Some operations can be applied to entire columns at once, rather than
+# to every entry separately (see `Transformer.transform_columns`). The
+# columnar form of an operation takes a list of values for every input 
+# and returns a list of values for every output. It must give exactly
+# the same results as applying the operation to every entry. Whenever
+# that is not guaranteed, for example if an entry would raise an error
+# or if an input contains lists, the columnar form raises an exception 
+# and the operation is applied to every entry instead.
+
+class _NotColumnar(Exception):
+    """Raised by a columnar form that cannot handle its inputs"""
+
+def _check_no_lists(column):
+    # Operations recurse into lists, which columnar forms do not support
+    if any(type(value) == list for value in column):
+        raise _NotColumnar()
+
+def _rename_columns(*columns):
+    return list(columns)
+
+def _first_columns(*columns):
+    return [columns[0]]
+
+def _constant_columns(*columns, value=None):
+    return [[value] * len(column) for column in columns]
+
+def _lowercase_columns(*columns):
+    return [[value.lower() if type(value) == str else value for value in column]
+            for column in columns]
+
+def _uppercase_columns(*columns):
+    return [[value.upper() for value in column] for column in columns]
+
+def _strip_value(value):
+    try:
+        return value.strip()
+    except:
+        return value
+
+def _strip_columns(*columns):
+    _check_no_lists(columns[0])
+    return [[_strip_value(value) for value in column] for column in columns]
+
+def _join_columns(*columns, sep=''):
+    _check_no_lists(columns[0])
+    return [[sep.join(str(value) for value in values if not _isnull(value))
+             for values in zip(*columns)]]
+
+def _replace_columns(*columns, old=None, new=None, regex=True):
+    if old is None or new is None:
+        raise _NotColumnar()
+    _check_no_lists(columns[0])
+    if regex:
+        pattern = old if isinstance(old, re.Pattern) else re.compile(old)
+        substitute = lambda value: pattern.sub(new, value)
+    else:
+        substitute = lambda value: value.replace(old, new)
+    return [[substitute(value) if type(value) == str else value for value in column]
+            for column in columns]
+
+def _map_values_columns(*columns, mapping={}, mapping_path=None, regex=True, 
+    return_missing=False):
+    _check_no_lists(columns[0])
+    if mapping_path is not None:
+        mapping = _load_mapping(mapping_path)
+    if regex and not isinstance(mapping, _RegexMapping):
+        mapping = _RegexMapping(mapping)
+    
+    # Columns often contain few distinct values: look up every value once
+    lookups = {}
+    outputs = []
+    for column in columns:
+        output = []
+        for value in column:
+            if regex and type(value) != str:
+                output.append(value if return_missing else None)
+                continue
+            key = (type(value), value)
+            if key not in lookups:
+                default = value if return_missing else None
+                if regex:
+                    lookups[key] = mapping.lookup(value, default)
+                else:
+                    lookups[key] = mapping.get(value, default)
+            output.append(lookups[key])
+        outputs.append(output)
+    return outputs
+
+def _extract_groups_columns(column, pattern=None, groups=None):
+    pattern = re.compile(pattern)
+    selected = range(pattern.groups + 1) if groups is None else groups
+    outputs = [[] for _ in selected]
+    for value in column:
+        if type(value) != str:
+            raise _NotColumnar()
+        matches = pattern.match(value)
+        if matches is None and groups is None:
+            # Raises an error, see `extract_groups`
+            raise _NotColumnar()
+        for output, group_num in zip(outputs, selected):
+            output.append(matches[group_num] if matches else None)
+    return outputs
+
+_COLUMNAR_OPERATIONS = {
+    rename: _rename_columns,
+    first: _first_columns,
+    constant: _constant_columns,
+    lowercase: _lowercase_columns,
+    uppercase: _uppercase_columns,
+    strip: _strip_columns,
+    join: _join_columns,
+    replace: _replace_columns,
+    map_values: _map_values_columns,
+    extract_groups: _extract_groups_columns,
+}
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
\ No newline at end of file
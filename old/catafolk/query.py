@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Querying an index using secondary indices. Rather than scanning all
+entries, a :class:`Query` looks up the entries matching a condition in
+a secondary index of the field. There are two kinds of secondary
+indices:
+
+- An :class:`InvertedIndex` maps every value of a field to the entries
+  with that value. It is used for categorical fields such as the
+  ``culture`` or the ``publication_key``.
+- A :class:`SortedIndex` keeps the (numeric) values of a field sorted,
+  so that entries with values in a certain range can be found using a
+  binary search. It is used for fields such as ``latitude``.
+
+The fields that get a secondary index are listed in the
+``query_index`` column of the index schema (see
+:mod:`catafolk.schema`). Conditions are passed as keyword arguments:
+a value selects entries with that value, a list selects entries with
+any of the values in the list, and a slice selects entries with values
+in a (half-open) range:
+
+>>> query = Query(dataset.index) # doctest: +SKIP
+>>> query.find(culture='Han', file_has_lyrics=True) # doctest: +SKIP
+>>> query.find(publication_key=['densmore1929', 'densmore1939']) # doctest: +SKIP
+>>> query.find(collection_date_earliest=slice(1900, 1950)) # doctest: +SKIP
+
+Conditions on fields without a secondary index are evaluated only
+for the entries that match the other conditions. The secondary indices
+are stored next to the index (e.g. ``index.secondary.json``) and are
+rebuilt automatically when the index changes.
+"""
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+from . import schema
+from .utils import file_checksum
+
+_FORMAT_VERSION = 1
+
+def _to_python(value):
+    """Convert numpy scalars to the corresponding Python objects"""
+    return value.item() if isinstance(value, np.generic) else value
+
+class InvertedIndex(object):
+    """A secondary index mapping every value of a field to the positions
+    of all entries with that value.
+
+    >>> index = InvertedIndex.build('culture', pd.Series(['Han', 'Pawnee', 'Han', None]))
+    >>> index.lookup('Han')
+    array([0, 2])
+    >>> index.lookup('Maidu')
+    array([], dtype=int64)
+
+    Parameters
+    ----------
+    field : str
+        The name of the field
+    postings : dict
+        A dictionary mapping values to sorted arrays of positions
+    """
+    kind = 'inverted'
+
+    def __init__(self, field, postings):
+        self.field = field
+        self.postings = postings
+
+    def __repr__(self):
+        return f'<InvertedIndex field={self.field} values={len(self.postings)}>'
+
+    @classmethod
+    def build(cls, field, values):
+        """Build the index from a series of values. Missing values are
+        not indexed."""
+        codes, uniques = pd.factorize(values)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        start = np.sum(codes < 0)
+        postings = {}
+        for value, count in zip(uniques, counts):
+            postings[_to_python(value)] = order[start:start + count]
+            start += count
+        return cls(field, postings)
+
+    def lookup(self, value):
+        """Return the positions of all entries with a given value"""
+        return self.postings.get(value, np.array([], dtype=np.int64))
+
+    def to_dict(self):
+        postings = [[value, positions.tolist()]
+                    for value, positions in self.postings.items()]
+        return dict(kind=self.kind, postings=postings)
+
+    @classmethod
+    def from_dict(cls, field, data):
+        postings = {value: np.array(positions, dtype=np.int64)
+                    for value, positions in data['postings']}
+        return cls(field, postings)
+
+class SortedIndex(object):
+    """A secondary index that stores the numeric values of a field in
+    sorted order, together with the positions of the entries.
+
+    >>> index = SortedIndex.build('latitude', pd.Series([52.1, 40.0, None, 47.5]))
+    >>> index.range(45, 60)
+    array([0, 3])
+    >>> index.lookup(40.0)
+    array([1])
+
+    Parameters
+    ----------
+    field : str
+        The name of the field
+    values : np.ndarray
+        The sorted values
+    positions : np.ndarray
+        The positions of the corresponding entries
+    """
+    kind = 'sorted'
+
+    def __init__(self, field, values, positions):
+        self.field = field
+        self.values = values
+        self.positions = positions
+
+    def __repr__(self):
+        return f'<SortedIndex field={self.field} values={len(self.values)}>'
+
+    @classmethod
+    def build(cls, field, values):
+        """Build the index from a series of values. Values that are
+        missing or not numeric are not indexed."""
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+        positions = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[positions], kind='stable')
+        return cls(field, values[positions][order], positions[order])
+
+    def range(self, start=None, stop=None):
+        """Return the positions of all entries with values in the
+        half-open interval [start, stop), in increasing order"""
+        left = 0 if start is None else np.searchsorted(self.values, start, side='left')
+        right = len(self.values) if stop is None else np.searchsorted(self.values, stop, side='left')
+        return np.sort(self.positions[left:right])
+
+    def lookup(self, value):
+        """Return the positions of all entries with a given value"""
+        left = np.searchsorted(self.values, value, side='left')
+        right = np.searchsorted(self.values, value, side='right')
+        return np.sort(self.positions[left:right])
+
+    def to_dict(self):
+        return dict(kind=self.kind, values=self.values.tolist(),
+                    positions=self.positions.tolist())
+
+    @classmethod
+    def from_dict(cls, field, data):
+        return cls(field, np.array(data['values'], dtype=float),
+                   np.array(data['positions'], dtype=np.int64))
+
+_INDEX_CLASSES = {
+    InvertedIndex.kind: InvertedIndex,
+    SortedIndex.kind: SortedIndex,
+}
+
+class Query(object):
+    """Query an index using secondary indices.
+
+    Parameters
+    ----------
+    index : catafolk.index.Index
+        The index to query
+    fields : dict, optional
+        A dictionary mapping fields to the kind of secondary index
+        (``'inverted'`` or ``'sorted'``). By default the fields marked
+        in the index schema (see :func:`catafolk.schema.indexed_fields`).
+    path : str, optional
+        Where to store the secondary indices. Defaults to the path of
+        the index, with extension ``.secondary.json``.
+    """
+
+    def __init__(self, index, fields=None, path=None):
+        self.index = index
+        if fields is None:
+            fields = schema.indexed_fields()
+        self.fields = dict(fields)
+        if path is None:
+            path = os.path.splitext(index.path)[0] + '.secondary.json'
+        self.path = path
+        self._indices = None
+
+    def __repr__(self):
+        return f'<Query path={self.path}>'
+
+    @property
+    def data(self):
+        return self.index.data
+
+    @property
+    def indices(self):
+        """A dictionary with the secondary index of every field"""
+        if self._indices is None:
+            checksum = self._index_checksum()
+            if not self.load(checksum):
+                self.build()
+                if checksum is not None:
+                    self.save(checksum)
+        return self._indices
+
+    def _index_checksum(self):
+        """Checksum of the file from which the index is loaded"""
+        if getattr(self.index, 'has_store', False):
+            return file_checksum(self.index.store_path)
+        if os.path.exists(self.index.path):
+            return file_checksum(self.index.path)
+        return None
+
+    def build(self):
+        """Build secondary indices for all fields in the index"""
+        self._indices = {}
+        for field, kind in self.fields.items():
+            if field not in self.data.columns:
+                continue
+            index_class = _INDEX_CLASSES[kind]
+            self._indices[field] = index_class.build(field, self.data[field])
+        logging.info(f'Built secondary indices for {len(self._indices)} fields')
+
+    def save(self, checksum):
+        """Store the secondary indices"""
+        data = dict(
+            version=_FORMAT_VERSION,
+            checksum=checksum,
+            fields=self.fields,
+            indices={field: index.to_dict() for field, index in self._indices.items()})
+        with open(self.path, 'w') as handle:
+            json.dump(data, handle)
+
+    def load(self, checksum):
+        """Load stored secondary indices if they are up to date
+
+        Parameters
+        ----------
+        checksum : str
+            The checksum of the current index file
+
+        Returns
+        -------
+        bool
+            Whether the secondary indices were loaded
+        """
+        if checksum is None or not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r') as handle:
+            data = json.load(handle)
+        if (data.get('version') != _FORMAT_VERSION
+            or data.get('checksum') != checksum
+            or data.get('fields') != self.fields):
+            return False
+        self._indices = {}
+        for field, index_data in data['indices'].items():
+            index_class = _INDEX_CLASSES[index_data['kind']]
+            self._indices[field] = index_class.from_dict(field, index_data)
+        return True
+
+    def _lookup(self, field, condition):
+        index = self.indices[field]
+        if isinstance(condition, slice):
+            if index.kind != 'sorted':
+                raise ValueError(f'Range queries require a sorted index; '
+                                 f'field {field} has an {index.kind} index')
+            return index.range(condition.start, condition.stop)
+        if isinstance(condition, (list, tuple, set)):
+            positions = [index.lookup(value) for value in condition]
+            return np.unique(np.concatenate(positions)) if positions else np.array([], dtype=np.int64)
+        return index.lookup(condition)
+
+    @staticmethod
+    def _matches(values, condition):
+        if isinstance(condition, slice):
+            values = pd.to_numeric(values, errors='coerce')
+            mask = values.notna()
+            if condition.start is not None:
+                mask &= values >= condition.start
+            if condition.stop is not None:
+                mask &= values < condition.stop
+            return mask.to_numpy()
+        if isinstance(condition, (list, tuple, set)):
+            return values.isin(list(condition)).to_numpy()
+        return (values == condition).to_numpy()
+
+    def positions(self, **conditions):
+        """Return the positions of all entries matching all conditions
+
+        Returns
+        -------
+        np.ndarray
+            The sorted positions of the matching entries
+        """
+        indexed = [field for field in conditions if field in self.indices]
+        scanned = [field for field in conditions if field not in self.indices]
+        for field in scanned:
+            if field not in self.data.columns:
+                raise KeyError(f'Unknown field: {field}')
+
+        positions = None
+        for field in indexed:
+            matches = self._lookup(field, conditions[field])
+            if positions is None:
+                positions = matches
+            else:
+                positions = np.intersect1d(positions, matches, assume_unique=True)
+            if len(positions) == 0:
+                return positions
+        if positions is None:
+            positions = np.arange(len(self.data))
+        for field in scanned:
+            values = self.data[field].iloc[positions]
+            positions = positions[self._matches(values, conditions[field])]
+        return positions
+
+    def find(self, **conditions):
+        """Return all entries matching all conditions
+
+        Returns
+        -------
+        pd.DataFrame
+            The matching entries
+        """
+        return self.data.iloc[self.positions(**conditions)]
+
+    def ids(self, **conditions):
+        """Return the ids of all entries matching all conditions"""
+        return self.data.index[self.positions(**conditions)].tolist()
+
+    def count(self, **conditions):
+        """Return the number of entries matching all conditions"""
+        return len(self.positions(**conditions))
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
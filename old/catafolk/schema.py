@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""The index schema, ``schemas/index-schema.csv``, lists all fields
+of the index, in order, together with their description, data type
+and whether the field should get a secondary index (see
+:mod:`catafolk.query`). The schema is read only once.
+
+>>> fields()[:3]
+['id', 'dataset_id', 'title']
+>>> indexed_fields()['culture']
+'inverted'
+"""
+import os
+import warnings
+import functools
+import pandas as pd
+
+CUR_DIR = os.path.dirname(__file__)
+ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir))
+
+# Locations of the schema, in order of preference: the schema is shared
+# with the website, which keeps its own copy.
+SCHEMA_PATHS = [
+    os.path.join(ROOT_DIR, 'schemas', 'index-schema.csv'),
+    os.path.join(ROOT_DIR, os.path.pardir, 'website', 'schemas', 'index-schema.csv'),
+]
+
+_DEFAULT_FIELDS = ['id', 'dataset_id']
+
+_INDEX_KINDS = ['inverted', 'sorted']
+
+def schema_path():
+    """Return the path of the index schema, or None if it cannot be found"""
+    for path in SCHEMA_PATHS:
+        if os.path.exists(path):
+            return os.path.abspath(path)
+    return None
+
+@functools.lru_cache(maxsize=None)
+def load_schema(path=None):
+    """Load the index schema, sorted by the order of the fields.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the schema, by default the first of ``SCHEMA_PATHS``
+        that exists.
+
+    Returns
+    -------
+    pd.DataFrame
+        The schema, or None if no schema was found.
+    """
+    if path is None:
+        path = schema_path()
+    if path is None or not os.path.exists(path):
+        warnings.warn(f'Schema file does not exist: {path or SCHEMA_PATHS[0]}')
+        return None
+    schema = pd.read_csv(path)
+    schema.sort_values('order', ascending=True, inplace=True, kind='stable')
+    return schema
+
+def fields(path=None):
+    """Return a list of all fields in the schema"""
+    schema = load_schema(path)
+    if schema is None:
+        return list(_DEFAULT_FIELDS)
+    return schema['field'].tolist()
+
+def indexed_fields(path=None):
+    """Return a dictionary mapping fields to the kind of their secondary
+    index, as specified in the ``query_index`` column of the schema:
+    either ``'inverted'`` or ``'sorted'``."""
+    schema = load_schema(path)
+    if schema is None or 'query_index' not in schema.columns:
+        return {}
+    indexed = {}
+    for field, kind in zip(schema['field'], schema['query_index']):
+        if pd.isna(kind):
+            continue
+        if kind not in _INDEX_KINDS:
+            raise ValueError(f'Unknown index kind "{kind}" for field {field}')
+        indexed[field] = kind
+    return indexed
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Full-text search in the free-text fields of all datasets, such as
+titles, lyrics, comments and descriptions. The :class:`TextIndex` is
+an inverted index stored in a local SQLite database, and results are
+ranked using BM25. No external search service is needed.
+
+>>> index = TextIndex(':memory:')
+>>> entries = pd.DataFrame({
+...     'title': ['Das Mädchen und der Jäger', 'Renmín gōngshè hǎo', 'The hunter'],
+...     'lyrics': ['Es ging ein Maedchen', None, 'A hunter went out']},
+...     index=pd.Index(['de1', 'han1', 'en1'], name='id'))
+>>> index.update_dataset('test', entries)
+3
+>>> index.search('maedchen')['id'].tolist()
+['de1']
+>>> index.search('gongshe')['id'].tolist()
+['han1']
+
+Text is tokenized so that it suits the German, English and (pinyin)
+Chinese texts in the corpora: see :func:`tokenize`. Every dataset is
+indexed separately, together with the checksum of its index, so that
+:meth:`TextIndex.refresh` only reindexes datasets that were rebuilt.
+From the command line::
+
+    python -m catafolk.search refresh
+    python -m catafolk.search query "jäger"
+"""
+import os
+import re
+import math
+import sqlite3
+import logging
+from collections import Counter
+from collections import defaultdict
+import pandas as pd
+
+from .utils import fold
+from .utils import file_checksum
+from .utils import ROOT_DIR
+from .utils import DATASETS_DIR
+DEFAULT_SEARCH_PATH = os.path.join(ROOT_DIR, '.cache', 'search.sqlite')
+
+# Fields that are indexed, and the weight of the terms in every field
+DEFAULT_FIELDS = {
+    'title': 3.0,
+    'title_translation': 3.0,
+    'lyrics': 1.0,
+    'lyrics_translation': 1.0,
+    'comments': 1.0,
+    'description': 1.0,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset_id TEXT PRIMARY KEY,
+    checksum TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    doc INTEGER PRIMARY KEY,
+    dataset_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    length REAL NOT NULL,
+    UNIQUE (dataset_id, id)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    tf REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+"""
+
+_TOKEN = re.compile(r'[^\W_]+')
+_PINYIN_TONE_NUMBERS = re.compile(r'(?:[a-z]+[1-5])+[a-z]*')
+_TONE_NUMBER = re.compile(r'([a-z])[1-5]')
+_CJK = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+_SYLLABLE_GROUP = re.compile(r'([a-z]+)[1-5]?')
+_PINYIN_SYLLABLES = frozenset("""
+a ai an ang ao ba bai ban bang bao bei ben beng bi bian biao bie bin bing
+bo bu ca cai can cang cao ce cen ceng cha chai chan chang chao che chen
+cheng chi chong chou chu chua chuai chuan chuang chui chun chuo ci cong
+cou cu cuan cui cun cuo da dai dan dang dao de dei den deng di dia dian
+diao die ding diu dong dou du duan dui dun duo e ei en eng er fa fan fang
+fei fen feng fo fou fu ga gai gan gang gao ge gei gen geng gong gou gu
+gua guai guan guang gui gun guo ha hai han hang hao he hei hen heng hong
+hou hu hua huai huan huang hui hun huo ji jia jian jiang jiao jie jin
+jing jiong jiu ju juan jue jun ka kai kan kang kao ke kei ken keng kong
+kou ku kua kuai kuan kuang kui kun kuo la lai lan lang lao le lei leng li
+lia lian liang liao lie lin ling liu lo long lou lu luan lue lun luo lv
+lve ma mai man mang mao me mei men meng mi mian miao mie min ming miu mo
+mou mu na nai nan nang nao ne nei nen neng ni nian niang niao nie nin
+ning niu nong nou nu nuan nue nuo nv nve o ou pa pai pan pang pao pei pen
+peng pi pian piao pie pin ping po pou pu qi qia qian qiang qiao qie qin
+qing qiong qiu qu quan que qun ran rang rao re ren reng ri rong rou ru
+rua ruan rui run ruo sa sai san sang sao se sen seng sha shai shan shang
+shao she shei shen sheng shi shou shu shua shuai shuan shuang shui shun
+shuo si song sou su suan sui sun suo ta tai tan tang tao te teng ti tian
+tiao tie ting tong tou tu tuan tui tun tuo wa wai wan wang wei wen weng
+wo wu xi xia xian xiang xiao xie xin xing xiong xiu xu xuan xue xun ya
+yan yang yao ye yi yin ying yo yong you yu yuan yue yun za zai zan zang
+zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei zhen zheng zhi
+zhong zhou zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou zu
+zuan zui zun zuo
+""".split())
+
+def _is_pinyin(letters):
+    """Test whether a string of letters splits into pinyin syllables.
+
+    >>> _is_pinyin('zedong')
+    True
+    >>> _is_pinyin('child')
+    False
+    """
+    splits = [True] + [False] * len(letters)
+    for end in range(1, len(letters) + 1):
+        splits[end] = any(splits[start] and letters[start:end] in _PINYIN_SYLLABLES
+                          for start in range(max(0, end - 6), end))
+    return splits[-1]
+
+def tokenize(text):
+    """Split a text into search terms. The text is folded (see
+    :func:`fold`), tone numbers are removed from pinyin syllables and
+    Chinese characters are indexed one by one. Other tokens ending in a
+    digit are indexed both with and without that digit.
+
+    >>> tokenize('Das Mädchen, der Jäger')
+    ['das', 'maedchen', 'der', 'jaeger']
+    >>> tokenize('ren2min2 gong1she4')
+    ['renmin', 'gongshe']
+    >>> tokenize('Op5')
+    ['op5', 'op']
+    >>> tokenize('人民公社 1958')
+    ['人', '民', '公', '社', '1958']
+
+    Parameters
+    ----------
+    text : str
+        The text
+
+    Returns
+    -------
+    list
+        A list of terms
+    """
+    if not isinstance(text, str):
+        return []
+    terms = []
+    for token in _TOKEN.findall(fold(text)):
+        if _CJK.search(token):
+            terms.extend(token)
+        elif _PINYIN_TONE_NUMBERS.fullmatch(token):
+            stripped = _TONE_NUMBER.sub(r'\1', token)
+            if all(_is_pinyin(group)
+                   for group in _SYLLABLE_GROUP.findall(token)):
+                terms.append(stripped)
+            else:
+                terms.extend([token, stripped])
+        else:
+            terms.append(token)
+    return terms
+
+class TextIndex(object):
+    """A full-text index of the entries of all datasets.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the SQLite database, by default ``DEFAULT_SEARCH_PATH``
+    fields : dict, optional
+        The fields to index and their weights, by default
+        ``DEFAULT_FIELDS``
+    k1 : float, optional
+        BM25 term frequency saturation parameter, by default 1.2
+    b : float, optional
+        BM25 length normalization parameter, by default 0.75
+    """
+
+    def __init__(self, path=DEFAULT_SEARCH_PATH, fields=DEFAULT_FIELDS,
+        k1=1.2, b=0.75):
+        self.path = path
+        self.fields = dict(fields)
+        self.k1 = k1
+        self.b = b
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f'<TextIndex path={self.path}>'
+
+    def __len__(self):
+        cursor = self._connection.execute('SELECT COUNT(*) FROM documents')
+        return cursor.fetchone()[0]
+
+    @property
+    def datasets(self):
+        """A dictionary mapping all indexed datasets to their checksum"""
+        cursor = self._connection.execute('SELECT dataset_id, checksum FROM datasets')
+        return dict(cursor.fetchall())
+
+    def _terms(self, entry):
+        """Weighted term frequencies of an entry"""
+        frequencies = Counter()
+        for field, weight in self.fields.items():
+            for term in tokenize(entry.get(field)):
+                frequencies[term] += weight
+        return frequencies
+
+    def remove_dataset(self, dataset_id):
+        """Remove all entries of a dataset from the index"""
+        with self._connection:
+            self._connection.execute(
+                'DELETE FROM postings WHERE doc IN '
+                '(SELECT doc FROM documents WHERE dataset_id=?)', (dataset_id,))
+            self._connection.execute(
+                'DELETE FROM documents WHERE dataset_id=?', (dataset_id,))
+            self._connection.execute(
+                'DELETE FROM datasets WHERE dataset_id=?', (dataset_id,))
+
+    def update_dataset(self, dataset_id, entries, checksum=None):
+        """Index all entries of a dataset, replacing any entries of that
+        dataset that were indexed before.
+
+        Parameters
+        ----------
+        dataset_id : str
+            The dataset id
+        entries : pd.DataFrame
+            The entries, indexed by id
+        checksum : str, optional
+            Checksum of the dataset index, used to detect changes
+
+        Returns
+        -------
+        int
+            The number of indexed entries
+        """
+        self.remove_dataset(dataset_id)
+        columns = [field for field in self.fields if field in entries.columns]
+        records = entries[columns].to_dict('records')
+        with self._connection:
+            self._connection.execute('INSERT INTO datasets VALUES (?, ?)',
+                (dataset_id, checksum))
+            for entry_id, entry in zip(entries.index, records):
+                frequencies = self._terms(entry)
+                cursor = self._connection.execute(
+                    'INSERT INTO documents (dataset_id, id, length) VALUES (?, ?, ?)',
+                    (dataset_id, str(entry_id), sum(frequencies.values())))
+                doc = cursor.lastrowid
+                self._connection.executemany('INSERT INTO postings VALUES (?, ?, ?)',
+                    [(term, doc, tf) for term, tf in frequencies.items()])
+        return len(records)
+
+    def refresh(self, datasets_dir=None, index_fn='index.csv', force=False):
+        """Reindex all datasets whose index has changed, and remove all
+        datasets that no longer exist.
+
+        Parameters
+        ----------
+        datasets_dir : str, optional
+            The directory containing all datasets, by default the
+            ``datasets`` directory.
+        index_fn : str, optional
+            The filename of the index of every dataset
+        force : bool, optional
+            Reindex all datasets, by default False
+
+        Returns
+        -------
+        (list, list)
+            The ids of all reindexed and of all removed datasets
+        """
+        if datasets_dir is None:
+            datasets_dir = DATASETS_DIR
+        indexed = self.datasets
+        current = {}
+        for dataset_id in sorted(os.listdir(datasets_dir)):
+            path = os.path.join(datasets_dir, dataset_id, index_fn)
+            if os.path.exists(path):
+                current[dataset_id] = path
+
+        changed = []
+        for dataset_id, path in current.items():
+            checksum = file_checksum(path)
+            if force or indexed.get(dataset_id) != checksum:
+                logging.info(f'Indexing {dataset_id}')
+                entries = pd.read_csv(path, index_col='id')
+                self.update_dataset(dataset_id, entries, checksum=checksum)
+                changed.append(dataset_id)
+        removed = [dataset_id for dataset_id in indexed if dataset_id not in current]
+        for dataset_id in removed:
+            self.remove_dataset(dataset_id)
+        return changed, removed
+
+    def search(self, query, limit=10, dataset_ids=None):
+        """Search the index
+
+        Parameters
+        ----------
+        query : str
+            The search query. It is tokenized like the indexed texts.
+        limit : int, optional
+            The maximum number of results, by default 10. If None, all
+            matching entries are returned.
+        dataset_ids : list, optional
+            Only return entries from these datasets
+
+        Returns
+        -------
+        pd.DataFrame
+            The matching entries, with columns ``dataset_id``, ``id``
+            and ``score``, ordered by decreasing score.
+        """
+        num_docs, avg_length = self._connection.execute(
+            'SELECT COUNT(*), AVG(length) FROM documents').fetchone()
+        # Only the postings of the selected datasets are read, but the 
+        # inverse document frequency is computed over all documents
+        condition, params = '', ()
+        if dataset_ids is not None:
+            params = tuple(dataset_ids)
+            condition = f' AND dataset_id IN ({", ".join("?" * len(params))})'
+
+        scores = defaultdict(float)
+        entries = {}
+        for term in set(tokenize(query)):
+            postings = self._connection.execute(
+                'SELECT postings.doc, tf, length, dataset_id, id FROM postings '
+                'JOIN documents ON postings.doc = documents.doc '
+                'WHERE term=?' + condition, (term,) + params).fetchall()
+            if len(postings) == 0:
+                continue
+            num_postings = len(postings)
+            if dataset_ids is not None:
+                num_postings = self._connection.execute(
+                    'SELECT COUNT(*) FROM postings WHERE term=?', (term,)).fetchone()[0]
+            idf = math.log(1 + (num_docs - num_postings + 0.5) / (num_postings + 0.5))
+            for doc, tf, length, dataset_id, entry_id in postings:
+                norm = 1 - self.b + self.b * length / avg_length
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                entries[doc] = (dataset_id, entry_id)
+
+        results = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            results = results[:limit]
+        rows = [entries[doc] + (score,) for doc, score in results]
+        return pd.DataFrame(rows, columns=['dataset_id', 'id', 'score'])
+
+    def close(self):
+        """Close the database connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def main(args=None):
+    """Command line interface for the search index"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m catafolk.search',
+        description='Full-text search in all catafolk datasets')
+    parser.add_argument('command', choices=['refresh', 'query'])
+    parser.add_argument('query', nargs='?', default='')
+    parser.add_argument('--path', default=DEFAULT_SEARCH_PATH,
+        help='path to the search index')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--force', action='store_true',
+        help='reindex all datasets')
+    args = parser.parse_args(args)
+
+    index = TextIndex(args.path)
+    if args.command == 'refresh':
+        logging.basicConfig(level=logging.INFO)
+        changed, removed = index.refresh(force=args.force)
+        print(f'Reindexed {len(changed)} and removed {len(removed)} datasets; '
+              f'{len(index)} entries in {index.path}')
+    else:
+        results = index.search(args.query, limit=args.limit)
+        print(results.to_string(index=False))
+    index.close()
+
+if __name__ == '__main__':
+    main()
@@ -65,6 +65,19 @@ You can use a :class:`catafolk.transformer.Transformer` for this:
 >>> source = Source(entries, name='mysource', id_transformer=transformer)
 >>> source.data.index.to_list()
 ['1', '2']
+
+Streaming records
+---------------------
+
+Rather than collecting all data in a dataframe, you can also iterate 
+over the records of a source, one entry at a time. Every record is a
+tuple with the id and a dictionary with the fields of the entry. Only
+the current record is kept in memory, which is used to build large 
+indices in batches (see :meth:`catafolk.index.Index.make`):
+
+>>> source = Source(entries, name='mysource', id_field='foo')
+>>> next(source.records())
+('entry1', {'foo': 'entry1', 'value': 10})
 """
 import os
 import glob
@@ -72,9 +85,14 @@ import logging
 import warnings
 import pandas as pd
 import re
+import contextlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 from .transformer import Transformer
 from .file import get_file
+from .file import _file_entry
+from .file import _extract_entry
 
 __all__ = ['BaseSource', 'Source', 'CSVSource', 'FileSource']
 
@@ -132,6 +150,33 @@ class BaseSource:
             self._data.sort_index(inplace=True)
         return self._data
 
+    def records(self):
+        """Iterate over the records of the source: tuples of the id 
+        and a dictionary with the fields of an entry. Unlike 
+        :attr:`data`, the records are not sorted by id, and they are 
+        not stored."""
+        for entry in self._iter_entries():
+            yield self._entry_id(entry), entry
+
+    def _iter_entries(self):
+        """Private method iterating over all entries as dictionaries.
+        By default, the entries are read from the collected dataframe;
+        child classes can stream them instead."""
+        df = self._collect()
+        for entry in df.to_dict(orient='records'):
+            yield entry
+
+    def _entry_id(self, entry):
+        """Returns the id of an entry, like :meth:`_set_index`"""
+        if self.id_transformer is not None:
+            outputs = self.id_transformer(dict(entry))
+            if not 'new_id' in outputs:
+                raise ValueError('ID transformation failed: no `id` in output.')
+            return outputs['new_id']
+        if self.id_field not in entry:
+            raise ValueError(f'ID field {self.id_field} does not exist')
+        return entry[self.id_field]
+
     def _collect(self):
         """Private method for collecting the data, implemented in 
         child classes.
@@ -159,13 +204,7 @@ class BaseSource:
         """
         index = []
         if self.id_transformer is not None:
-            for _, row in df.iterrows():
-                inputs = row.to_dict()
-                outputs = self.id_transformer(inputs)
-                if not 'new_id' in outputs:
-                    msg = 'ID transformation failed: no `id` in output.'
-                    raise ValueError(msg)
-                index.append(outputs['new_id'])
+            index = [self._entry_id(row.to_dict()) for _, row in df.iterrows()]
         elif self.id_field not in df.columns:
             msg = f'ID field {self.id_field} does not exist'
             raise ValueError(msg)
@@ -198,6 +237,10 @@ class Source(BaseSource):
     def _collect(self):
         return pd.DataFrame(list(self.entries))
 
+    def _iter_entries(self):
+        for entry in self.entries:
+            yield dict(entry)
+
 class CSVSource(BaseSource):
     """Load data from a CSV file.
 
@@ -220,6 +263,13 @@ class CSVSource(BaseSource):
     def _collect(self):
         return pd.read_csv(self.path, **self.options)
 
+    def _iter_entries(self, chunksize=10000):
+        options = dict(self.options, chunksize=chunksize)
+        with pd.read_csv(self.path, **options) as reader:
+            for chunk in reader:
+                for entry in chunk.to_dict(orient='records'):
+                    yield entry
+
 class FileSource(BaseSource):
     """Loads data from a collection of files, specified
     by a glob pattern. 
@@ -242,11 +292,20 @@ class FileSource(BaseSource):
         Options passed to :func:`catafolk.file.get_file`.
     use_filename_as_id : bool, optional
         Whether to use the filename as the id, by default True
+    num_workers : int, optional
+        The number of worker processes used to extract the metadata 
+        from the files. By default (``None`` or ``1``) all files are
+        read in the current process. 
+    chunksize : int, optional
+        The number of files sent to a worker process at once. By 
+        default, the files are divided in roughly four chunks per 
+        worker.
     **kwargs
         Optional keyword arguments passed to :class:`BaseSource`.
     """
     def __init__(self, data_dir, file_pattern, exclude=[],
-        file_options={}, use_filename_as_id=True, **kwargs):
+        file_options={}, use_filename_as_id=True, num_workers=None,
+        chunksize=None, **kwargs):
         super().__init__(**kwargs)
 
         # Change id field if using the filename as id
@@ -270,7 +329,9 @@ class FileSource(BaseSource):
             warnings.warn('No files were found')
         self._files = {}
         self.file_options = file_options
-        self.data_dir = data_dir      
+        self.data_dir = data_dir
+        self.num_workers = num_workers
+        self.chunksize = chunksize
 
     @property
     def files(self):
@@ -280,18 +341,118 @@ class FileSource(BaseSource):
                 self._files[path] = file
         return self._files
 
+    def checksums(self):
+        """Return the checksums of all files, without extracting any 
+        metadata. 
+
+        >>> data_dir = 'tests/datasets/bronson-child-ballads/data'
+        >>> source = FileSource(data_dir, '*.krn', name='file')
+        >>> source.checksums()['child01.krn']
+        '350fc2b9839d7d7669d83f77efdc03c2'
+        
+        Returns
+        -------
+        dict
+            A dictionary mapping the paths of the files relative to the 
+            data directory to their checksums.
+        """
+        return {file.relpath(self.data_dir): file.checksum 
+                for file in self.files.values()}
+
+    def restrict(self, relpaths):
+        """Restrict the source to a subset of its files. This can be 
+        used to only (re)extract the metadata from files that have 
+        changed. Previously collected data is discarded.
+        
+        Parameters
+        ----------
+        relpaths : iterable
+            Paths of the files to keep, relative to the data directory
+        """
+        relpaths = set(relpaths)
+        self.filepaths = [path for path in self.filepaths
+            if os.path.relpath(path, start=self.data_dir) in relpaths]
+        self._files = {path: file for path, file in self._files.items()
+            if path in self.filepaths}
+        self._data = None
+
+    @contextlib.contextmanager
+    def restricted(self, relpaths):
+        """A context manager that temporarily restricts the source to
+        a subset of its files (see :meth:`restrict`). Afterwards, the
+        source is restored to all its files again, so that it can 
+        still be used for a full build.
+
+        >>> data_dir = 'tests/datasets/bronson-child-ballads/data'
+        >>> source = FileSource(data_dir, '*.krn', name='file')
+        >>> with source.restricted(['child01.krn']):
+        ...     len(source.data)
+        1
+        >>> len(source.filepaths) > 1
+        True
+        """
+        state = (self.filepaths, self._files, self._data)
+        self.restrict(relpaths)
+        try:
+            yield self
+        finally:
+            self.filepaths, self._files, self._data = state
+
     def _collect(self):
-        entries = []
         prefix = self.internal_fields_prefix
-        for path, file in self.files.items():
-            entry = file.metadata
-            entry[f'{prefix}path'] = file.relpath(self.data_dir)
-            entry[f'{prefix}checksum'] = file.checksum
-            entry[f'{prefix}format'] = file.format
-            entry[f'{prefix}name'] = file.name
-            entries.append(file.metadata)
+        if len(self.filepaths) == 0:
+            columns = [f'{prefix}{field}' for field in ['path', 'checksum', 'format', 'name']]
+            return pd.DataFrame([], columns=columns)
+        if self.num_workers is not None and self.num_workers > 1:
+            entries = self._collect_parallel()
+        else:
+            entries = [_file_entry(file, self.data_dir, prefix) 
+                       for file in self.files.values()]
         return pd.DataFrame(entries)
 
+    def _collect_parallel(self):
+        """Extract the metadata from all files using a pool of worker
+        processes. The entries are returned in the same order as 
+        ``self.filepaths``, so the result is identical to that of
+        the serial extraction."""
+        chunksize = self.chunksize
+        if chunksize is None:
+            num_chunks = 4 * self.num_workers
+            chunksize = max(1, -(-len(self.filepaths) // num_chunks))
+        extract = partial(_extract_entry, 
+            file_options=self.file_options,
+            data_dir=self.data_dir, 
+            prefix=self.internal_fields_prefix,
+            flush=True)
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            entries = list(executor.map(extract, self.filepaths, chunksize=chunksize))
+        return entries
+
+    def _iter_entries(self):
+        """Extract the metadata from the files one by one, in order of
+        their paths. The files are not stored (see :attr:`files`), so 
+        that memory use does not grow with the number of files. Worker
+        processes extract the files in rounds of a few chunks per 
+        worker."""
+        filepaths = sorted(self.filepaths)
+        extract = partial(_extract_entry, 
+            file_options=self.file_options,
+            data_dir=self.data_dir, 
+            prefix=self.internal_fields_prefix)
+        if self.num_workers is None or self.num_workers <= 1:
+            for path in filepaths:
+                yield extract(path)
+            return
+
+        extract = partial(extract, flush=True)
+        chunksize = self.chunksize or 16
+        round_size = 4 * self.num_workers * chunksize
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            for start in range(0, len(filepaths), round_size):
+                paths = filepaths[start:start + round_size]
+                for entry in executor.map(extract, paths, chunksize=chunksize):
+                    yield entry
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
\ No newline at end of file
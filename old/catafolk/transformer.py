@@ -58,10 +58,39 @@ Or in a YAML file, two variants::
 #
 import re
 import json
-from graphkit import operation as create_operation
-from graphkit import compose
-from graphkit.network import DataPlaceholderNode
-from .operations import *
+import time
+from . import operations as _operations
+from .operations import _COLUMNAR_OPERATIONS
+from .operations import _PARAMETER_COMPILERS
+
+# Marks values that were not computed by an operation
+_MISSING = object()
+
+class _Operation(object):
+    """An operation in the computation graph: a function bound to its
+    parameters and the names of its inputs and outputs. Graphkit is only
+    used to plot the graph (see :meth:`Transformer.plot`), so that it
+    does not have to be imported whenever a transformer is used."""
+    __slots__ = ('name', 'fn', 'needs', 'provides', 'params')
+
+    def __init__(self, name, fn, needs, provides, params={}):
+        self.name = name
+        self.fn = fn
+        self.needs = list(needs)
+        self.provides = list(provides)
+        self.params = params
+
+    def __repr__(self):
+        return f'<Operation {self.name} needs={self.needs} provides={self.provides}>'
+
+def _lookup_operation(name):
+    """Return the operation in :mod:`catafolk.operations` with a given
+    name, or raise a ValueError if there is no such operation"""
+    operation = getattr(_operations, name, None) if not name.startswith('_') else None
+    if (not callable(operation) or isinstance(operation, type)
+        or getattr(operation, '__module__', None) != _operations.__name__):
+        raise ValueError(f'Unknown operation `{name}`')
+    return operation
 
 def expand_shorthand(shorthand):
     """Expands a shorthand description to a series of full operations,
@@ -269,46 +298,248 @@ def expand_shorthand(shorthand):
 
     return operations_dicts
 
+class OperationStats(object):
+    """Statistics of a single operation in a :class:`Profile`"""
+    __slots__ = ['name', 'function', 'calls', 'entries', 'time', 'errors']
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.calls = 0
+        self.entries = 0
+        self.time = 0.0
+        self.errors = 0
+
+    def __repr__(self):
+        return (f'<OperationStats {self.name} calls={self.calls} '
+                f'time={self.time:.6f} errors={self.errors}>')
+
+class Profile(object):
+    """A profile of the operations of a :class:`Transformer`: for every
+    operation (e.g. ``replace_3``) it records the number of calls, the
+    number of entries processed, the cumulative time and the number of
+    exceptions raised. A columnar operation (see 
+    :meth:`Transformer.transform_columns`) processes many entries in 
+    a single call.
+
+    >>> T = Transformer([['uppercase', 'a', 'b'], ['rename', 'b', 'c']])
+    >>> profile = T.enable_profiling()
+    >>> for value in ['x', 'y', 3]:
+    ...     _ = T.transform_columns({'a': [value]}, 1)
+    >>> table = profile.table()
+    >>> table[['calls', 'entries', 'errors']]
+                 calls  entries  errors
+    operation                          
+    uppercase_1      3        3       1
+    rename_1         2        2       0
+
+    The entry for which ``uppercase_1`` failed is skipped by 
+    ``rename_1``. Use :meth:`format` to print the statistics, or 
+    :meth:`Transformer.plot` to show them in the computation graph.
+    """
+
+    def __init__(self):
+        self.operations = {}
+
+    def __repr__(self):
+        return f'<Profile operations={len(self.operations)}>'
+
+    def __getitem__(self, name):
+        return self.operations[name]
+
+    def reset(self):
+        """Forget all recorded statistics"""
+        self.operations = {}
+
+    def _stats(self, name, fn):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = OperationStats(name, getattr(fn, '__name__', str(fn)))
+            self.operations[name] = stats
+        return stats
+
+    def record(self, name, fn, duration, calls=1, entries=1, errors=0):
+        """Record calls of an operation"""
+        stats = self._stats(name, fn)
+        stats.calls += calls
+        stats.entries += entries
+        stats.time += duration
+        stats.errors += errors
+
+    def call(self, name, fn, args, params):
+        """Call the function of an operation and record the call"""
+        stats = self._stats(name, fn)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **params)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.time += time.perf_counter() - start
+            stats.calls += 1
+            stats.entries += 1
+
+    @property
+    def total_time(self):
+        """The time spent in all operations"""
+        return sum(stats.time for stats in self.operations.values())
+
+    def table(self, sort_by='time'):
+        """The statistics of all operations as a dataframe, sorted in 
+        descending order. Besides the recorded statistics, it lists the 
+        time per entry and the share of the total time.
+
+        Parameters
+        ----------
+        sort_by : str, optional
+            The column to sort by, by default ``'time'``
+
+        Returns
+        -------
+        pd.DataFrame
+            A dataframe indexed by the operation names
+        """
+        import pandas as pd
+        columns = ['function', 'calls', 'entries', 'time', 'errors']
+        rows = [[getattr(stats, column) for column in columns]
+                for stats in self.operations.values()]
+        index = pd.Index(list(self.operations.keys()), name='operation')
+        df = pd.DataFrame(rows, columns=columns, index=index)
+        entries = df['entries'].where(df['entries'] > 0)
+        df['time_per_entry'] = df['time'] / entries
+        total = self.total_time
+        df['share'] = df['time'] / total if total > 0 else 0.0
+        return df.sort_values(sort_by, ascending=False, kind='stable')
+
+    def format(self, limit=None):
+        """Format the statistics as a table, sorted by time
+
+        Parameters
+        ----------
+        limit : int, optional
+            Only show the slowest operations
+        """
+        table = self.table()
+        if limit is not None:
+            table = table.iloc[:limit]
+        width = max([len('operation')] + [len(name) for name in table.index])
+        lines = [f'{"operation":<{width}} {"calls":>9} {"entries":>9} '
+                 f'{"time (s)":>10} {"us/entry":>9} {"share":>6} {"errors":>7}']
+        for name, row in table.iterrows():
+            per_entry = row['time_per_entry'] * 1e6 if row['entries'] > 0 else 0
+            lines.append(f'{name:<{width}} {row["calls"]:>9} {row["entries"]:>9} '
+                         f'{row["time"]:>10.4f} {per_entry:>9.2f} '
+                         f'{row["share"]:>6.1%} {row["errors"]:>7}')
+        lines.append(f'Total time {self.total_time:.4f}s in {len(self.operations)} operations')
+        return '\n'.join(lines)
+
+    def annotation(self, name):
+        """A short description of the statistics of an operation, used 
+        to annotate the operation in :meth:`Transformer.plot`"""
+        stats = self.operations.get(name)
+        if stats is None:
+            return f'{name}\nnot called'
+        total = self.total_time
+        share = stats.time / total if total > 0 else 0
+        label = f'{name}\n{stats.time * 1000:.1f} ms ({share:.0%}), {stats.calls} calls'
+        if stats.errors > 0:
+            label += f', {stats.errors} errors'
+        return label
+
+def _profile_color(profile, name):
+    """The color of an operation in a profiled plot: the larger its 
+    share of the total time, the more prominent
+
+    >>> profile = Profile()
+    >>> profile.record('slow', print, 0.9)
+    >>> profile.record('fast', print, 0.05)
+    >>> _profile_color(profile, 'slow'), _profile_color(profile, 'fast')
+    ('red3', 'grey50')
+    """
+    stats = profile.operations.get(name)
+    total = profile.total_time
+    share = stats.time / total if stats is not None and total > 0 else 0
+    if share >= 0.25:
+        return 'red3'
+    elif share >= 0.1:
+        return 'darkorange2'
+    return 'grey50'
+
 class Transformer():
+    """A transformation: a computation graph of operations.
+
+    The operations are compiled into an *execution plan* (see 
+    :meth:`compose`): a list of steps in topological order, each 
+    binding a function to its parameters and the names of its inputs 
+    and outputs. Applying the transformation to an entry then only 
+    requires a single pass over the plan.
+
+    To find out which operations take most time, enable profiling (see
+    :meth:`enable_profiling` and :class:`Profile`).
+    """
     _empty_input = '_'
 
     def __init__(self, operations=[]):
         self.operations = []
-        self.graph = None
-        self._leafs = None
-        self._roots = None
-        self._nodes = None
+        self._reset()
         self.operation_counter = {}
+        self.mapping_paths = []
+        self.profile = None
         self.add(operations)
 
+    def enable_profiling(self):
+        """Record the number of calls, the time and the number of errors
+        of every operation whenever the transformer is applied. 
+
+        Returns
+        -------
+        Profile
+            The profile, which is also stored as :attr:`profile`
+        """
+        if self.profile is None:
+            self.profile = Profile()
+        return self.profile
+
+    def disable_profiling(self):
+        """Stop profiling. Returns the profile recorded so far."""
+        profile = self.profile
+        self.profile = None
+        return profile
+
     @property
     def leafs(self):
         """List of names of leaf nodes: outputs of the computation graph"""
         if not self._leafs:
-            graph = self.graph.net.graph
-            leaf_nodes = [node for node in graph.nodes() 
-                if graph.in_degree(node)!=0 and graph.out_degree(node)==0]
-            self._leafs = [str(leaf) for leaf in leaf_nodes]
+            self._leafs = [node for node in self.nodes 
+                if self._in_degree[node] != 0 and self._out_degree[node] == 0]
         return self._leafs
 
     @property
     def roots(self):
         """List of names of root nodes: the inputs to the computation graph"""
         if not self._roots:
-            graph = self.graph.net.graph
-            root_nodes = [node for node in graph.nodes() 
-                if graph.in_degree(node)==0 and graph.out_degree(node)==1]
-            self._roots = [str(root) for root in root_nodes]
+            self._roots = [node for node in self.nodes 
+                if self._in_degree[node] == 0 and self._out_degree[node] == 1]
         return self._roots
 
+    @property
+    def inputs(self):
+        """List of names of all inputs: data nodes that are not computed 
+        by any operation, such as the fields of an entry
+
+        >>> Transformer([['join', ['a', 'b'], 'c'], ['uppercase', 'c', 'd']]).inputs
+        ['a', 'b']
+        """
+        return [node for node in self.nodes
+            if self._in_degree[node] == 0 and node != self._empty_input]
+
     @property
     def nodes(self):
+        """List of names of all data nodes in the computation graph"""
         if not self._nodes:
-            self._nodes = []
-            graph = self.graph.net.graph
-            for node in graph.nodes():
-                if isinstance(node, DataPlaceholderNode):
-                    self._nodes.append(str(node))
+            if self.plan is None: self.compose()
+            self._nodes = list(self._in_degree.keys())
         return self._nodes
 
     def add_operation(self, operation, inputs, outputs, params={}, name=None, **kwargs):
@@ -319,9 +550,7 @@ class Transformer():
 
         # If operation is a string (function name), look up the actual function
         if type(operation) == str:
-            if operation not in globals():
-                raise ValueError(f'Unknown operation `{operation}`')
-            operation = globals()[operation]
+            operation = _lookup_operation(operation)
         
         # Cook up a unique name: the function name plus a counter
         if name is None: 
@@ -332,9 +561,28 @@ class Transformer():
         if len(inputs) == 0:
             inputs = [self._empty_input]
 
-        kwargs = dict(name=name, needs=inputs, provides=outputs, params=params)
-        op = create_operation(**kwargs)(operation)
+        # Remember the mapping files used, as they are part of the 
+        # configuration (see :meth:`catafolk.dataset.Dataset.config_checksum`)
+        if params and params.get('mapping_path') is not None:
+            self.mapping_paths.append(params['mapping_path'])
+
+        # Compile regular expressions etc. once, rather than in every call
+        if operation in _PARAMETER_COMPILERS:
+            params = _PARAMETER_COMPILERS[operation](dict(params))
+
+        op = _Operation(name, operation, needs=inputs, provides=outputs, params=params)
         self.operations.append(op)
+        self._reset()
+
+    def _reset(self):
+        """Discard the execution plan, the graph and everything derived
+        from them, so that they are recomputed after a change"""
+        self.plan = None
+        self.graph = None
+        self._leafs = None
+        self._roots = None
+        self._nodes = None
+        self._necessary_steps_cache = {}
 
     def add(self, operations):
         """Add a list of operations to the transformation.
@@ -389,33 +637,259 @@ class Transformer():
             self.add(*operations)
 
     def compose(self):
-        self.graph = compose(name='_computation_graph')(*self.operations)
+        """Compile the operations into an execution plan: a list of
+        steps ``(name, function, params, inputs, outputs)`` sorted 
+        topologically, so that every step only depends on inputs
+        and outputs of earlier steps."""
+        # Count the number of operations producing and using every node
+        in_degree = {}
+        out_degree = {}
+        producers = {}
+        for op in self.operations:
+            for name in op.needs:
+                in_degree.setdefault(name, 0)
+                out_degree[name] = out_degree.get(name, 0) + 1
+            for name in op.provides:
+                in_degree[name] = in_degree.get(name, 0) + 1
+                out_degree.setdefault(name, 0)
+                producers.setdefault(name, []).append(op)
+
+        # Topological sort of the operations (Kahn's algorithm), 
+        # preserving the order in which operations were added
+        dependencies = {}
+        for op in self.operations:
+            deps = set()
+            for name in op.needs:
+                deps.update(id(p) for p in producers.get(name, []) if p is not op)
+            dependencies[id(op)] = deps
+        ordered = []
+        done = set()
+        remaining = list(self.operations)
+        while len(remaining) > 0:
+            ready = [op for op in remaining if dependencies[id(op)] <= done]
+            if len(ready) == 0:
+                names = [op.name for op in remaining]
+                raise ValueError(f'The operations contain a cycle: {names}')
+            for op in ready:
+                ordered.append(op)
+                done.add(id(op))
+            remaining = [op for op in remaining if id(op) not in done]
+
+        self.plan = [(op.name, op.fn, op.params, tuple(op.needs), tuple(op.provides))
+                     for op in ordered]
+        self._in_degree = in_degree
+        self._out_degree = out_degree
+        self._necessary_steps_cache = {}
+        self._leafs = None
+        self._roots = None
+        self._nodes = None
+
+    def _necessary_steps(self, inputs):
+        """Returns the steps of the plan that are reachable from the 
+        given inputs. Like in graphkit, other steps are skipped, even 
+        if they do not have any inputs."""
+        key = frozenset(inputs)
+        if key not in self._necessary_steps_cache:
+            reachable = set(key)
+            steps = []
+            for step in self.plan:
+                _, _, _, needs, provides = step
+                if any(name in reachable for name in needs):
+                    steps.append(step)
+                    reachable.update(provides)
+            self._necessary_steps_cache[key] = steps
+        return self._necessary_steps_cache[key]
 
     def __call__(self, inputs={}, outputs=None, outputs_only=True):
-        if self.graph is None: self.compose()
-        inputs[self._empty_input] = None
+        """Apply the transformation to an entry
+        
+        Parameters
+        ----------
+        inputs : dict, optional
+            The entry: a dictionary with the values of the inputs
+        outputs : list, optional
+            Currently ignored
+        outputs_only : bool, optional
+            If True (default), only return the values of the leafs of 
+            the graph. Otherwise all inputs and all computed values are 
+            returned.
+        
+        Returns
+        -------
+        dict
+            The transformed entry
+        """
+        if self.plan is None: self.compose()
+        transformed = dict(inputs)
+        transformed[self._empty_input] = None
 
         # TODO: outputs is now ignored. The problem is that it raises
         # an error if an input is now missing, which is very likely...
-        #valid_outputs = [n for n in self.nodes if n in outputs]
-        transformed = self.graph(inputs)#, outputs=valid_outputs)
+        profile = self.profile
+        for name, fn, params, needs, provides in self._necessary_steps(transformed):
+            if profile is None:
+                result = fn(*[transformed[name] for name in needs], **params)
+            else:
+                args = [transformed[need] for need in needs]
+                result = profile.call(name, fn, args, params)
+            if len(provides) == 1:
+                transformed[provides[0]] = result
+            else:
+                transformed.update(zip(provides, result))
         
         if outputs_only:
             return { leaf: transformed.get(leaf, None) for leaf in self.leafs }
         else:
             return transformed
 
-    def plot(self, filename):
+    def transform_columns(self, columns, num_entries):
+        """Apply the transformation to many entries at once. Rather than 
+        evaluating the computation graph for every entry, every operation
+        is evaluated once for all entries. Operations that have a 
+        columnar form (see :mod:`catafolk.operations`) are applied to the 
+        columns directly, until the first entry fails; other operations 
+        are applied to every entry, and so are columnar operations whose
+        columnar form rejects the inputs. The results are identical to calling the transformer on every 
+        entry with ``outputs_only=False``.
+
+        >>> T = Transformer([['uppercase', 'a', 'b'], ['rename', 'b', 'c']])
+        >>> outputs, errors = T.transform_columns({'a': ['x', 'y', 3]}, 3)
+        >>> outputs['c']
+        ['X', 'Y', nan]
+        >>> errors
+        {2: AttributeError("'int' object has no attribute 'upper'")}
+        
+        Parameters
+        ----------
+        columns : dict
+            A dictionary mapping input names to lists of values
+        num_entries : int
+            The number of entries, i.e. the length of the columns
+        
+        Returns
+        -------
+        (dict, dict)
+            A dictionary with the values of all nodes in the graph, 
+            including the inputs. Values that could not be computed are
+            NaN. The second dictionary maps the positions of entries 
+            for which the transformation failed to the exception raised.
+        """
+        if self.plan is None: self.compose()
+        data = dict(columns)
+        data[self._empty_input] = [None] * num_entries
+        errors = {}
+        has_missing = False
+        profile = self.profile
+
+        for step_name, fn, params, needs, provides in self._necessary_steps(data):
+            # Inputs that are missing for all entries
+            missing = [name for name in needs if name not in data]
+            if len(missing) > 0:
+                for i in range(num_entries):
+                    errors.setdefault(i, KeyError(missing[0]))
+                continue
+
+            if profile is not None:
+                start = time.perf_counter()
+            inputs = [data[name] for name in needs]
+            outputs = None
+            columnar_fn = _COLUMNAR_OPERATIONS.get(fn)
+            if columnar_fn is not None and not has_missing and len(errors) == 0:
+                try:
+                    outputs = columnar_fn(*inputs, **params)
+                except Exception:
+                    # Apply the operation to every entry instead
+                    outputs = None
+                if outputs is not None and len(outputs) != len(provides):
+                    outputs = None
+                if outputs is not None and profile is not None:
+                    profile.record(step_name, fn, time.perf_counter() - start,
+                        calls=1, entries=num_entries)
+
+            if outputs is None:
+                num_calls = 0
+                num_exceptions = 0
+                outputs = [[] for _ in provides]
+                for i, values in enumerate(zip(*inputs)):
+                    result = []
+                    if i in errors:
+                        pass
+                    elif any(value is _MISSING for value in values):
+                        name = needs[[v is _MISSING for v in values].index(True)]
+                        errors[i] = KeyError(name)
+                    else:
+                        try:
+                            num_calls += 1
+                            result = fn(*values, **params)
+                            if len(provides) == 1:
+                                result = [result]
+                        except Exception as e:
+                            errors[i] = e
+                            num_exceptions += 1
+                            result = []
+                    
+                    # Like graphkit, zip the outputs and the results
+                    num_results = 0
+                    for output, value in zip(outputs, result):
+                        output.append(value)
+                        num_results += 1
+                    for j in range(num_results, len(outputs)):
+                        name = provides[j]
+                        if name in data:
+                            outputs[j].append(data[name][i])
+                        else:
+                            outputs[j].append(_MISSING)
+                            has_missing = True
+                if profile is not None:
+                    profile.record(step_name, fn, time.perf_counter() - start,
+                        calls=num_calls, entries=num_calls, 
+                        errors=num_exceptions)
+
+            for name, output in zip(provides, outputs):
+                data[name] = output
+
+        if has_missing:
+            for name, values in data.items():
+                data[name] = [float('nan') if v is _MISSING else v for v in values]
+        return data, errors
+
+    def plot(self, filename, profile=False):
+        """Plot the computation graph. Requires pydot and graphviz.
+
+        Parameters
+        ----------
+        filename : str
+            The output file (png, dot, jpg, pdf or svg)
+        profile : bool or Profile, optional
+            Annotate every operation with its statistics: the time, the 
+            share of the total time, the number of calls and errors. 
+            Slow operations are highlighted. If True, the :attr:`profile`
+            of the transformer is used. By default False.
+        """
+        if profile is True:
+            profile = self.profile
+            if profile is None:
+                raise ValueError('Profiling is not enabled')
+        elif profile is False:
+            profile = None
+
         # Fixes a bug in https://github.com/yahoo/graphkit/blob/e70718bbc7b394280c39c1fda381bcebd4c3de8d/graphkit/network.py#L378
         import pydot
         import os
+        from graphkit import operation as create_operation
+        from graphkit import compose
+        from graphkit.network import DataPlaceholderNode
         
         def get_node_name(a):
             if isinstance(a, DataPlaceholderNode):
                 return a
             return a.name
 
-        if self.graph is None: self.compose()
+        if self.graph is None: 
+            operations = [create_operation(name=op.name, needs=op.needs,
+                              provides=op.provides, params=op.params)(op.fn)
+                          for op in self.operations]
+            self.graph = compose(name='_computation_graph')(*operations)
         graph = self.graph.net.graph
         g = pydot.Dot(graph_type="digraph", layout="twopi")
 
@@ -444,6 +918,12 @@ class Transformer():
                         color='brown2', fontcolor='brown2', **styles)
                 else:
                     node = pydot.Node(name=nx_node, shape="rect", **styles)
+            elif profile is not None:
+                # Transformation nodes annotated with their statistics
+                color = _profile_color(profile, nx_node.name)
+                node = pydot.Node(name=nx_node.name, shape="rect", 
+                    label='"{}"'.format(profile.annotation(nx_node.name).replace('\n', '\\n')),
+                    style="rounded", color=color, fontcolor=color, **styles)
             else:
                 # Transformation nodes
                 node = pydot.Node(name=nx_node.name, shape="rect", 
@@ -5,10 +5,26 @@
 # -------------------------------------------------------------------
 """Some useful utilities"""
 
+import os
+import mmap
 import hashlib
+import unicodedata
 
-def file_checksum(path: str):
-    """Return an md5 checksum of a given file
+CUR_DIR = os.path.dirname(__file__)
+ROOT_DIR = os.path.abspath(os.path.join(CUR_DIR, os.path.pardir))
+DATASETS_DIR = os.path.join(ROOT_DIR, 'datasets')
+
+# Size of the chunks in which files are read when hashing them
+BUFFER_SIZE = 1 << 20
+
+# Files larger than this are memory-mapped rather than read in chunks
+MMAP_THRESHOLD = 1 << 24
+
+def file_checksum(path: str, algorithm: str = 'md5', buffer_size: int = BUFFER_SIZE):
+    """Return a checksum of a given file. By default this is an md5
+    checksum, as used in the ``file_checksum`` field of the index, but
+    any algorithm supported by :mod:`hashlib` can be used, such as 
+    ``'blake2b'`` or ``'sha256'``.
 
     >>> path = 'tests/datasets/bronson-child-ballads/data/child01.krn'
     >>> file_checksum(path)
@@ -18,16 +34,32 @@ def file_checksum(path: str):
     ----------
     path : str
         The filepath
+    algorithm : str, optional
+        The hash algorithm, by default ``'md5'``
+    buffer_size : int, optional
+        Files are read in chunks of this many bytes, by default 1 MiB.
+        Files larger than ``MMAP_THRESHOLD`` are memory-mapped instead.
     
     Returns
     -------
     str
-        A md5 checksum of the file
+        The checksum of the file
     """
-    with open(path, "rb") as handle:
-        iterable = iter(lambda: handle.read(4096), b"")
-        checksum = checksum_iterable(iterable)
-    return checksum
+    hash = hashlib.new(algorithm)
+    with open(path, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hash.update(mapped)
+        else:
+            buffer = bytearray(min(buffer_size, max(size, 1)))
+            view = memoryview(buffer)
+            while True:
+                num_bytes = handle.readinto(buffer)
+                if not num_bytes:
+                    break
+                hash.update(view[:num_bytes])
+    return hash.hexdigest()
 
 def checksum_iterable(iterable):
     """Return an md5 checksum of an iterable
@@ -52,6 +84,25 @@ def checksum_iterable(iterable):
         hash_md5.update(chunk)
     return hash_md5.hexdigest()
 
+# Letters that are folded before diacritics are removed
+_FOLDINGS = str.maketrans({
+    'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss',
+    'æ': 'ae', 'ø': 'oe', 'œ': 'oe', 'å': 'aa',
+})
+
+def fold(text):
+    """Lowercase a text, spell out German umlauts and remove all other
+    diacritics, including pinyin tone marks.
+
+    >>> fold('Mädchen Straße')
+    'maedchen strasse'
+    >>> fold('Rénmín gōngshè hǎo')
+    'renmin gongshe hao'
+    """
+    text = text.lower().translate(_FOLDINGS)
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
 if __name__ == '__main__':
     import doctest
-    doctest.testmod()
\ No newline at end of file
+    doctest.testmod()
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# -------------------------------------------------------------------
+"""Installs the catafolk package and the ``catafolk`` command (see
+:mod:`catafolk.cli`). The datasets and schemas are read from this
+repository, so install it in development mode::
+
+    pip install -e .
+"""
+from setuptools import setup
+from setuptools import find_namespace_packages
+
+setup(
+    name='catafolk',
+    version='0.1.0',
+    description='A catalogue of folk music datasets for computational ethnomusicology',
+    author='Bas Cornelissen',
+    url='https://github.com/bacor/catafolk',
+    packages=find_namespace_packages(include=['catafolk', 'catafolk.*']),
+    package_data={'catafolk': ['*.json', '*.yml']},
+    python_requires='>=3.7',
+    install_requires=['pandas', 'pyyaml', 'graphkit'],
+    extras_require={
+        'geocoding': ['geopy'],
+        'arrow': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': ['catafolk = catafolk.cli:main'],
+    },
+)
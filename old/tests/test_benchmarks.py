@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import glob
+import shutil
+import tempfile
+from catafolk.dataset import Dataset
+from catafolk.utils import file_checksum
+from benchmarks.corpus import DATASET_ID
+from benchmarks.corpus import generate_corpus
+from benchmarks.stages import STAGES
+from benchmarks.stages import time_stages
+from benchmarks.import_time import time_import
+
+class TestSyntheticCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def checksums(self, directory):
+        paths = glob.glob(os.path.join(directory, '**', '*.*'), recursive=True)
+        return {os.path.relpath(p, directory): file_checksum(p) for p in paths}
+
+    def test_generate(self):
+        ids = generate_corpus(self.dir, 25, xml_fraction=0.4, files_per_dir=10)
+        self.assertEqual(len(ids), 25)
+        self.assertListEqual(sorted(os.listdir(os.path.join(self.dir, 'data'))),
+                             ['0000', '0001', '0002'])
+        dataset = Dataset(DATASET_ID, options=dict(dir=self.dir))
+        dataset.make()
+        data = dataset.index.data
+        self.assertListEqual(sorted(data.index), ids)
+        self.assertSetEqual(set(data['file_format']), {'kern', 'xml'})
+        for field in ['title', 'location', 'catalogue_num', 'culture', 'collection_date']:
+            self.assertTrue(data[field].notna().all(), field)
+
+    def test_deterministic(self):
+        other_dir = os.path.join(self.dir, 'other')
+        generate_corpus(os.path.join(self.dir, 'one'), 10, seed=1)
+        generate_corpus(other_dir, 10, seed=1)
+        self.assertDictEqual(self.checksums(os.path.join(self.dir, 'one')),
+                             self.checksums(other_dir))
+
+    def test_single_format(self):
+        for xml_fraction, formats in [(0, {'kern'}), (1, {'xml'})]:
+            directory = os.path.join(self.dir, str(xml_fraction))
+            generate_corpus(directory, 5, xml_fraction=xml_fraction)
+            dataset = Dataset(DATASET_ID, options=dict(dir=directory))
+            dataset.make()
+            self.assertEqual(len(dataset.index.data), 5)
+            self.assertSetEqual(set(dataset.index.data['file_format']), formats)
+
+    def test_time_stages(self):
+        generate_corpus(self.dir, 10)
+        times, num_entries = time_stages(self.dir)
+        self.assertListEqual(list(times.keys()), STAGES)
+        self.assertEqual(num_entries, 10)
+
+class TestImportTime(unittest.TestCase):
+
+    def test_light_modules(self):
+        # Transformers and the extraction of metadata from files (in 
+        # worker processes) should not need any heavy dependencies
+        for module in ['catafolk.file', 'catafolk.operations', 'catafolk.transformer']:
+            result = time_import(module, repeat=1)
+            self.assertListEqual(result['heavy'], [])
+            self.assertGreater(result['seconds'], 0)
+
+    def test_heavy_modules(self):
+        result = time_import('catafolk.dataset', repeat=1)
+        self.assertIn('pandas', result['heavy'])
+        self.assertNotIn('graphkit', result['heavy'])
+        self.assertNotIn('geopy', result['heavy'])
+
+if __name__ == '__main__':
+    unittest.main()
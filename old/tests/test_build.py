@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import shutil
+import tempfile
+from catafolk.build import *
+
+TEST_CONFIG = """
+sources:
+  - name: csv
+    type: csv
+    path: songs.csv
+    id_field: song_id
+transformations:
+  - constant: [dataset_id, {dataset_id}]
+"""
+
+def create_test_datasets(datasets_dir):
+    for dataset_id in ['dataset-a', 'dataset-b']:
+        directory = os.path.join(datasets_dir, dataset_id)
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'dataset.yml'), 'w') as handle:
+            handle.write(TEST_CONFIG.format(dataset_id=dataset_id))
+        with open(os.path.join(directory, 'songs.csv'), 'w') as handle:
+            handle.write('song_id,title\nsong1,foo\nsong2,bar\n')
+
+    # A dataset whose source file is missing
+    directory = os.path.join(datasets_dir, 'broken')
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'dataset.yml'), 'w') as handle:
+        handle.write(TEST_CONFIG.format(dataset_id='broken'))
+    
+    # Not a dataset
+    os.makedirs(os.path.join(datasets_dir, 'other'))
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.datasets_dir = tempfile.mkdtemp()
+        create_test_datasets(self.datasets_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.datasets_dir)
+
+    def test_list_datasets(self):
+        dataset_ids = list_datasets(self.datasets_dir)
+        self.assertListEqual(dataset_ids, ['broken', 'dataset-a', 'dataset-b'])
+
+    def test_build_dataset(self):
+        options = {'dir': os.path.join(self.datasets_dir, '{dataset_id}')}
+        result = build_dataset('dataset-a', options=options)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['num_entries'], 2)
+        self.assertGreater(result['duration'], 0)
+        index_path = os.path.join(self.datasets_dir, 'dataset-a', 'index.csv')
+        self.assertTrue(os.path.exists(index_path))
+
+    def test_build_dataset_fails(self):
+        options = {'dir': os.path.join(self.datasets_dir, '{dataset_id}')}
+        result = build_dataset('broken', options=options)
+        self.assertEqual(result['status'], 'failed')
+        self.assertTrue(result['error'].startswith('FileNotFoundError'))
+
+    def test_build_datasets(self):
+        report = build_datasets(datasets_dir=self.datasets_dir, num_workers=2)
+        self.assertEqual(report['num_workers'], 2)
+        self.assertGreater(report['duration'], 0)
+        statuses = {r['dataset_id']: r['status'] for r in report['datasets']}
+        self.assertDictEqual(statuses, {
+            'broken': 'failed', 
+            'dataset-a': 'success', 
+            'dataset-b': 'success'})
+        self.assertIn('Built 2 of 3 datasets', format_report(report))
+
+    def test_build_datasets_serial(self):
+        report = build_datasets(['dataset-b', 'dataset-a'], num_workers=1,
+            datasets_dir=self.datasets_dir)
+        self.assertEqual(report['num_workers'], 1)
+        dataset_ids = [r['dataset_id'] for r in report['datasets']]
+        self.assertListEqual(dataset_ids, ['dataset-b', 'dataset-a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import time
+import shutil
+import tempfile
+import hashlib
+from unittest import mock
+from catafolk.cache import MetadataCache
+from catafolk.file import get_file
+from catafolk.file import _extract_entry
+from catafolk.dataset import Dataset
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.dir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_set(self):
+        cache = MetadataCache(self.cache_path)
+        self.assertIsNone(cache.get('abc', 'kern', 1))
+        cache.set('abc', 'kern', 1, {'OTL': 'Title', 'ENC': ['A', 'B']})
+        self.assertDictEqual(cache.get('abc', 'kern', 1), 
+            {'OTL': 'Title', 'ENC': ['A', 'B']})
+        self.assertIsNone(cache.get('abc', 'kern', 2))
+        self.assertIsNone(cache.get('abc', 'xml', 1))
+        self.assertIsNone(cache.get('abc', 'kern', 1, options={'encoding': 'latin-1'}))
+        cache.close()
+
+    def test_persistence(self):
+        cache = MetadataCache(self.cache_path)
+        cache.set('abc', 'kern', 1, {'OTL': 'Title'})
+        cache.close()
+        cache = MetadataCache(self.cache_path)
+        self.assertDictEqual(cache.get('abc', 'kern', 1), {'OTL': 'Title'})
+        cache.close()
+
+    def test_evict(self):
+        cache = MetadataCache(self.cache_path)
+        for i in range(10):
+            cache.set(f'checksum{i}', 'kern', 1, {'OTL': 'x' * 100})
+        # Use the first entry, so that it is not evicted
+        cache.get('checksum0', 'kern', 1)
+        num_evicted = cache.evict(max_size=cache.size // 2)
+        self.assertEqual(num_evicted, 5)
+        self.assertEqual(len(cache), 5)
+        self.assertIsNotNone(cache.get('checksum0', 'kern', 1))
+        self.assertIsNone(cache.get('checksum1', 'kern', 1))
+        cache.close()
+
+    def test_prune(self):
+        cache = MetadataCache(self.cache_path)
+        cache.set('a', 'kern', 1, {})
+        cache.set('b', 'kern', 2, {})
+        cache.set('c', 'xml', 1, {})
+        self.assertEqual(cache.prune(versions={'kern': 2}), 1)
+        self.assertIsNone(cache.get('a', 'kern', 1))
+        self.assertEqual(len(cache), 2)
+        time.sleep(0.01)
+        cache.get('b', 'kern', 2)
+        self.assertEqual(cache.prune(max_age=0.005), 1)
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+    def test_file_cache(self):
+        path = os.path.join(self.dir, 'song.krn')
+        with open(path, 'w') as handle:
+            handle.write('!!!OTL: Title\n**kern\n4c\n*-\n')
+        
+        file = get_file(path, cache=self.cache_path)
+        self.assertDictEqual(file.metadata, {'OTL': 'Title'})
+
+        # The metadata is now retrieved from the cache, without parsing
+        file = get_file(path, cache=self.cache_path)
+        def fail():
+            raise Exception('The file should not be parsed')
+        file._collect_metadata = fail
+        self.assertDictEqual(file.metadata, {'OTL': 'Title'})
+
+    def write_file(self, contents, age=60):
+        path = os.path.join(self.dir, 'song.krn')
+        with open(path, 'w') as handle:
+            handle.write(contents)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_checksum(self):
+        path = self.write_file('**kern\n4c\n*-\n')
+        md5 = hashlib.md5(b'**kern\n4c\n*-\n').hexdigest()
+        cache = MetadataCache(self.cache_path)
+        self.assertEqual(cache.checksum(path), md5)
+        self.assertNotEqual(cache.checksum(path, 'blake2b'), md5)
+        cache.close()
+
+        # Unchanged files are not read again
+        cache = MetadataCache(self.cache_path)
+        with mock.patch('catafolk.cache.file_checksum') as file_checksum:
+            self.assertEqual(cache.checksum(path), md5)
+            file_checksum.assert_not_called()
+        
+        # But changed files are
+        path = self.write_file('**kern\n4d\n*-\n', age=30)
+        self.assertEqual(cache.checksum(path), 
+            hashlib.md5(b'**kern\n4d\n*-\n').hexdigest())
+        cache.close()
+
+    def test_recent_checksums_not_cached(self):
+        path = self.write_file('**kern\n4c\n*-\n', age=0)
+        cache = MetadataCache(self.cache_path)
+        cache.checksum(path)
+        with mock.patch('catafolk.cache.file_checksum') as file_checksum:
+            cache.checksum(path)
+            file_checksum.assert_called_once()
+        cache.close()
+
+    def test_file_checksum(self):
+        path = self.write_file('!!!OTL: Title\n**kern\n4c\n*-\n')
+        file = get_file(path, cache=self.cache_path)
+        self.assertEqual(file.checksum, get_file(path).checksum)
+        self.assertEqual(file.digest('sha256'), get_file(path).digest('sha256'))
+
+    def test_dataset_checksum_cache(self):
+        dataset_dir = os.path.join(self.dir, 'test-dataset')
+        os.makedirs(os.path.join(dataset_dir, 'data'))
+        with open(os.path.join(dataset_dir, 'dataset.yml'), 'w') as handle:
+            handle.write('sources:\n  - name: file\n    type: file\n'
+                         '    file_pattern: data/*.krn\n')
+        for i in range(3):
+            path = os.path.join(dataset_dir, 'data', f'song{i}.krn')
+            with open(path, 'w') as handle:
+                handle.write(f'!!!OTL: Song {i}\n**kern\n4c\n*-\n')
+            os.utime(path, (time.time() - 60, time.time() - 60))
+
+        options = {'dir': os.path.join(self.dir, '{dataset_id}'),
+                   'checksum_cache': self.cache_path}
+        tree = Dataset('test-dataset', options=options).merkle_tree()
+
+        # Checksums are cached even though no metadata cache is used
+        with mock.patch('catafolk.cache.file_checksum') as file_checksum:
+            dataset = Dataset('test-dataset', options=options)
+            self.assertIsNone(dataset.options['metadata_cache'])
+            self.assertEqual(dataset.merkle_tree().hash, tree.hash)
+            file_checksum.assert_not_called()
+
+    def test_dataset_max_size(self):
+        dataset_dir = os.path.join(self.dir, 'test-dataset')
+        os.makedirs(os.path.join(dataset_dir, 'data'))
+        with open(os.path.join(dataset_dir, 'dataset.yml'), 'w') as handle:
+            handle.write('sources:\n  - name: file\n    type: file\n'
+                         '    file_pattern: data/*.krn\n')
+        with open(os.path.join(dataset_dir, 'data', 'song.krn'), 'w') as handle:
+            handle.write('!!!OTL: Song\n**kern\n4c\n*-\n')
+
+        options = {'dir': os.path.join(self.dir, '{dataset_id}'),
+                   'metadata_cache': self.cache_path,
+                   'metadata_cache_max_size': 1000}
+        dataset = Dataset('test-dataset', options=options)
+        file, = dataset.file_sources[0].files.values()
+        self.assertEqual(file.cache.path, self.cache_path)
+        self.assertEqual(file.cache.max_size, 1000)
+
+    def test_extract_entry_flush(self):
+        path = self.write_file('!!!OTL: Title\n**kern\n4c\n*-\n')
+        options = {'cache': self.cache_path}
+        _extract_entry(path, options)
+        accessed = MetadataCache(self.cache_path)._connection.execute(
+            'SELECT accessed FROM metadata').fetchone()[0]
+        
+        # Worker processes write the access times of cache hits right away
+        entry = _extract_entry(path, options, flush=True)
+        self.assertEqual(entry['OTL'], 'Title')
+        cache = MetadataCache(self.cache_path)
+        cursor = cache._connection.execute('SELECT accessed FROM metadata')
+        self.assertGreater(cursor.fetchone()[0], accessed)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
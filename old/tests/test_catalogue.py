@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+import sys
+from unittest import mock
+import pandas as pd
+from catafolk.catalogue import Catalogue
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+@unittest.skipUnless(HAS_PYARROW, 'requires pyarrow')
+class TestCatalogue(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.datasets_dir = os.path.join(self.dir, 'datasets')
+        self.write_dataset('foo', ['a', 'b'], 'abc', extra=[1, 2])
+        self.write_dataset('bar', ['a', 'c', 'd'], 'def', extra=['x', 'y', 'z'])
+        self.catalogue = Catalogue(os.path.join(self.dir, 'catalogue'), 
+            datasets_dir=self.datasets_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_dataset(self, dataset_id, ids, checksum, extra=None):
+        directory = os.path.join(self.datasets_dir, dataset_id)
+        os.makedirs(directory, exist_ok=True)
+        df = pd.DataFrame({'id': ids, 'title': [f'{dataset_id} {i}' for i in ids]})
+        if extra is not None:
+            df['extra'] = extra
+        df.to_csv(os.path.join(directory, 'index.csv'), index=False)
+        if checksum is not None:
+            with open(os.path.join(directory, 'properties.json'), 'w') as handle:
+                json.dump({'dataset_id': dataset_id, 'checksum': checksum}, handle)
+
+    def test_refresh_and_load(self):
+        changed, removed = self.catalogue.refresh()
+        self.assertListEqual(changed, ['bar', 'foo'])
+        self.assertListEqual(removed, [])
+        
+        df = self.catalogue.load()
+        self.assertEqual(len(df), 5)
+        self.assertListEqual(list(df.index.names), ['dataset_id', 'id'])
+        self.assertEqual(df.loc[('foo', 'a'), 'title'], 'foo a')
+        self.assertEqual(df.loc[('bar', 'a'), 'title'], 'bar a')
+        # Numbers and strings in the same column are stored as strings
+        self.assertEqual(df.loc[('foo', 'b'), 'extra'], '2')
+        
+        df = self.catalogue.load(columns=['title'], dataset_ids=['foo'])
+        self.assertListEqual(list(df.columns), ['title'])
+        self.assertListEqual(list(df.index), [('foo', 'a'), ('foo', 'b')])
+
+    def test_incremental_refresh(self):
+        self.catalogue.refresh()
+        self.assertEqual(self.catalogue.refresh(), ([], []))
+
+        self.write_dataset('foo', ['a', 'b', 'e'], 'ghi')
+        shutil.rmtree(os.path.join(self.datasets_dir, 'bar'))
+        self.write_dataset('baz', ['a'], None)
+        changed, removed = self.catalogue.refresh()
+        self.assertListEqual(changed, ['baz', 'foo'])
+        self.assertListEqual(removed, ['bar'])
+        
+        df = self.catalogue.load()
+        self.assertListEqual(list(df.index), 
+            [('baz', 'a'), ('foo', 'a'), ('foo', 'b'), ('foo', 'e')])
+        self.assertListEqual(sorted(self.catalogue.manifest), ['baz', 'foo'])
+        
+    def test_unchanged_parts(self):
+        self.catalogue.refresh()
+        mtime = os.stat(self.catalogue.path).st_mtime_ns
+
+        # Converting unchanged datasets again does not merge the parts
+        index_path = os.path.join(self.datasets_dir, 'foo', 'index.csv')
+        os.utime(index_path, ns=(mtime + 10**9, mtime + 10**9))
+        with mock.patch('pyarrow.feather.read_table') as read_table:
+            self.assertEqual(self.catalogue.refresh(), (['foo'], []))
+            self.assertEqual(self.catalogue.refresh(force=True), (['bar', 'foo'], []))
+            read_table.assert_not_called()
+        self.assertEqual(os.stat(self.catalogue.path).st_mtime_ns, mtime)
+        self.assertEqual(self.catalogue.refresh(), ([], []))
+
+        self.write_dataset('foo', ['a', 'b', 'e'], 'abc')
+        self.assertEqual(self.catalogue.refresh(), (['foo'], []))
+        self.assertEqual(len(self.catalogue.load()), 6)
+
+    def test_missing_catalogue(self):
+        self.assertRaises(FileNotFoundError, self.catalogue.load)
+
+    def test_light_import(self):
+        # Loading the catalogue should not import the dataset machinery
+        code = ('import sys, catafolk.catalogue; '
+                'print("catafolk.dataset" in sys.modules)')
+        output = subprocess.check_output([sys.executable, '-c', code], text=True)
+        self.assertEqual(output.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import io
+import json
+import shutil
+import tempfile
+import contextlib
+from catafolk.cli import *
+from test_build import create_test_datasets
+
+class TestBuildCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.datasets_dir = tempfile.mkdtemp()
+        create_test_datasets(self.datasets_dir)
+        self.report_path = os.path.join(self.datasets_dir, 'report.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.datasets_dir)
+
+    def run_build(self, *args):
+        args = ['build', '--datasets-dir', self.datasets_dir, 
+                '--report', self.report_path] + list(args)
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            code = main(args)
+        with open(self.report_path, 'r') as handle:
+            report = json.load(handle)
+        return code, report, stdout.getvalue()
+
+    def test_build(self):
+        code, report, output = self.run_build('-j', '2')
+        self.assertEqual(code, EXIT_FAILED)
+        self.assertEqual(len(report['datasets']), 3)
+        self.assertIn('Built 2 of 3 datasets', output)
+
+        code, report, _ = self.run_build('dataset-a', 'dataset-b', '-j', '1')
+        self.assertEqual(code, EXIT_OK)
+        dataset_ids = [result['dataset_id'] for result in report['datasets']]
+        self.assertListEqual(dataset_ids, ['dataset-a', 'dataset-b'])
+
+    def test_unknown_dataset(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            code = main(['build', '--datasets-dir', self.datasets_dir, 'other'])
+        self.assertEqual(code, EXIT_USAGE)
+        self.assertFalse(os.path.exists(self.report_path))
+
+    def test_changed_only(self):
+        code, report, output = self.run_build('--changed-only', '--dry-run')
+        self.assertEqual(code, EXIT_OUTDATED)
+        self.assertListEqual(report['selected'], ['broken', 'dataset-a', 'dataset-b'])
+        self.assertIn('3 of 3 datasets would be built', output)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.datasets_dir, 'dataset-a', 'index.csv')))
+
+        self.run_build('dataset-a', 'dataset-b')
+        code, report, _ = self.run_build('dataset-a', 'dataset-b', '--changed-only')
+        self.assertEqual(code, EXIT_OK)
+        self.assertListEqual(report['datasets'], [])
+
+        path = os.path.join(self.datasets_dir, 'dataset-b', 'songs.csv')
+        with open(path, 'a') as handle:
+            handle.write('song3,baz\n')
+        code, report, _ = self.run_build('--changed-only', '--dry-run')
+        checks = {check['dataset_id']: check['outdated'] for check in report['checks']}
+        self.assertIsNone(checks['dataset-a'])
+        self.assertEqual(checks['dataset-b'], 'configuration changed')
+        self.assertEqual(checks['broken'], 'not built')
+
+        code, report, _ = self.run_build('dataset-a', 'dataset-b', '--changed-only')
+        self.assertEqual(code, EXIT_OK)
+        self.assertEqual(len(report['datasets']), 1)
+        self.assertEqual(report['datasets'][0]['dataset_id'], 'dataset-b')
+        self.assertEqual(report['datasets'][0]['num_entries'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import shutil
+import tempfile
+from catafolk.file import *
+
+TEST_KERN = """!!!OTL: Title
+!!!ENC: Encoder 1
+!! A comment
+!!!ENC: Encoder 2
+**kern
+*M2/4
+4c
+! A local comment
+!!!ONB: Not a reference record: it is in the body
+4d
+*-
+!!!AMT: simple duple
+!!!id: 123
+"""
+
+class TestKernFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'song.krn')
+        with open(self.path, 'w') as handle:
+            handle.write(TEST_KERN)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_metadata(self):
+        file = get_file(self.path)
+        self.assertDictEqual(file.metadata, {
+            'OTL': 'Title',
+            'ENC': ['Encoder 1', 'Encoder 2'],
+            '_comments': 'A comment',
+            'ONB': 'Not a reference record: it is in the body',
+            'AMT': 'simple duple',
+            '_id': '123'
+        })
+
+    def test_header_only(self):
+        file = get_file(self.path, trailing_records=False)
+        self.assertDictEqual(file.metadata, {
+            'OTL': 'Title',
+            'ENC': ['Encoder 1', 'Encoder 2'],
+            '_comments': 'A comment',
+        })
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+TEST_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="3.1">
+  <work>
+    <work-number>12</work-number>
+    <work-title>Title</work-title>
+  </work>
+  <movement-title>Movement</movement-title>
+  <identification>
+    <creator type="composer">Composer</creator>
+    <encoding>
+      <software>Finale</software>
+      <encoding-date>2020-04-01</encoding-date>
+    </encoding>
+    <source>Source</source>
+  </identification>
+  <part-list>
+    <score-part id="P1"><part-name>Voice</part-name></score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="1"><note><pitch><step>C</step></pitch></note></measure>
+  </part>
+</score-partwise>
+"""
+
+class TestXMLFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'song.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_metadata(self):
+        with open(self.path, 'w') as handle:
+            handle.write(TEST_XML)
+        file = get_file(self.path)
+        self.assertDictEqual(file.metadata, {
+            'work-number': '12',
+            'work-title': 'Title',
+            'creator': 'Composer',
+            'software': 'Finale',
+            'encoding-date': '2020-04-01',
+            'source': 'Source',
+        })
+    
+    def test_stops_before_music(self):
+        # The part is invalid XML, but it should never be parsed
+        with open(self.path, 'w') as handle:
+            handle.write(TEST_XML.replace('</measure>', '</invalid>'))
+        file = get_file(self.path)
+        self.assertEqual(file.metadata['work-title'], 'Title')
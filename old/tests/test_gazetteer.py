@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import shutil
+import tempfile
+from catafolk.geocoding import Locator
+from catafolk.geocoding import LocationCache
+from catafolk.geocoding.gazetteer import Gazetteer
+
+# geonameid, name, asciiname, alternatenames, latitude, longitude,
+# feature class, feature code, country code, admin1 code, admin2 code,
+# population, elevation
+PLACES = [
+    (6255147, 'Asia', 'Asia', 'Asien', 29.8, 94.2, 'L', 'CONT', '', '', '', 0, ''),
+    (1814991, 'China', 'China', 'Zhongguo,VR China', 35.0, 105.0, 'A', 'PCLI', 'CN', '00', '', 1330044000, ''),
+    (1795912, 'Shanxi', 'Shanxi', 'Shansi', 37.0, 112.0, 'A', 'ADM1', 'CN', '24', '', 35000000, ''),
+    (1888880, 'Shaanxi', 'Shaanxi', 'Shensi', 35.0, 109.0, 'A', 'ADM1', 'CN', '26', '', 37000000, ''),
+    (1000001, 'Zizhou', 'Zizhou', '', 37.6, 110.0, 'P', 'PPLA3', 'CN', '26', '', 10000, '900'),
+    (1000002, 'Zizhou', 'Zizhou', '', 36.9, 112.1, 'P', 'PPL', 'CN', '24', '', 500, ''),
+    (2921044, 'Germany', 'Germany', 'Deutschland,Allemagne', 51.5, 10.5, 'A', 'PCLI', 'DE', '00', '', 82927922, ''),
+    (3077311, 'Bohemia', 'Bohemia', 'Böhmen,Čechy', 50.0, 14.5, 'L', 'RGN', 'CZ', '00', '', 0, ''),
+    (2867714, 'München', 'Muenchen', 'Munich', 48.14, 11.58, 'P', 'PPLA', 'DE', '02', '', 1260391, '524'),
+    (1000003, 'Munich', 'Munich', '', 40.4, -80.0, 'P', 'PPL', 'US', 'PA', '', 100, ''),
+]
+
+def write_geonames(path, places):
+    with open(path, 'w', encoding='utf-8') as handle:
+        for (geonameid, name, ascii, alternates, lat, lon, fclass, fcode, 
+             country, admin1, admin2, population, elevation) in places:
+            row = [geonameid, name, ascii, alternates, lat, lon, fclass, fcode,
+                   country, '', admin1, admin2, '', '', population, elevation,
+                   -9999, 'Asia/Shanghai', '2020-01-01']
+            handle.write('\t'.join(map(str, row)) + '\n')
+
+class TestGazetteer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dump = os.path.join(self.dir, 'geonames.txt')
+        write_geonames(self.dump, PLACES)
+        self.gazetteer = Gazetteer(os.path.join(self.dir, 'gazetteer.sqlite'))
+        self.gazetteer.load_geonames(self.dump, feature_classes=None)
+
+    def tearDown(self):
+        self.gazetteer.close()
+        shutil.rmtree(self.dir)
+
+    def test_load(self):
+        self.assertEqual(len(self.gazetteer), len(PLACES))
+        gazetteer = Gazetteer(':memory:')
+        num_places = gazetteer.load_geonames(self.dump, min_population=1000)
+        # Regions are always loaded; only the small populated places are skipped
+        self.assertEqual(num_places, 6)
+        # Loading again replaces places
+        self.assertEqual(gazetteer.load_geonames(self.dump, min_population=1000), 6)
+        self.assertEqual(len(gazetteer), 6)
+        self.assertEqual(len(gazetteer.lookup('Shansi')), 1)
+
+    def test_load_after_failure(self):
+        broken = os.path.join(self.dir, 'broken.txt')
+        write_geonames(broken, PLACES[:2] + [PLACES[2][:4] + ('north',) + PLACES[2][5:]])
+        gazetteer = Gazetteer(':memory:')
+        with self.assertRaises(ValueError):
+            gazetteer.load_geonames(broken, batch_size=1)
+        self.assertEqual(gazetteer.load_geonames(self.dump, feature_classes=None), len(PLACES))
+        self.assertEqual(len(gazetteer.lookup('Shansi')), 1)
+
+    def test_lookup(self):
+        self.assertListEqual([p['geonameid'] for p in self.gazetteer.lookup('Boehmen')], [3077311])
+        self.assertEqual(len(self.gazetteer.lookup('zizhou')), 2)
+        self.assertListEqual(self.gazetteer.lookup('Atlantis'), [])
+        self.assertEqual(self.gazetteer.lookup('Munich')[0]['altitude'], 524.0)
+
+    def test_prefix(self):
+        self.assertListEqual(self.gazetteer.prefix('Sha'), ['shaanxi', 'shansi', 'shanxi'])
+        self.assertListEqual(self.gazetteer.prefix('mu', limit=1), ['muenchen'])
+        self.assertListEqual(self.gazetteer.prefix(''), [])
+
+    def test_match(self):
+        match = self.gazetteer.match
+        self.assertEqual(match('Asia, China, Shanxi, Zizhou')['geonameid'], 1000002)
+        self.assertEqual(match('Asia, China, Shaanxi, Zizhou')['geonameid'], 1000001)
+        # Without context, the largest place is preferred
+        self.assertEqual(match('Zizhou')['geonameid'], 1000001)
+        self.assertEqual(match('Deutschland, Munich')['geonameid'], 2867714)
+        # Unknown or inconsistent parts fall back to less specific parts
+        self.assertEqual(match('Asia, China, Unknown')['geonameid'], 1814991)
+        self.assertEqual(match('Deutschland, Zizhou')['geonameid'], 2921044)
+        self.assertEqual(match('Boehmen, Riesengebirge')['geonameid'], 3077311)
+        self.assertIsNone(match('Atlantis'))
+        self.assertIsNone(match(''))
+
+    def test_locator(self):
+        cache = LocationCache(os.path.join(self.dir, 'locations.sqlite'), legacy_cache=None)
+        locator = Locator(backend=self.gazetteer, cache=cache, corrections=None)
+        self.assertIsNone(locator.rate_limiter)
+        results = locator.coordinates_many(['Asia, China, Shanxi, Zizhou', 'Atlantis'])
+        self.assertDictEqual(results, {
+            'Asia, China, Shanxi, Zizhou': (36.9, 112.1),
+            'Atlantis': (None, None)})
+        self.assertEqual(len(cache), 2)
+
+if __name__ == '__main__':
+    unittest.main()
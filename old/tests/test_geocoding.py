@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import time
+import shutil
+import tempfile
+from catafolk.geocoding import Locator
+from catafolk.geocoding import LocationCache
+from catafolk.geocoding import RateLimiter
+from catafolk.geocoding import StubBackend
+
+LOCATIONS = {
+    'Amsterdam': (52.37, 4.89, 0.0),
+    'Paris': (48.86, 2.35, 0.0),
+    'Berlin': (52.52, 13.40, 0.0),
+}
+
+class FailingBackend(StubBackend):
+    def geocode(self, location):
+        raise ConnectionError('offline')
+
+class TestLocator(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.dir, 'locations.sqlite')
+        self.legacy_path = os.path.join(self.dir, 'legacy.csv')
+        with open(self.legacy_path, 'w') as handle:
+            handle.write('location,latitude,longitude,altitude\n'
+                         'Paris,48.0,2.0,0.0\nAtlantis,,,\n')
+        self.corrections_path = os.path.join(self.dir, 'corrections.csv')
+        with open(self.corrections_path, 'w') as handle:
+            handle.write('location,latitude,longitude,altitude\nBerlin,1.0,,\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_locator(self, backend=None, **kwargs):
+        cache = LocationCache(self.cache_path, legacy_cache=self.legacy_path)
+        return Locator(backend=backend, cache=cache, 
+            corrections=self.corrections_path, **kwargs)
+
+    def test_cache_only(self):
+        locator = self.get_locator()
+        self.assertEqual(locator.coordinates('Paris'), (48.0, 2.0))
+        self.assertEqual(locator.coordinates('Atlantis'), (None, None))
+        self.assertEqual(locator.coordinates('Amsterdam'), (None, None))
+
+    def test_coordinates_many(self):
+        backend = StubBackend(LOCATIONS)
+        locator = self.get_locator(backend)
+        locations = ['Amsterdam', 'Paris', 'Amsterdam', None, 'Atlantis', 'Berlin', 'Nowhere']
+        results = locator.coordinates_many(locations)
+        self.assertDictEqual(results, {
+            'Amsterdam': (52.37, 4.89),
+            'Paris': (48.0, 2.0),
+            'Atlantis': (None, None),
+            'Berlin': (1.0, 13.40),
+            'Nowhere': (None, None)})
+        # Only cache misses are looked up, and only once
+        self.assertListEqual(sorted(backend.requests), ['Amsterdam', 'Berlin', 'Nowhere'])
+
+        # All results, including failed lookups, are cached
+        backend = StubBackend(LOCATIONS)
+        locator = self.get_locator(backend)
+        self.assertDictEqual(locator.coordinates_many(locations), results)
+        self.assertListEqual(backend.requests, [])
+        self.assertEqual(len(locator.coordinates_many(['Paris'], refresh=True)), 1)
+        self.assertListEqual(backend.requests, ['Paris'])
+
+    def test_failed_requests(self):
+        locator = self.get_locator(FailingBackend())
+        self.assertEqual(locator.coordinates('Amsterdam'), (None, None))
+        self.assertNotIn('Amsterdam', locator.cache)
+
+    def test_concurrency_and_rate_limit(self):
+        locations = {f'loc{i}': (i, i, 0) for i in range(20)}
+        backend = StubBackend(locations, delay=0.05)
+        locator = self.get_locator(backend, rate=1000, num_workers=10)
+        start = time.monotonic()
+        results = locator.coordinates_many(list(locations))
+        duration = time.monotonic() - start
+        self.assertEqual(results['loc3'], (3, 3))
+        # Serially, this would take 20 x 0.05 = 1s
+        self.assertLess(duration, 0.5)
+
+        limiter = RateLimiter(rate=50)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_export(self):
+        cache = LocationCache(self.cache_path, legacy_cache=self.legacy_path)
+        path = os.path.join(self.dir, 'export.csv')
+        cache.export_csv(path)
+        with open(path) as handle:
+            lines = handle.read().splitlines()
+        self.assertListEqual(lines, ['location,latitude,longitude,altitude',
+                                     'Atlantis,,,', 'Paris,48.0,2.0,0.0'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,8 @@
 # License: 
 import unittest
 import os
+import shutil
+import tempfile
 import pandas as pd
 from catafolk.index import Index
 from catafolk.source import *
@@ -16,6 +18,13 @@ TEST_OPTIONS = {
     'dir': os.path.join(TEST_DATASETS_DIR, '{dataset_id}')
 }
 TEST_INDEX_PATH = os.path.join(CUR_DIR, 'test_index.csv')
+UNSAVED_INDEX_PATH = os.path.join(CUR_DIR, 'unsaved_index.csv')
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 def remove_test_index():
     if os.path.exists(TEST_INDEX_PATH):
@@ -61,6 +70,58 @@ class TestIndex(unittest.TestCase):
         self.assertListEqual(list(df.columns), columns)
         self.assertEqual(len(df), 10)
 
+    def test_collect_merge(self):
+        remove_test_index()
+        source1 = Source([{'id': 'b', 'num': 2, 'flag': True},
+                          {'id': 'a', 'num': 1, 'flag': False},
+                          {'id': 'c', 'num': 3, 'flag': True}], name='one')
+        source2 = Source([{'id': 'd', 'text': 'y'},
+                          {'id': 'b', 'text': 'x'}], name='two')
+        index = Index(TEST_INDEX_PATH)
+        index.register_sources(source1, source2)
+
+        df = index.collect()
+        expected = pd.concat([source1.data, source2.data], axis=1, join='outer')
+        expected.columns = ['one.id', 'one.num', 'one.flag', 'two.id', 'two.text']
+        expected.index.name = 'id'
+        pd.testing.assert_frame_equal(df, expected.sort_index())
+        self.assertListEqual(list(df.index), ['a', 'b', 'c', 'd'])
+        self.assertEqual(df.loc['b', 'two.text'], 'x')
+        self.assertTrue(pd.isna(df.loc['d', 'one.num']))
+        self.assertListEqual(list(index.unmatched_ids['one']), ['a', 'c'])
+        self.assertListEqual(list(index.unmatched_ids['two']), ['d'])
+        self.assertEqual(source1.data.index.name, 'cf_id')
+
+    def test_collect_empty_source(self):
+        remove_test_index()
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'metadata.csv')
+            with open(path, 'w') as handle:
+                handle.write('id,year\n')
+            source1 = Source([{'id': 'a', 'v': 1, 'flag': True}], name='test')
+            source2 = CSVSource(path, name='csv', id_field='id')
+            index = Index(TEST_INDEX_PATH)
+            index.register_sources(source1, source2)
+
+            df = index.collect()
+            self.assertListEqual(list(df.index), ['a'])
+            self.assertListEqual(list(df.columns), 
+                ['test.id', 'test.v', 'test.flag', 'csv.id', 'csv.year'])
+            self.assertEqual(df.loc['a', 'test.v'], 1)
+            self.assertTrue(df[['csv.id', 'csv.year']].isna().all().all())
+            self.assertListEqual(list(index.unmatched_ids['test']), ['a'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_collect_duplicate_ids(self):
+        remove_test_index()
+        source1, _ = get_test_sources()
+        source2 = Source([{'id': 'item1'}, {'id': 'item1'}], name='dup')
+        index = Index(TEST_INDEX_PATH)
+        index.register_sources(source1, source2)
+        self.assertRaises(ValueError, index.collect)
+
     def test_transform(self):
         remove_test_index()
         transformer = Transformer([
@@ -78,6 +139,28 @@ class TestIndex(unittest.TestCase):
         self.assertEqual(transformed.loc['item7','joined'], 'foo')
         self.assertEqual(transformed.loc['item8','joined'], '')
 
+    def test_transform_columnar(self):
+        remove_test_index()
+        transformer = Transformer([
+            ['join', ['csv.col1', 'csv.col2'], 'joined', { 'sep': '-'}],
+            ['rename', ['test.foo', 'csv.col1'], ['foo', 'col1']],
+            ['constant', 'has_music', True],
+            [['lowercase', 'uppercase'], 'csv.col1', 'col1_upper'],
+            # Fails for entries where csv.col2 is missing
+            ['extract_groups', 'csv.col2', ['first_letter'], {'pattern': '(.)'}],
+            ['format', ['id', 'first_letter'], 'label', {'pattern': '{}: {}'}],
+            ['to_string_list', ['id', 'col1'], 'ids'],
+        ])
+        source1, source2 = get_test_sources()
+        index = Index(TEST_INDEX_PATH, transformer=transformer)
+        index.register_sources(source1, source2)
+        df = index.collect()
+        rowwise = index.transform(df, columnar=False)
+        columnar = index.transform(df, columnar=True)
+        pd.testing.assert_frame_equal(rowwise, columnar, check_like=True)
+        self.assertListEqual(list(rowwise.columns), list(columnar.columns))
+        self.assertEqual(len(columnar), 7)
+
     def test_update(self):
         remove_test_index()
         source1, source2 = get_test_sources()
@@ -123,6 +206,34 @@ class TestIndex(unittest.TestCase):
         self.assertEqual(new_index.data.loc['item10', 'source3.bla'], 12)
         self.assertEqual(new_index.data.loc['item14', 'source3.bla'], 16)
         
+    def test_upsert(self):
+        index = Index(UNSAVED_INDEX_PATH, fields=['a', 'b'])
+        ids = pd.Index(['x', 'y', 'z'], name='id')
+        index.update(pd.DataFrame({'a': [1, 2, 3]}, index=ids))
+        
+        new_ids = pd.Index(['z', 'y', 'w'], name='id')
+        df = pd.DataFrame({'a': [30, None, 40], 'b': ['Z', 'Y', 'W']}, index=new_ids)
+        index.update(df)
+        self.assertListEqual(list(index.data.index), ['x', 'y', 'z', 'w'])
+        self.assertListEqual(list(index.data['a']), [1, 2, 30, 40])
+        self.assertTrue(pd.isna(index.data.loc['x', 'b']))
+        self.assertEqual(index.data.loc['y', 'b'], 'Y')
+
+    def test_upsert_drop_missing(self):
+        index = Index(UNSAVED_INDEX_PATH, fields=['a'])
+        ids = pd.Index(['x', 'y', 'z'], name='id')
+        index.update(pd.DataFrame({'a': [1, 2, 3]}, index=ids))
+        df = pd.DataFrame({'a': [4, 5]}, index=pd.Index(['z', 'w'], name='id'))
+        index.update(df, missing='drop')
+        self.assertListEqual(list(index.data.index), ['z', 'w'])
+        self.assertListEqual(list(index.data['a']), [4, 5])
+        self.assertRaises(ValueError, index.update, df, missing='foo')
+
+    def test_upsert_duplicates(self):
+        index = Index(UNSAVED_INDEX_PATH, fields=['a'])
+        df = pd.DataFrame({'a': [1, 2]}, index=pd.Index(['x', 'x'], name='id'))
+        self.assertRaises(ValueError, index.update, df)
+
     def test_make(self):
         remove_test_index()
         source1, source2 = get_test_sources()
@@ -132,4 +243,253 @@ class TestIndex(unittest.TestCase):
         
         df = pd.read_csv(TEST_INDEX_PATH, index_col='id')
         self.assertEqual(len(df), 10)
-        self.assertListEqual(list(df.columns), ['test.foo', 'csv.col1'])
\ No newline at end of file
+        self.assertListEqual(list(df.columns), ['test.foo', 'csv.col1'])
+
+class TestIncrementalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.dir, 'data')
+        os.makedirs(self.data_dir)
+        for i in range(5):
+            self.write_file(f'song{i}', f'Song {i}')
+        self.index_path = os.path.join(self.dir, 'index.csv')
+        
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_file(self, name, title):
+        path = os.path.join(self.data_dir, f'{name}.krn')
+        with open(path, 'w') as handle:
+            handle.write(f'!!!OTL: {title}\n**kern\n4c\n*-\n')
+
+    def get_index(self):
+        transformer = Transformer([
+            ['rename', 'file.OTL', 'title'],
+            ['rename', 'file.cf_path', 'file_path'],
+            ['rename', 'file.cf_checksum', 'file_checksum'],
+        ])
+        fields = ['title', 'file_path', 'file_checksum']
+        index = Index(self.index_path, fields=fields, transformer=transformer)
+        source = FileSource(self.dir, 'data/*.krn', name='file')
+        index.register_sources(source)
+        return index, source
+
+    def test_changes(self):
+        index, _ = self.get_index()
+        index.make()
+        index, _ = self.get_index()
+        self.assertEqual(index.changes(), ([], []))
+        
+        self.write_file('song1', 'Changed title')
+        self.write_file('song5', 'New song')
+        os.remove(os.path.join(self.data_dir, 'song2.krn'))
+        index, _ = self.get_index()
+        changed, removed = index.changes()
+        self.assertListEqual(sorted(changed), ['data/song1.krn', 'data/song5.krn'])
+        self.assertListEqual(removed, ['data/song2.krn'])
+
+    def test_make_incremental(self):
+        index, _ = self.get_index()
+        index.make()
+        
+        self.write_file('song1', 'Changed title')
+        self.write_file('song5', 'New song')
+        os.remove(os.path.join(self.data_dir, 'song2.krn'))
+        
+        index, source = self.get_index()
+        index.make(incremental=True)
+        self.assertEqual(len(source.filepaths), 5)
+
+        df = pd.read_csv(self.index_path, index_col='id')
+        self.assertListEqual(sorted(df.index), 
+            ['song0', 'song1', 'song3', 'song4', 'song5'])
+        self.assertEqual(df.loc['song1', 'title'], 'Changed title')
+        self.assertEqual(df.loc['song5', 'title'], 'New song')
+        self.assertEqual(df.loc['song0', 'title'], 'Song 0')
+
+    def test_make_after_incremental(self):
+        index, _ = self.get_index()
+        index.make()
+        self.write_file('song1', 'Changed title')
+
+        index, source = self.get_index()
+        index.make(incremental=True)
+        self.assertEqual(len(source.data), 5)
+        self.assertEqual(len(source.checksums()), 5)
+
+        # A full build with the same index still uses all files
+        index.make()
+        df = pd.read_csv(self.index_path, index_col='id')
+        self.assertListEqual(sorted(df.index), 
+            ['song0', 'song1', 'song2', 'song3', 'song4'])
+        self.assertEqual(df.loc['song1', 'title'], 'Changed title')
+
+    def test_make_incremental_without_index(self):
+        index, source = self.get_index()
+        index.make(incremental=True)
+        self.assertEqual(len(source.filepaths), 5)
+        df = pd.read_csv(self.index_path, index_col='id')
+        self.assertEqual(len(df), 5)
+
+@unittest.skipUnless(HAS_PYARROW, 'requires pyarrow')
+class TestStreamingIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.dir, 'data'))
+        for i in range(25):
+            path = os.path.join(self.dir, 'data', f'song{i:02d}.krn')
+            with open(path, 'w') as handle:
+                handle.write(f'!!!OTL: Song {i}\n')
+                if i % 4 == 0:
+                    handle.write(f'!!!ARE: Region {i}\n')
+                handle.write('**kern\n4c\n*-\n')
+        self.csv_path = os.path.join(self.dir, 'meta.csv')
+        with open(self.csv_path, 'w') as handle:
+            handle.write('song_id,year\nsong01,1901\nsong02,1902\nextra,1999\n')
+        self.index_path = os.path.join(self.dir, 'index.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_index(self, store=None):
+        transformer = Transformer([
+            ['rename', 'file.OTL', 'title'],
+            ['join', ['file.ARE', 'meta.year'], 'location', {'sep': '/'}],
+            ['rename', 'meta.year', 'collection_date'],
+            ['rename', 'file.cf_path', 'file_path'],
+        ])
+        fields = ['title', 'location', 'collection_date', 'file_path']
+        index = Index(self.index_path, fields=fields, transformer=transformer, store=store)
+        index.register_sources(
+            FileSource(self.dir, 'data/*.krn', name='file'),
+            CSVSource(self.csv_path, name='meta', id_field='song_id'))
+        return index
+
+    def test_make_streaming(self):
+        index = self.get_index()
+        index.make()
+        expected = pd.read_csv(self.index_path, index_col='id')
+
+        index = self.get_index()
+        index.make(streaming=True, batch_size=4)
+        self.assertIsNone(index._data)
+        self.assertFalse(os.path.exists(f'{self.index_path}.partial'))
+        df = pd.read_csv(self.index_path, index_col='id')
+        self.assertEqual(len(df), 26)
+        self.assertEqual(df.index[-1], 'extra')
+        pd.testing.assert_frame_equal(df.sort_index(), expected.sort_index())
+        self.assertEqual(index.data.loc['song04', 'location'], 'Region 4')
+        self.assertEqual(index.data.loc['song02', 'location'], expected.loc['song02', 'location'])
+
+    def test_duplicate_ids(self):
+        index = self.get_index()
+        source = FileSource(self.dir, 'data/*.krn', name='file', 
+            id_transformer=lambda entry: dict(new_id=entry['cf_name'][:5]))
+        index.register_sources(source)
+        with self.assertRaises(ValueError):
+            index.make_streaming(batch_size=4)
+        self.assertFalse(os.path.exists(self.index_path))
+        self.assertFalse(os.path.exists(f'{self.index_path}.partial'))
+
+    @unittest.skipUnless(HAS_PYARROW, 'requires pyarrow')
+    def test_store(self):
+        index = self.get_index(store='parquet')
+        index.make(streaming=True, batch_size=10)
+        self.assertTrue(index.has_store)
+        self.assertEqual(len(index.load(columns=['title'])), 26)
+
+class TestIndexStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'index.csv')
+        
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_index(self, store):
+        fields = ['test.foo', 'csv.col1', 'csv.col2']
+        index = Index(self.path, fields=fields, store=store)
+        index.register_sources(*get_test_sources())
+        return index
+
+    def test_unknown_store(self):
+        self.assertRaises(ValueError, Index, self.path, store='xlsx')
+
+    def test_save_and_load(self):
+        for store in ['feather', 'parquet']:
+            index = self.get_index(store)
+            index.make()
+            self.assertTrue(os.path.exists(index.store_path))
+            self.assertTrue(index.store_path.endswith(f'index.{store}'))
+            
+            # The CSV export is identical to a CSV-only index
+            csv_index = Index(self.path, fields=index.fields)
+            csv_data = csv_index.load()
+            new_index = self.get_index(store)
+            data = new_index.load()
+            self.assertListEqual(list(data.index), list(csv_data.index))
+            self.assertListEqual(list(data.columns), list(csv_data.columns))
+            self.assertEqual(len(data), 10)
+            index.clear()
+            self.assertFalse(os.path.exists(index.store_path))
+            self.assertFalse(os.path.exists(self.path))
+
+    def test_uncompressed_feather(self):
+        index = Index(self.path, fields=['value'], store='feather')
+        df = pd.DataFrame({'value': ['a value'] * 10000}, 
+            index=pd.Index([f'id{i}' for i in range(10000)], name='id'))
+        index.update(df)
+        index.save()
+
+        # An uncompressed file is memory mapped without copying it
+        from pyarrow import feather
+        allocated = pyarrow.total_allocated_bytes()
+        table = feather.read_table(index.store_path, memory_map=True)
+        self.assertEqual(table.num_rows, 10000)
+        self.assertLess(pyarrow.total_allocated_bytes() - allocated, 1000)
+
+    def test_edited_csv(self):
+        for store in ['feather', 'parquet']:
+            index = self.get_index(store)
+            index.make()
+            self.assertFalse(self.get_index(store).store_outdated)
+
+            # Edit the CSV file by hand
+            df = pd.read_csv(self.path, index_col='id')
+            df.loc['item0', 'test.foo'] = 'edited'
+            df.to_csv(self.path)
+            stat = os.stat(index.store_path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            new_index = self.get_index(store)
+            self.assertTrue(new_index.store_outdated)
+            self.assertEqual(new_index.load().loc['item0', 'test.foo'], 'edited')
+            self.assertFalse(new_index.store_outdated)
+            data = self.get_index(store).load(columns=['test.foo'])
+            self.assertEqual(data.loc['item0', 'test.foo'], 'edited')
+            index.clear()
+
+    def test_load_columns(self):
+        for store in [None, 'feather', 'parquet']:
+            index = self.get_index(store)
+            index.make()
+            new_index = self.get_index(store)
+            data = new_index.load(columns=['test.foo'])
+            self.assertListEqual(list(data.columns), ['test.foo'])
+            self.assertEqual(data.index.name, 'id')
+            self.assertEqual(len(data), 10)
+            # Partially loaded data is not kept
+            self.assertIsNone(new_index._data)
+            index.clear()
+
+    def test_mixed_types(self):
+        index = Index(self.path, fields=['value'], store='feather')
+        df = pd.DataFrame({'value': ['a', True, 3]}, 
+            index=pd.Index(['x', 'y', 'z'], name='id'))
+        index.update(df)
+        index.save()
+        data = Index(self.path, store='feather').load()
+        self.assertListEqual(list(data['value']), ['a', 'True', '3'])
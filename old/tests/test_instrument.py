@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from catafolk.instrument import *
+from catafolk.dataset import Dataset
+from catafolk.build import build_dataset
+
+TEST_CONFIG = """
+sources:
+  - name: file
+    type: file
+    file_pattern: data/*.krn
+transformations:
+  - rename: [file.OTL, title]
+  - rename: [file.cf_path, file_path]
+  - rename: [file.cf_checksum, file_checksum]
+"""
+
+class TestInstrument(unittest.TestCase):
+
+    def test_stage(self):
+        stages = []
+        instrument = Instrument(callbacks=[stages.append])
+        with instrument.stage('extraction') as stage:
+            stage.num_entries = 100
+            sum(range(100000))
+        self.assertListEqual(stages, instrument.stages)
+        stage = instrument.stages[0]
+        self.assertEqual(stage.name, 'extraction')
+        self.assertGreater(stage.wall_time, 0)
+        self.assertGreaterEqual(stage.cpu_time, 0)
+        self.assertAlmostEqual(stage.entries_per_second, 100 / stage.wall_time)
+        if peak_rss() is not None:
+            self.assertGreater(stage.peak_rss, 0)
+
+    def test_failing_stage(self):
+        instrument = Instrument()
+        with self.assertRaises(ValueError):
+            with instrument.stage('transform'):
+                raise ValueError()
+        self.assertEqual(instrument.stages[0].name, 'transform')
+        self.assertIsNone(instrument.stages[0].entries_per_second)
+
+    def test_report(self):
+        instrument = Instrument()
+        for name in ['collect', 'save']:
+            with instrument.stage(name):
+                pass
+        report = instrument.report(dataset_id='foo')
+        self.assertEqual(report['dataset_id'], 'foo')
+        self.assertListEqual([s['name'] for s in report['stages']], ['collect', 'save'])
+        self.assertAlmostEqual(report['wall_time'], sum(s.wall_time for s in instrument.stages))
+        self.assertEqual(len(format_stages(report).splitlines()), 4)
+
+    def test_null_instrument(self):
+        with NULL_INSTRUMENT.stage('extraction') as stage:
+            stage.num_entries = 10
+        self.assertFalse(NULL_INSTRUMENT.enabled)
+        self.assertListEqual(NULL_INSTRUMENT.stages, [])
+        with self.assertRaises(ValueError):
+            NULL_INSTRUMENT.add_callback(print)
+        report = NULL_INSTRUMENT.report(dataset_id='foo')
+        self.assertEqual(report['dataset_id'], 'foo')
+        self.assertListEqual(report['stages'], [])
+        self.assertEqual(len(format_stages(report).splitlines()), 2)
+
+class TestDatasetInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dataset_dir = os.path.join(self.dir, 'test-dataset')
+        os.makedirs(os.path.join(self.dataset_dir, 'data'))
+        with open(os.path.join(self.dataset_dir, 'dataset.yml'), 'w') as handle:
+            handle.write(TEST_CONFIG)
+        for i in range(5):
+            path = os.path.join(self.dataset_dir, 'data', f'song{i}.krn')
+            with open(path, 'w') as handle:
+                handle.write(f'!!!OTL: Song {i}\n**kern\n4c\n*-\n')
+        self.options = {'dir': os.path.join(self.dir, '{dataset_id}')}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_disabled(self):
+        dataset = Dataset('test-dataset', options=self.options)
+        self.assertIs(dataset.instrument, NULL_INSTRUMENT)
+        self.assertIs(dataset.index.instrument, NULL_INSTRUMENT)
+        dataset.make()
+        self.assertFalse(os.path.exists(os.path.join(self.dataset_dir, 'build.json')))
+        report = dataset.build_report()
+        self.assertEqual(report['num_entries'], 5)
+        self.assertListEqual(report['stages'], [])
+
+    def test_make(self):
+        names = []
+        instrument = Instrument([lambda stage: names.append(stage.name)])
+        dataset = Dataset('test-dataset', options=self.options, instrument=instrument)
+        dataset.make()
+        self.assertListEqual(names, ['discovery', 'checksums', 'extraction', 
+            'collect', 'transform', 'update', 'save', 'properties'])
+        stages = {stage.name: stage for stage in instrument.stages}
+        self.assertEqual(stages['discovery'].num_entries, 5)
+        self.assertEqual(stages['extraction'].num_entries, 5)
+        self.assertEqual(stages['save'].num_entries, 5)
+
+        # Incremental update
+        instrument.reset()
+        names.clear()
+        dataset = Dataset('test-dataset', options=self.options, instrument=instrument)
+        dataset.make(incremental=True)
+        self.assertListEqual(names, ['discovery', 'checksums', 'save', 'properties'])
+
+    def test_build_report(self):
+        options = dict(self.options, build_report_fn='build.json')
+        dataset = Dataset('test-dataset', options=options)
+        self.assertTrue(dataset.instrument.enabled)
+        dataset.make()
+        with open(os.path.join(self.dataset_dir, 'build.json'), 'r') as handle:
+            report = json.load(handle)
+        self.assertEqual(report['dataset_id'], 'test-dataset')
+        self.assertEqual(report['num_entries'], 5)
+        self.assertEqual(len(report['stages']), 8)
+
+        result = build_dataset('test-dataset', options=options)
+        self.assertEqual(len(result['stages']), 8)
+        result = build_dataset('test-dataset', options=self.options)
+        self.assertNotIn('stages', result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import pandas as pd
+from unittest import mock
+from catafolk.merkle import MerkleTree
+from catafolk.dataset import Dataset
+from catafolk.index import Index
+
+TEST_CONFIG = """
+sources:
+  - name: file
+    type: file
+    file_pattern: data/*.krn
+transformations:
+  - rename: [file.OTL, title]
+  - rename: [file.cf_path, file_path]
+  - rename: [file.cf_checksum, file_checksum]
+"""
+
+def checksums(num_files, changed={}):
+    checksums = {f'data/song{i:04}.krn': f'{i:032x}' for i in range(num_files)}
+    checksums.update(changed)
+    return checksums
+
+class TestMerkleTree(unittest.TestCase):
+
+    def test_hash(self):
+        tree1 = MerkleTree.from_checksums(checksums(10))
+        tree2 = MerkleTree.from_checksums(dict(reversed(list(checksums(10).items()))))
+        self.assertEqual(tree1.hash, tree2.hash)
+        tree3 = MerkleTree.from_checksums(checksums(10, {'data/song0003.krn': 'x'}))
+        self.assertNotEqual(tree1.hash, tree3.hash)
+        self.assertEqual(len(tree1), 10)
+        self.assertDictEqual(tree1.checksums(), checksums(10))
+
+    def test_large_directories(self):
+        tree = MerkleTree.from_checksums(checksums(1000))
+        self.assertIn('buckets', tree.root['dirs']['data']['files'])
+        self.assertDictEqual(tree.checksums(), checksums(1000))
+        
+        changed = {'data/song0500.krn': 'x', 'data/new.krn': 'y'}
+        new_checksums = checksums(1000, changed)
+        del new_checksums['data/song0001.krn']
+        new_tree = MerkleTree.from_checksums(new_checksums)
+        self.assertEqual(new_tree.diff(tree), 
+            (['data/new.krn', 'data/song0500.krn'], ['data/song0001.krn']))
+        self.assertEqual(tree.diff(tree), ([], []))
+
+    def test_diff_without_old_tree(self):
+        tree = MerkleTree.from_checksums({'a.krn': 'x', 'b/c.krn': 'y'})
+        self.assertEqual(tree.diff(None), (['a.krn', 'b/c.krn'], []))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'merkle.json')
+            self.assertIsNone(MerkleTree.load(path))
+            tree = MerkleTree.from_checksums(checksums(100))
+            tree.save(path)
+            self.assertEqual(MerkleTree.load(path), tree)
+        finally:
+            shutil.rmtree(directory)
+
+class TestDatasetChecksum(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dataset_dir = os.path.join(self.dir, 'test-dataset')
+        os.makedirs(os.path.join(self.dataset_dir, 'data'))
+        with open(os.path.join(self.dataset_dir, 'dataset.yml'), 'w') as handle:
+            handle.write(TEST_CONFIG)
+        for i in range(5):
+            self.write_file(f'song{i}', f'Song {i}')
+        self.options = {'dir': os.path.join(self.dir, '{dataset_id}')}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_file(self, name, title):
+        path = os.path.join(self.dataset_dir, 'data', f'{name}.krn')
+        with open(path, 'w') as handle:
+            handle.write(f'!!!OTL: {title}\n**kern\n4c\n*-\n')
+
+    def get_dataset(self):
+        return Dataset('test-dataset', options=self.options)
+
+    def test_properties(self):
+        dataset = self.get_dataset()
+        dataset.make()
+        with open(dataset.properties_path) as handle:
+            properties = json.load(handle)
+        self.assertEqual(properties['num_files'], 5)
+        self.assertEqual(properties['checksum'], dataset.checksum())
+        self.assertEqual(dataset.checksum(), dataset.checksum(refresh=True))
+        self.assertEqual(dataset.changes(), ([], []))
+        
+        self.write_file('song1', 'Changed')
+        self.assertNotEqual(self.get_dataset().checksum(refresh=True), dataset.checksum())
+        self.assertEqual(self.get_dataset().changes(), (['data/song1.krn'], []))
+
+    def test_incremental_make(self):
+        self.get_dataset().make()
+        self.write_file('song1', 'Changed')
+        self.write_file('song5', 'New')
+        os.remove(os.path.join(self.dataset_dir, 'data', 'song2.krn'))
+
+        dataset = self.get_dataset()
+        dataset.make(incremental=True)
+        self.assertEqual(len(dataset.file_sources[0].filepaths), 5)
+        self.assertIsNone(dataset.outdated())
+        df = pd.read_csv(dataset.index_path, index_col='id')
+        self.assertListEqual(sorted(df.index), ['song0', 'song1', 'song3', 'song4', 'song5'])
+        self.assertEqual(df.loc['song1', 'title'], 'Changed')
+        self.assertEqual(self.get_dataset().changes(), ([], []))
+
+    def test_incremental_make_retries_failed_files(self):
+        # Simulate a transformation that fails for one of the files
+        transform = Index.transform
+        def failing_transform(index, df, **kwargs):
+            return transform(index, df, **kwargs).drop('song1', errors='ignore')
+        with mock.patch.object(Index, 'transform', failing_transform):
+            self.get_dataset().make()
+        df = pd.read_csv(self.get_dataset().index_path, index_col='id')
+        self.assertNotIn('song1', df.index)
+
+        # No files changed, but the failed file is processed again
+        dataset = self.get_dataset()
+        dataset.make(incremental=True)
+        df = pd.read_csv(dataset.index_path, index_col='id')
+        self.assertListEqual(sorted(df.index), [f'song{i}' for i in range(5)])
+        self.assertEqual(df.loc['song1', 'title'], 'Song 1')
+
+    def test_outdated(self):
+        self.assertEqual(self.get_dataset().outdated(), 'not built')
+        self.get_dataset().make()
+        self.assertIsNone(self.get_dataset().outdated())
+
+        self.write_file('song1', 'Changed')
+        self.assertEqual(self.get_dataset().outdated(), 
+            '1 files new or changed, 0 removed')
+        self.get_dataset().make(incremental=True)
+        self.assertIsNone(self.get_dataset().outdated())
+
+        with open(os.path.join(self.dataset_dir, 'dataset.yml'), 'a') as handle:
+            handle.write('  - rename: [file.cf_format, file_format]\n')
+        self.assertEqual(self.get_dataset().outdated(), 'configuration changed')
+
+        # The configuration changed, so the whole index is remade
+        dataset = self.get_dataset()
+        dataset.make(incremental=True)
+        self.assertEqual(len(dataset.file_sources[0].filepaths), 5)
+        df = pd.read_csv(dataset.index_path, index_col='id')
+        self.assertListEqual(list(df['file_format'].unique()), ['kern'])
+        self.assertIsNone(self.get_dataset().outdated())
+
+    def test_outdated_mapping(self):
+        mapping_path = os.path.join(self.dir, 'mapping.yml')
+        with open(mapping_path, 'w') as handle:
+            handle.write('Song.*: song\n')
+        with open(os.path.join(self.dataset_dir, 'dataset.yml'), 'a') as handle:
+            handle.write('  - map_values:\n    - file.OTL\n    - genre\n'
+                         f'    - mapping_path: {mapping_path}\n')
+        self.get_dataset().make()
+        self.assertIsNone(self.get_dataset().outdated())
+
+        # Mapping files can be shared by several datasets
+        with open(mapping_path, 'a') as handle:
+            handle.write('Changed: changed\n')
+        self.assertEqual(self.get_dataset().outdated(), 'configuration changed')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,13 @@
 # Copyright © 2020 Bas Cornelissen
 # License: 
 import unittest
+import re
+from unittest import mock
 from catafolk.transformer import *
+from catafolk.operations import *
+from catafolk.operations import _RegexMapping
+from catafolk.operations import _COLUMNAR_OPERATIONS
+from catafolk.operations import _PARAMETER_COMPILERS
 
 class TestOperations(unittest.TestCase):
     def test_map_values_regex(self):
@@ -22,6 +28,40 @@ class TestOperations(unittest.TestCase):
                          mapping=values_map, regex=False)
         self.assertListEqual(out, ['Hello', None, '3', None])
 
+    def test_map_values_first_match(self):
+        values_map = { 'h.*': 'first', '(H|h)ello': 'second', 'w(o+)r(ld)': 'third'}
+        out = map_values('hello', 'Hello', 'woorld', 'x', mapping=values_map)
+        self.assertListEqual(out, ['first', 'second', 'third', None])
+
+    def test_map_values_compiled(self):
+        # Patterns with backreferences cannot be combined in one regex
+        for values_map in [
+            {'(a)b': 1, '(c)(d)?e': 2, 'f': 3, '.*': 4},
+            {'(a)\\1': 1, '(b)(c)\\2': 2, '.*': 3},
+            {'(?P<x>a)': 1, '(?P<x>b)': 2}
+        ]:
+            mapping = _RegexMapping(values_map)
+            for value in ['ab', 'ce', 'cde', 'f', 'aa', 'bcc', 'b', 'zzz']:
+                expected = None
+                for pattern, target in values_map.items():
+                    if re.match(pattern, value):
+                        expected = target
+                        break
+                self.assertEqual(mapping.lookup(value), expected)
+
+    def test_compiled_parameters(self):
+        T = Transformer([
+            ['replace', 'a', 'b', {'old': 'o+', 'new': '0'}],
+            ['extract_groups', 'a', ['c'], {'pattern': '(f)', 'groups': [1]}],
+            ['map_values', 'a', 'd', {'mapping': {'f.o': 'bar'}}],
+        ])
+        params = [op.params for op in T.operations]
+        self.assertIsInstance(params[0]['old'], re.Pattern)
+        self.assertIsInstance(params[1]['pattern'], re.Pattern)
+        self.assertIsInstance(params[2]['mapping'], _RegexMapping)
+        out = T({'a': 'foo'})
+        self.assertDictEqual(out, {'b': 'f0', 'c': 'f', 'd': 'bar'})
+
     def test_format_pattern(self):
         out = format('hello', pattern="{} world")
         self.assertEqual(out, 'hello world')
@@ -54,4 +94,67 @@ class TestOperations(unittest.TestCase):
         out = map_numeric_bins(20, bins=bins)
         self.assertEqual(out, 'bar')
 
+class TestColumnarOperations(unittest.TestCase):
+
+    # Operation, input columns, parameters and the number of outputs
+    CASES = [
+        (rename, [['a', 'b'], [1, None]], {}, 2),
+        (first, [['a', 'b'], [1, 2]], {}, 1),
+        (constant, [['a', 'b']], {'value': 3}, 1),
+        (lowercase, [['A', 'b', None, 3]], {}, 1),
+        (lowercase, [['A', 'B'], ['C', ['D']]], {}, 2),
+        (uppercase, [['a', 'B']], {}, 1),
+        (strip, [[' a ', 'b ', None]], {}, 1),
+        (strip, [[' a', 'b'], [['x '], ' c ']], {}, 2),
+        (join, [['a', 'b'], [None, 'c'], [1, float('nan')]], {'sep': '-'}, 1),
+        (replace, [['foo', 'boo', None]], {'old': 'o+', 'new': '0'}, 1),
+        (replace, [['a.b', 'ab'], ['a.', 3]], 
+            {'old': '.', 'new': '!', 'regex': False}, 2),
+        (map_values, [['foo', 'bar', None, 'fop', 'foo']], 
+            {'mapping': {'fo.': 'F'}}, 1),
+        (map_values, [['foo', 'bar'], ['baz', 1]], 
+            {'mapping': {'fo.': 'F'}, 'return_missing': True}, 2),
+        (map_values, [['fo.', 1, None, 'foo']], 
+            {'mapping': {'fo.': 'F', 1: 'one'}, 'regex': False}, 1),
+        (extract_groups, [['a-b', 'c-d']], {'pattern': '(.)-(.)'}, 3),
+        (extract_groups, [['a-b', 'x']], {'pattern': '(.)-(.)', 'groups': [2]}, 1),
+    ]
+
+    def rowwise(self, fn, columns, params, num_outputs):
+        outputs = [[] for _ in range(num_outputs)]
+        for values in zip(*columns):
+            result = fn(*values, **params)
+            if num_outputs == 1:
+                result = [result]
+            for output, value in zip(outputs, result):
+                output.append(value)
+        return outputs
+
+    def test_columnar_equals_rowwise(self):
+        operations = set()
+        for fn, columns, params, num_outputs in self.CASES:
+            operations.add(fn)
+            for compiled in [False, True]:
+                kwargs = dict(params)
+                if compiled and fn in _PARAMETER_COMPILERS:
+                    kwargs = _PARAMETER_COMPILERS[fn](kwargs)
+                with self.subTest(operation=fn.__name__, compiled=compiled):
+                    columnar = _COLUMNAR_OPERATIONS[fn](*columns, **kwargs)
+                    expected = self.rowwise(fn, columns, kwargs, num_outputs)
+                    self.assertListEqual(columnar, expected)
+        self.assertSetEqual(operations, set(_COLUMNAR_OPERATIONS))
 
+    def test_fallback(self):
+        # Inputs the columnar forms cannot handle are processed per entry
+        T = Transformer([
+            ['map_values', 'a', 'b', {'mapping': {'fo.': 'F'}}],
+            ['extract_groups', 'a', ['c', 'd'], {'pattern': '(f)(.*)'}],
+            ['join', ['a', 'b'], 'e'],
+        ])
+        columns = {'a': ['foo', ['fop', 'x'], 'bar']}
+        outputs, errors = T.transform_columns(columns, 3)
+        self.assertListEqual(outputs['b'], ['F', ['F', None], None])
+        with mock.patch.dict(_COLUMNAR_OPERATIONS, clear=True):
+            expected, expected_errors = T.transform_columns(columns, 3)
+        self.assertEqual(repr(outputs), repr(expected))
+        self.assertEqual(repr(errors), repr(expected_errors))
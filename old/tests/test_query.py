@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import pandas as pd
+from catafolk.index import Index
+from catafolk.query import Query
+from catafolk.query import InvertedIndex
+from catafolk.query import SortedIndex
+from catafolk import schema
+
+FIELDS = {
+    'culture': 'inverted',
+    'file_has_lyrics': 'inverted',
+    'latitude': 'sorted',
+}
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'index.csv')
+        df = pd.DataFrame({
+            'id': ['a', 'b', 'c', 'd', 'e'],
+            'culture': ['Han', 'Pawnee', 'Han', None, 'Han'],
+            'file_has_lyrics': [True, True, False, True, True],
+            'latitude': [35.0, 41.5, 30.2, None, 39.9],
+            'title': ['A', 'B', 'C', 'D', 'E'],
+        })
+        df.to_csv(self.path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_query(self):
+        return Query(Index(self.path), fields=FIELDS)
+
+    def test_equality(self):
+        query = self.get_query()
+        self.assertListEqual(query.ids(culture='Han'), ['a', 'c', 'e'])
+        self.assertListEqual(query.ids(culture='Han', file_has_lyrics=True), ['a', 'e'])
+        self.assertListEqual(query.ids(culture='Maidu'), [])
+        self.assertEqual(query.count(), 5)
+
+    def test_lists_and_ranges(self):
+        query = self.get_query()
+        self.assertListEqual(query.ids(culture=['Pawnee', 'Han']), ['a', 'b', 'c', 'e'])
+        self.assertListEqual(query.ids(latitude=slice(35, 40)), ['a', 'e'])
+        self.assertListEqual(query.ids(latitude=slice(40, None)), ['b'])
+        self.assertRaises(ValueError, query.ids, culture=slice('A', 'B'))
+
+    def test_unindexed_fields(self):
+        query = self.get_query()
+        self.assertListEqual(query.ids(culture='Han', title='C'), ['c'])
+        self.assertListEqual(query.ids(title=['A', 'B']), ['a', 'b'])
+        self.assertRaises(KeyError, query.ids, foo='bar')
+        df = query.find(culture='Han', title=['A', 'E'])
+        self.assertListEqual(list(df['title']), ['A', 'E'])
+
+    def test_persistence(self):
+        query = self.get_query()
+        query.indices
+        self.assertTrue(os.path.exists(query.path))
+        self.assertTrue(query.path.endswith('index.secondary.json'))
+
+        # Stored indices are used if the index did not change...
+        with open(query.path) as handle:
+            stored = json.load(handle)
+        stored['indices']['culture']['postings'] = [['Han', [1]]]
+        with open(query.path, 'w') as handle:
+            json.dump(stored, handle)
+        self.assertListEqual(self.get_query().ids(culture='Han'), ['b'])
+        
+        # ... and are rebuilt if it did
+        df = pd.read_csv(self.path)
+        df.loc[1, 'culture'] = 'Han'
+        df.to_csv(self.path, index=False)
+        self.assertListEqual(self.get_query().ids(culture='Han'), ['a', 'b', 'c', 'e'])
+
+    def test_secondary_indices(self):
+        values = pd.Series(['x', None, 'y', 'x'])
+        index = InvertedIndex.from_dict('f', InvertedIndex.build('f', values).to_dict())
+        self.assertListEqual(index.lookup('x').tolist(), [0, 3])
+        values = pd.Series([3, 1, None, 2, 'foo'])
+        index = SortedIndex.from_dict('f', SortedIndex.build('f', values).to_dict())
+        self.assertListEqual(index.range(1, 3).tolist(), [1, 3])
+        self.assertListEqual(index.lookup(3).tolist(), [0])
+
+    def test_schema(self):
+        indexed = schema.indexed_fields()
+        self.assertEqual(indexed['publication_key'], 'inverted')
+        self.assertEqual(indexed['latitude'], 'sorted')
+        self.assertNotIn('title', indexed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# -------------------------------------------------------------------
+# Author: Bas Cornelissen
+# Copyright © 2020 Bas Cornelissen
+# License: 
+import unittest
+import os
+import shutil
+import tempfile
+import pandas as pd
+from catafolk.search import TextIndex
+from catafolk.search import tokenize
+
+class TestTokenize(unittest.TestCase):
+
+    def test_german(self):
+        self.assertListEqual(tokenize('Müller, Straße'), ['mueller', 'strasse'])
+        self.assertListEqual(tokenize('Jaeger'), tokenize('Jäger'))
+
+    def test_pinyin(self):
+        self.assertListEqual(tokenize('Mǎ Zédōng'), ['ma', 'zedong'])
+        self.assertListEqual(tokenize('ma3 ze2dong1'), ['ma', 'zedong'])
+        self.assertListEqual(tokenize('人民'), ['人', '民'])
+
+    def test_other(self):
+        self.assertListEqual(tokenize('A hunter_went 1958'), ['a', 'hunter', 'went', '1958'])
+
+    def test_alphanumeric(self):
+        terms = tokenize('Op5 no2 child1')
+        self.assertListEqual(terms, ['op5', 'op', 'no2', 'no', 'child1', 'child'])
+        self.assertListEqual(tokenize('lü4 shui3'), ['lue', 'shui'])
+        self.assertListEqual(tokenize(None), [])
+        self.assertListEqual(tokenize(float('nan')), [])
+
+class TestTextIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.datasets_dir = os.path.join(self.dir, 'datasets')
+        self.write_dataset('foo', {
+            'a': ('Der Jäger aus Kurpfalz', 'Ein Jäger aus Kurpfalz, der reitet'),
+            'b': ('Das Mädchen', None),
+        })
+        self.write_dataset('bar', {
+            'a': ('The hunter', 'The hunter went out to hunt'),
+            'b': ('Moon song', 'The moon rises'),
+        })
+        self.index = TextIndex(os.path.join(self.dir, 'search.sqlite'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir)
+
+    def write_dataset(self, dataset_id, entries):
+        directory = os.path.join(self.datasets_dir, dataset_id)
+        os.makedirs(directory, exist_ok=True)
+        df = pd.DataFrame([dict(id=entry_id, title=title, lyrics=lyrics)
+                           for entry_id, (title, lyrics) in entries.items()])
+        df.to_csv(os.path.join(directory, 'index.csv'), index=False)
+
+    def test_search(self):
+        self.index.refresh(self.datasets_dir)
+        self.assertEqual(len(self.index), 4)
+        results = self.index.search('jaeger')
+        self.assertListEqual(list(results['dataset_id']), ['foo'])
+        self.assertListEqual(list(results['id']), ['a'])
+        results = self.index.search('hunter moon')
+        self.assertEqual(len(results), 2)
+        self.assertTrue((results['score'].diff().dropna() <= 0).all())
+        results = self.index.search('the', dataset_ids=['foo'])
+        self.assertEqual(len(results), 0)
+        self.assertEqual(len(self.index.search('nonexistent')), 0)
+
+    def test_search_datasets(self):
+        self.index.refresh(self.datasets_dir)
+        results = self.index.search('the hunter', limit=None)
+        filtered = self.index.search('the hunter', limit=None, dataset_ids=['bar'])
+        self.assertListEqual(list(filtered['dataset_id'].unique()), ['bar'])
+        expected = results[results['dataset_id'] == 'bar'].reset_index(drop=True)
+        pd.testing.assert_frame_equal(filtered, expected)
+
+        # The number of queries does not depend on the number of results
+        statements = []
+        self.index._connection.set_trace_callback(statements.append)
+        self.index.search('the hunter', limit=None)
+        self.assertEqual(len(statements), 3)
+
+    def test_ranking(self):
+        # Terms in the title weigh more than terms in the lyrics
+        entries = pd.DataFrame({
+            'title': ['Song', 'Hunter'],
+            'lyrics': ['hunter', 'A song']},
+            index=pd.Index(['x', 'y'], name='id'))
+        self.index.update_dataset('test', entries)
+        self.assertListEqual(list(self.index.search('hunter')['id']), ['y', 'x'])
+
+    def test_incremental_refresh(self):
+        changed, removed = self.index.refresh(self.datasets_dir)
+        self.assertListEqual(changed, ['bar', 'foo'])
+        self.assertEqual(self.index.refresh(self.datasets_dir), ([], []))
+
+        self.write_dataset('foo', {'c': ('Die Lorelei', None)})
+        shutil.rmtree(os.path.join(self.datasets_dir, 'bar'))
+        changed, removed = self.index.refresh(self.datasets_dir)
+        self.assertListEqual(changed, ['foo'])
+        self.assertListEqual(removed, ['bar'])
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(len(self.index.search('jaeger')), 0)
+        self.assertListEqual(list(self.index.search('lorelei')['id']), ['c'])
+
+if __name__ == '__main__':
+    unittest.main()
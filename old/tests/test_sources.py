@@ -5,6 +5,8 @@
 # License: 
 import unittest
 import os
+import shutil
+import tempfile
 import pandas as pd
 from catafolk.source import *
 from catafolk.transformer import Transformer
@@ -12,6 +14,16 @@ from catafolk.transformer import Transformer
 CUR_DIR = os.path.dirname(__file__)
 TEST_DATASETS_DIR = os.path.join(CUR_DIR, 'datasets')
 
+def create_kern_files(data_dir, num_files=20):
+    for i in range(num_files):
+        path = os.path.join(data_dir, f'song{i:03d}.krn')
+        with open(path, 'w') as handle:
+            handle.write(f'!!!OTL: Song {i}\n')
+            if i % 3 == 0:
+                handle.write(f'!!!ARE: Region {i}\n')
+            handle.write('**kern\n4c\n4d\n*-\n')
+            handle.write(f'!!!EEV: {i}.0\n')
+
 class TestSource(unittest.TestCase):
     def test_source(self):
         entries = [ {'id': i*10, 'foo': 'bar'} for i in range(10)]
@@ -58,4 +70,68 @@ class TestSource(unittest.TestCase):
         source = FileSource(data_dir, '*.krn', name='file')
         df = source.data
         self.assertEqual(len(df), 9)
-        self.assertTrue('ONM' in df.columns)
\ No newline at end of file
+        self.assertTrue('ONM' in df.columns)
+
+    def test_file_source_parallel(self):
+        data_dir = tempfile.mkdtemp()
+        try:
+            create_kern_files(data_dir)
+            serial = FileSource(data_dir, '*.krn', name='file')
+            parallel = FileSource(data_dir, '*.krn', name='file', 
+                num_workers=2, chunksize=3)
+            pd.testing.assert_frame_equal(serial.data, parallel.data)
+            self.assertEqual(len(parallel.data), 20)
+            self.assertEqual(parallel.data.loc['song003', 'ARE'], 'Region 3')
+        finally:
+            shutil.rmtree(data_dir)
+
+class TestRecords(unittest.TestCase):
+
+    def assertRecordsMatchData(self, source):
+        records = dict(source.records())
+        df = source.data
+        self.assertListEqual(sorted(records.keys()), list(df.index))
+        for entry_id, entry in records.items():
+            row = df.loc[entry_id].dropna().to_dict()
+            self.assertDictEqual({k: v for k, v in entry.items() if k in row}, row)
+
+    def test_source(self):
+        entries = [{'id': f'item{i}', 'foo': i} for i in range(5)]
+        source = Source(entries, name='test')
+        self.assertEqual(next(source.records()), ('item0', {'id': 'item0', 'foo': 0}))
+        self.assertRecordsMatchData(source)
+
+    def test_csv_source(self):
+        path = os.path.join(CUR_DIR, 'test_csv_source.csv')
+        source = CSVSource(path, name='csv', id_field='item_id')
+        self.assertEqual(len(list(source._iter_entries(chunksize=3))), 10)
+        self.assertRecordsMatchData(source)
+
+    def test_id_transformer(self):
+        entries = [{'item_id': i} for i in range(3)]
+        transformer = Transformer([['format', 'item_id', 'new_id', {'pattern': 'item-{:0>3}'}]])
+        source = Source(entries, name='test', id_transformer=transformer)
+        ids = [entry_id for entry_id, _ in source.records()]
+        self.assertListEqual(ids, ['item-000', 'item-001', 'item-002'])
+
+    def test_file_source(self):
+        data_dir = tempfile.mkdtemp()
+        try:
+            create_kern_files(data_dir)
+            source = FileSource(data_dir, '*.krn', name='file')
+            records = list(source.records())
+            self.assertEqual(records[3][0], 'song003')
+            self.assertEqual(records[3][1]['ARE'], 'Region 3')
+            self.assertNotIn('ARE', records[4][1])
+            self.assertEqual(len(source._files), 0)
+            self.assertRecordsMatchData(source)
+
+            parallel = FileSource(data_dir, '*.krn', name='file', 
+                num_workers=2, chunksize=2)
+            self.assertListEqual(list(parallel.records()), records)
+        finally:
+            shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
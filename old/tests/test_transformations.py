@@ -5,6 +5,7 @@
 # License: 
 import unittest
 from catafolk.transformer import *
+from catafolk.operations import *
 
 class TestTransformers(unittest.TestCase):
 
@@ -127,6 +128,81 @@ class TestTransformerBuilding(unittest.TestCase):
         ])
         self.assertEqual(len(T.operations), 3)
 
+    def test_unknown_operation(self):
+        T = Transformer()
+        # Only the operations in catafolk.operations can be used by name
+        for name in ['foo', 'json', 're', 'Transformer', '_return']:
+            with self.assertRaises(ValueError):
+                T.add([[name, 'A', 'B']])
+        T.add([['rename', 'A', 'B']])
+        self.assertDictEqual(T({'A': 1}), {'B': 1})
+
+class TestExecutionPlan(unittest.TestCase):
+    """Test the compiled execution plan of the Transformer"""
+
+    def test_topological_order(self):
+        T = Transformer([
+            ['uppercase', 'B', 'C'],
+            ['lowercase', 'A', 'B'],
+        ])
+        T.compose()
+        names = [name for name, *_ in T.plan]
+        self.assertListEqual(names, ['lowercase_1', 'uppercase_1'])
+        self.assertDictEqual(T({'A': 'Foo'}), {'C': 'FOO'})
+
+    def test_cycle(self):
+        T = Transformer([
+            ['uppercase', 'B', 'A'],
+            ['lowercase', 'A', 'B'],
+        ])
+        with self.assertRaises(ValueError):
+            T.compose()
+
+    def test_inputs_unchanged(self):
+        T = Transformer([['lowercase', 'A', 'B']])
+        inputs = {'A': 'Foo'}
+        T(inputs)
+        self.assertDictEqual(inputs, {'A': 'Foo'})
+
+    def test_all_outputs(self):
+        T = Transformer([
+            [['split', 'lowercase'], 'A', ['B', 'C'], [{'sep': '-'}, {}]],
+            ['constant', 'D', 10],
+            ['uppercase', 'missing', 'E']
+        ])
+        out = T({'A': 'Foo-Bar', 'other': 1}, outputs_only=False)
+        self.assertDictEqual(out, {
+            'A': 'Foo-Bar', 'other': 1, '_': None,
+            'B_0_split': 'Foo', 'C_0_split': 'Bar',
+            'B': 'foo', 'C': 'bar', 'D': 10
+        })
+
+    def test_leafs_and_roots(self):
+        T = Transformer([
+            ['lowercase', 'A', 'B'],
+            ['join', ['B', 'C'], 'D'],
+        ])
+        self.assertListEqual(T.leafs, ['D'])
+        self.assertListEqual(T.roots, ['A', 'C'])
+        self.assertListEqual(T.nodes, ['A', 'B', 'C', 'D'])
+
+    def test_add_after_leafs(self):
+        T = Transformer([['uppercase', 'a', 'b']])
+        self.assertListEqual(T.leafs, ['b'])
+        self.assertDictEqual(T({'a': 'x'}), {'b': 'X'})
+        T.add([['lowercase', 'b', 'c']])
+        self.assertListEqual(T.leafs, ['c'])
+        self.assertListEqual(T.roots, ['a'])
+        self.assertListEqual(T.nodes, ['a', 'b', 'c'])
+        self.assertListEqual(T.inputs, ['a'])
+        self.assertDictEqual(T({'a': 'x'}), {'c': 'x'})
+
+    def test_add_after_compose(self):
+        T = Transformer([['lowercase', 'A', 'B']])
+        self.assertDictEqual(T({'A': 'Foo'}), {'B': 'foo'})
+        T.add([['uppercase', 'B', 'C']])
+        self.assertDictEqual(T({'A': 'Foo'}), {'C': 'FOO'})
+
 class TestShorthands(unittest.TestCase):
 
     def test_single_input_output(self):
@@ -277,5 +353,72 @@ class TestShorthands(unittest.TestCase):
         }
         self.assertDictEqual(T[0], target)
 
+class TestProfile(unittest.TestCase):
+
+    def get_transformer(self):
+        return Transformer([
+            ['uppercase', 'a', 'b'],
+            ['replace', 'b', 'c', {'old': 'X', 'new': 'Y'}],
+            ['constant', 'd', 1]])
+
+    def test_disabled(self):
+        T = self.get_transformer()
+        self.assertIsNone(T.profile)
+        T({'a': 'x'})
+        T.transform_columns({'a': ['x']}, 1)
+        self.assertIsNone(T.profile)
+
+    def test_call(self):
+        T = self.get_transformer()
+        profile = T.enable_profiling()
+        self.assertIs(T.enable_profiling(), profile)
+        for value in ['x', 'y']:
+            T({'a': value})
+        with self.assertRaises(AttributeError):
+            T({'a': 3})
+        self.assertEqual(profile['uppercase_1'].calls, 3)
+        self.assertEqual(profile['uppercase_1'].errors, 1)
+        self.assertEqual(profile['replace_1'].calls, 2)
+        self.assertEqual(profile['replace_1'].function, 'replace')
+        self.assertGreater(profile['replace_1'].time, 0)
+        self.assertIs(T.disable_profiling(), profile)
+        T({'a': 'z'})
+        self.assertEqual(profile['uppercase_1'].calls, 3)
+
+    def test_columns(self):
+        T = self.get_transformer()
+        profile = T.enable_profiling()
+        T.transform_columns({'a': ['x', 'y', 3, 'z']}, 4)
+        self.assertEqual(profile['uppercase_1'].entries, 4)
+        self.assertEqual(profile['uppercase_1'].errors, 1)
+        self.assertEqual(profile['replace_1'].entries, 3)
+        self.assertEqual(profile['constant_1'].calls, 3)
+
+        # Without errors, constants are computed for all entries at once
+        profile.reset()
+        T.transform_columns({'a': ['x', 'y', 'z']}, 3)
+        self.assertEqual(profile['constant_1'].calls, 1)
+        self.assertEqual(profile['constant_1'].entries, 3)
+
+    def test_table(self):
+        profile = Profile()
+        profile.record('fast', rename, 0.1, calls=10, entries=10)
+        profile.record('slow', replace, 0.3, calls=10, entries=10, errors=2)
+        profile.record('unused', rename, 0.0, calls=0, entries=0)
+        table = profile.table()
+        self.assertListEqual(list(table.index), ['slow', 'fast', 'unused'])
+        self.assertAlmostEqual(table.loc['slow', 'share'], 0.75)
+        self.assertAlmostEqual(table.loc['fast', 'time_per_entry'], 0.01)
+        self.assertListEqual(list(profile.table('errors').index)[:1], ['slow'])
+        self.assertEqual(len(profile.format(limit=1).splitlines()), 3)
+        self.assertEqual(profile.annotation('slow'), 'slow\n300.0 ms (75%), 10 calls, 2 errors')
+        self.assertEqual(profile.annotation('other'), 'other\nnot called')
+        profile.reset()
+        self.assertEqual(len(profile.table()), 0)
+
+    def test_plot_without_profile(self):
+        with self.assertRaises(ValueError):
+            self.get_transformer().plot('graph.pdf', profile=True)
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
@@ -1,40 +1,7 @@
-import os
-# import argparse
-from catafolk.dataset import Dataset
+import sys
+from catafolk.cli import main
 
 if __name__ == '__main__':
-    # TODO add command line args?
-    datasets = [
-        # # 'densmore-ojibway',
-        # 'densmore-pawnee',
-
-        # 'boehme-altdeutsches-liederbuch',
-        # 'boehme-volksthumliche-lieder',
-        # 'bronson-child-ballads',
-        # 'creighton-nova-scotia',
-        # 'densmore-choctaw',
-        # 'densmore-menominee'
-        # 'densmore-nootka',
-        # 'densmore-northern-ute',
-        # 'densmore-maidu'
-        # 'densmore-papago',
-        # 'densmore-pueblo',
-        # 'densmore-teton-sioux',
-        # 'erk-deutscher-liederhort',
-        'essen-china-han',
-        'essen-china-natmin',
-        'essen-china-shanxi',
-        'essen-china-xinhua',
-        # 'finnish-folk-tunes'
-        # 'haydn-scottish-songs',
-        # 'natural-history-of-song',
-        # 'pinck-verklingende-weisen'
-        # 'sagrillo-ireland',
-        # 'sagrillo-luxembourg',
-    ]
-    for dataset_id in datasets:
-        print(dataset_id)
-        dataset = Dataset(dataset_id)
-        dataset.make()
-        # dataset.plot_transformations()
-    
\ No newline at end of file
+    # Build the datasets passed as arguments, or all datasets. This is
+    # the same as `catafolk build`, which accepts more options.
+    sys.exit(main(['build'] + sys.argv[1:]))